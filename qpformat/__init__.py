@@ -2,3 +2,4 @@ from ._version import version as __version__  # noqa: F401
 from .core import load_data  # noqa: F401
 from . import file_formats  # noqa: F401
 from .file_formats import BadFileFormatError  # noqa: F401
+from . import writers  # noqa: F401
@@ -19,7 +19,7 @@ def guess_format(path):
 
 def load_data(path, fmt=None, bg_data=None, bg_fmt=None,
               meta_data=None, holo_kw=None, qpretrieve_kw=None,
-              as_type="float32"):
+              as_type="float32", channels=None):
     """Load experimental data
 
     Parameters
@@ -49,6 +49,11 @@ def load_data(path, fmt=None, bg_data=None, bg_fmt=None,
         numerical accuracy is required (does not apply for a
         simple 2D phase analysis), set this to double precision
         ("float64").
+    channels: tuple of str
+        Image channels to load, e.g. ``("phase",)`` to skip
+        reading amplitude/intensity data where the file format
+        allows it. If set to `None`, all channels are loaded
+        (see :const:`qpformat.file_formats.series_base.VALID_CHANNELS`).
 
     Returns
     -------
@@ -80,7 +85,8 @@ def load_data(path, fmt=None, bg_data=None, bg_fmt=None,
                                 meta_data=meta_data,
                                 holo_kw=holo_kw,
                                 qpretrieve_kw=qpretrieve_kw,
-                                as_type=as_type)
+                                as_type=as_type,
+                                channels=channels)
 
     if bg_data is not None:
         if isinstance(bg_data, qpimage.QPImage):
@@ -95,7 +101,8 @@ def load_data(path, fmt=None, bg_data=None, bg_fmt=None,
                                              meta_data=meta_data,
                                              holo_kw=holo_kw,
                                              qpretrieve_kw=qpretrieve_kw,
-                                             as_type=as_type)
+                                             as_type=as_type,
+                                             channels=channels)
                 dataobj.set_bg(bgobj)
 
     return dataobj
@@ -0,0 +1,86 @@
+"""Reusable buffers for reading image data
+
+Reading an image from an HDF5 file with ``ds[:]`` allocates a new
+array for every image. The HDF5 file formats instead read their
+image data with :meth:`h5py.Dataset.read_direct` into buffers of
+a :class:`BufferPool` (one pool per dataset), so that iterating
+over a series does not allocate new arrays for the raw data.
+
+The raw data are pooled in the dtype of the file (e.g. uint16 for
+camera images) and not in the dtype `as_type` of the dataset: The
+phase retrieval converts the raw data anyway when it copies them
+into the (zero-padded) array for the Fourier transform, so a
+conversion to `as_type` would only add work and, for integer
+data, a larger buffer. Data that are passed on without such a
+conversion (e.g. the complex fields of the Meep file format) are
+read directly into a buffer with the precision of `as_type`.
+"""
+import collections
+import threading
+import weakref
+
+import numpy as np
+
+
+class BufferPool(object):
+    """Reusable arrays keyed by shape and dtype
+
+    The pool holds at most one buffer for each shape and dtype
+    per thread. A buffer returned by :meth:`get` is returned again
+    by the next call with the same shape and dtype in the same
+    thread, i.e. its content is only valid until then. Pooled
+    buffers must therefore only be used for intermediate data and
+    never be returned to the user. Different threads never share
+    buffers, so a dataset can be read from multiple threads.
+
+    .. versionadded:: 0.15.0
+    """
+
+    def __init__(self, maxsize=4):
+        """
+        Parameters
+        ----------
+        maxsize: int
+            Maximum number of buffers in the pool (per thread);
+            the least recently used buffer is released first
+        """
+        #: Maximum number of buffers in the pool (per thread)
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # buffers of all threads (released when a thread ends)
+        self._all_buffers = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(buffers)
+                       for buffers in self._all_buffers.values())
+
+    def _get_buffers(self):
+        """Return the buffers of the current thread"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = collections.OrderedDict()
+            self._local.buffers = buffers
+            with self._lock:
+                self._all_buffers[id(buffers)] = buffers
+        return buffers
+
+    def clear(self):
+        """Release all buffers (of all threads)"""
+        with self._lock:
+            for buffers in self._all_buffers.values():
+                buffers.clear()
+
+    def get(self, shape, dtype):
+        """Return an (uninitialized) array with `shape` and `dtype`"""
+        key = (tuple(int(ss) for ss in shape), np.dtype(dtype))
+        buffers = self._get_buffers()
+        buf = buffers.pop(key, None)
+        if buf is None:
+            buf = np.empty(key[0], dtype=key[1])
+        # move to the end (most recently used)
+        buffers[key] = buf
+        while len(buffers) > self.maxsize:
+            buffers.popitem(last=False)
+        return buf
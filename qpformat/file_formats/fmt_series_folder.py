@@ -1,11 +1,17 @@
-from functools import lru_cache
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import os
 from os.path import commonprefix
 import pathlib
 
+import numpy as np
+
 from .errors import BadFileFormatError
+from .folder_index import FolderIndex, INDEX_NAME
 from .series_base import SeriesData
 from .registry import get_format_classes, get_format_dict
-from .util import hash_obj
+from .util import MAGIC_HDF5, has_hdf5_user_block, hash_obj
 
 
 class MultipleFormatsNotSupportedError(BadFileFormatError):
@@ -16,55 +22,192 @@ class MultipleFormatsNotSupportedError(BadFileFormatError):
     pass
 
 
+#: maximum number of threads for verifying the files in a folder
+SEARCH_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+def verify_file_format(path, format_classes):
+    """Return the name of the first format that verifies `path`
+
+    Before calling `verify`, the formats in `format_classes` are
+    prefiltered using their `suffixes` and `magic_bytes` (HDF5
+    files with a user block are recognized as well). Returns
+    None if no format matches.
+    """
+    try:
+        with open(path, "rb") as fd:
+            head = fd.read(16)
+    except OSError:
+        return None
+    user_block = None
+    for fmt in format_classes:
+        if fmt.suffixes and path.suffix not in fmt.suffixes:
+            continue
+        if fmt.magic_bytes and not head.startswith(fmt.magic_bytes):
+            if fmt.magic_bytes != MAGIC_HDF5:
+                continue
+            if user_block is None:
+                user_block = has_hdf5_user_block(path)
+            if not user_block:
+                continue
+        if fmt.verify(path):
+            return fmt.__name__
+    return None
+
+
+def verify_files(paths):
+    """Return the file format names (or None) for a list of files
+
+    The files are verified in parallel (see `verify_file_format`).
+    SeriesFolder is not considered (no recursive search).
+    """
+    if not paths:
+        return []
+    format_classes = [fmt for fmt in get_format_classes()
+                      if fmt is not SeriesFolder]
+    with ThreadPoolExecutor(
+            max_workers=min(SEARCH_MAX_WORKERS, len(paths))) as pool:
+        return list(pool.map(partial(verify_file_format,
+                                     format_classes=format_classes),
+                             paths))
+
+
 class SeriesFolder(SeriesData):
     """Folder-based wrapper file format"""
     # storage_type is implemented as a property
     priority = -3  # higher than zip file format (issues on Windows)
+    #: Maximum number of file datasets that are kept open; the least
+    #: recently used dataset is closed when this number is exceeded
+    #: (can be changed for individual instances)
+    max_open_files = 16
 
     def __init__(self, *args, **kwargs):
         super(SeriesFolder, self).__init__(*args, **kwargs)
         self._files = None
         self._formats = None
-        self._series = None
+        self._series = collections.OrderedDict()
+        self._frame_offsets = None
+        self._watch_index = None
+        # file name -> (size, mtime) when the length was determined
+        self._snapshot = {}
+        self._cropped_file_names = None
+        # names of new files with a different file format (`refresh`)
+        self._rejected = set()
         self.format_dict = get_format_dict()
 
-    @lru_cache()
     def __len__(self):
-        return len(self._get_sub_image_mapping())
+        return int(self._get_frame_offsets()[-1])
 
-    @lru_cache()
     def _get_cropped_file_names(self):
         """self.files with common path prefix/suffix removed"""
-        files = [ff.name for ff in self.files]
-        prefix = commonprefix(files)
-        suffix = commonprefix([f[::-1] for f in files])[::-1]
-        cropped = [f[len(prefix):-len(suffix)] for f in files]
-        return cropped
+        if self._cropped_file_names is None:
+            files = [ff.name for ff in self.files]
+            prefix = commonprefix(files)
+            suffix = commonprefix([f[::-1] for f in files])[::-1]
+            self._cropped_file_names = [f[len(prefix):-len(suffix)]
+                                        for f in files]
+        return self._cropped_file_names
 
     def _get_series_from_file(self, file_idx):
-        if self._series is None:
-            self._series = [None] * len(self.files)
-        if self._series[file_idx] is None:
+        if file_idx in self._series:
+            self._series.move_to_end(file_idx)
+        else:
+            path = self.files[file_idx]
             format_class = self.format_dict[self._formats[file_idx]]
             self._series[file_idx] = format_class(
-                path=self._files[file_idx],
+                path=path,
                 meta_data=self.meta_data,
                 as_type=self.as_type,
-                qpretrieve_kw=self.qpretrieve_kw)
+                qpretrieve_kw=self.get_qpretrieve_kw(),
+                channels=self.channels)
+            while len(self._series) > max(1, self.max_open_files):
+                _, ds = self._series.popitem(last=False)
+                ds.close()
         return self._series[file_idx]
 
-    @lru_cache()
-    def _get_sub_image_mapping(self):
-        mapping = []
-        for file_idx in range(len(self.files)):
-            ds = self._get_series_from_file(file_idx)
-            for jj in range(len(ds)):
-                # index of file, index of image in file
-                mapping.append((file_idx, jj))
-        return mapping
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _get_index(path):
+        """Return the (cached) sidecar index instance for a folder"""
+        return FolderIndex(path)
+
+    def _get_file_length(self, file_idx, index):
+        """Return the number of images in a file
+
+        Single-image file formats are not opened and for series
+        file formats, the length is taken from `index` if possible.
+        The size and modification time of the file are stored in
+        the snapshot of this instance (see `refresh`).
+        """
+        path = self.files[file_idx]
+        name = path.name
+        entry = index.entries.get(name)
+        if entry is not None:
+            self._snapshot[name] = (entry["size"], entry["mtime ns"])
+        if not self.format_dict[self._formats[file_idx]].is_series:
+            return 1
+        if entry is None:
+            # stat before opening the file, so that data written in
+            # the meantime are detected by `refresh`
+            st = os.stat(path)
+            self._snapshot[name] = (st.st_size, st.st_mtime_ns)
+        length = index.get_length(name) if index.exists else None
+        if length is None:
+            length = len(self._get_series_from_file(file_idx))
+            if index.exists:
+                index.set_length(name, length)
+        return length
+
+    def _get_frame_offsets(self):
+        """Cumulative number of images of the files in the folder
+
+        The returned int64 array has `len(self.files) + 1` entries,
+        starting with 0.
+        """
+        if self._frame_offsets is None:
+            index = SeriesFolder._get_index(self.path)
+            lengths = [self._get_file_length(file_idx, index)
+                       for file_idx in range(len(self.files))]
+            if index.dirty:
+                index.save()
+            self._set_frame_offsets(lengths)
+        return self._frame_offsets
 
-    @lru_cache()
-    def _identifier_data(self):
+    def _get_file_frame_index(self, idx):
+        """Return the file index and the image index within that file"""
+        offsets = self._get_frame_offsets()
+        size = int(offsets[-1])
+        if idx < 0:
+            idx += size
+        if idx < 0 or idx >= size:
+            raise IndexError("Index {} out of range for {} with {} "
+                             "images!".format(idx, self.path, size))
+        file_idx = int(np.searchsorted(offsets, idx, side="right")) - 1
+        return file_idx, int(idx - offsets[file_idx])
+
+    def _get_watch_index(self):
+        """Return the index used for detecting new files in `refresh`
+
+        This is the sidecar index if it exists, otherwise an
+        in-memory index that is initialized with the current
+        files.
+        """
+        if self._watch_index is None:
+            index = SeriesFolder._get_index(self.path)
+            if not index.exists:
+                index = FolderIndex(self.path, persistent=False)
+                known = dict(zip([fp.name for fp in self.files],
+                                 self._formats))
+                index.update(lambda paths: [known.get(pp.name)
+                                            for pp in paths])
+                # Other files are verified in the next `refresh`.
+                for name in list(index.entries):
+                    if name not in known:
+                        index.entries.pop(name)
+            self._watch_index = index
+        return self._watch_index
+
+    def _compute_identifier_data(self):
         """Return a unique identifier for the folder data"""
         # Use only file names
         data = [ff.name for ff in self.files]
@@ -75,6 +218,11 @@ class SeriesFolder(SeriesData):
         data += self._identifier_meta()
         return hash_obj(data)
 
+    def _set_frame_offsets(self, lengths):
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        self._frame_offsets = offsets
+
     @staticmethod
     @lru_cache(maxsize=32)
     def _search_files(path):
@@ -85,17 +233,27 @@ class SeriesFolder(SeriesData):
 
         .. versionchanged:: 0.13.0
             series file formats are now supported
+
+        .. versionchanged:: 0.15.0
+            file formats are prefiltered by file name suffix and
+            magic bytes and files are verified in parallel; if
+            a sidecar index exists (see `write_index`), only new
+            or modified files are verified
         """
         path = pathlib.Path(path)
-        fifo = []
-
-        for fp in path.glob("*"):
-            if fp.is_dir():
-                continue
-            for fmt in get_format_classes():
-                if fmt.verify(fp):
-                    fifo.append((fp, fmt.__name__))
-                    break
+        index = SeriesFolder._get_index(path)
+        if index.exists:
+            # Only new or modified files are verified
+            index.update(verify_files)
+            fifo = index.get_files()
+        else:
+            with os.scandir(path) as it:
+                paths = [pathlib.Path(entry.path) for entry in it
+                         if not (entry.is_dir()
+                                 or entry.name.startswith(INDEX_NAME))]
+            fmts = verify_files(paths)
+            fifo = [(fp, fmt) for fp, fmt in zip(paths, fmts)
+                    if fmt is not None]
 
         # Ignore qpimage formats if multiple formats were
         # detected.
@@ -123,6 +281,13 @@ class SeriesFolder(SeriesData):
         fifo = sorted(fifo)
         return fifo
 
+    def close(self):
+        """Close all datasets of the files in the folder"""
+        while self._series:
+            _, ds = self._series.popitem()
+            ds.close()
+        super(SeriesFolder, self).close()
+
     @property
     def files(self):
         """List of files (only supported file formats)"""
@@ -135,21 +300,120 @@ class SeriesFolder(SeriesData):
     @property
     def storage_type(self):
         """The storage type depends on the wrapped file format"""
+        self.files  # populates `self._formats`
+        format_class = self.format_dict[self._formats[0]]
+        if isinstance(format_class.storage_type, str):
+            # no need to open a file
+            return format_class.storage_type
         ds = self._get_series_from_file(0)
         return ds.storage_type
 
+    def refresh(self):
+        """Look for files that were added since the data were opened
+
+        New data files (with the same file format as the existing
+        files) are appended in sorted order to `files`, so that the
+        indices of the images that are already available do not
+        change. Note that `files` is then not sorted anymore if
+        the new files are sorted before existing files. New files
+        with a different file format are ignored (also in later
+        calls). Modified files (e.g. growing series files) are
+        reopened. Removed files are not supported. Only new or
+        modified files are verified. Files are compared against a
+        snapshot of this instance (file size and modification time
+        when the number of images was determined), so that all
+        instances of the same folder detect changes, even if they
+        share the sidecar index. Data files should be written
+        atomically (e.g. written to a different folder and then
+        moved), because incomplete files might already pass
+        verification.
+
+        If new files are found, the identifier of this dataset
+        changes and, because the common prefix and suffix of the
+        file names might change as well, so might the identifiers
+        of the existing images (see `get_identifier`).
+
+        Returns the number of new images.
+
+        .. versionadded:: 0.15.0
+        """
+        index = self._get_watch_index()
+        # The index might be shared with other instances and might
+        # already have been updated by them, so its return value is
+        # not used to detect changes.
+        index.update(verify_files, check_folder_mtime=False)
+        # determine the lengths first (populates the snapshot)
+        lengths = list(np.diff(self._get_frame_offsets()))
+        known = {fp.name: file_idx for file_idx, fp in enumerate(self.files)}
+        modified = []
+        for name, file_idx in known.items():
+            entry = index.entries.get(name)
+            if entry is None:
+                # removed files are not supported
+                continue
+            state = (entry["size"], entry["mtime ns"])
+            if name not in self._snapshot:
+                # single-image file that was not in the index
+                self._snapshot[name] = state
+            elif self._snapshot[name] != state:
+                modified.append(file_idx)
+        new = [(fp.name, fmt) for fp, fmt in index.get_files()
+               if fp.name not in known and fp.name not in self._rejected]
+        if not modified and not new:
+            return 0
+        old_size = len(self)
+        for file_idx in modified:
+            ds = self._series.pop(file_idx, None)
+            if ds is not None:
+                ds.close()
+            lengths[file_idx] = self._get_file_length(file_idx, index)
+        for name, fmt in new:
+            if not self._formats or fmt == self._formats[0]:
+                self._files.append(self.path / name)
+                self._formats.append(fmt)
+                lengths.append(self._get_file_length(len(self._files) - 1,
+                                                     index))
+            else:
+                self._rejected.add(name)
+        if index.dirty:
+            index.save()
+        if len(lengths) != len(known):
+            # reset the state that depends on the file list
+            self._cropped_file_names = None
+            self._identifier_data_cache = None
+        self._set_frame_offsets(lengths)
+        return len(self) - old_size
+
+    def write_index(self):
+        """Write a sidecar index file to the folder
+
+        The index (see :const:`folder_index.INDEX_NAME`) stores the
+        file format, size, modification time, and number of images
+        of every file in the folder. Once it exists, it is used (and
+        updated incrementally) whenever the folder is opened, so
+        that only new or modified files have to be opened.
+
+        .. versionadded:: 0.15.0
+        """
+        index = SeriesFolder._get_index(self.path)
+        index.update(verify_files, force=True)
+        for file_idx, fp in enumerate(self.files):
+            ds = self._get_series_from_file(file_idx)
+            index.set_length(fp.name, len(ds))
+        index.save(ignore_errors=False)
+
     def get_identifier(self, idx):
         """Return an identifier for the data at index `idx`
 
         .. versionchanged:: 0.4.2
             indexing starts at 1 instead of 0
         """
-        file_idx, jj = self._get_sub_image_mapping()[idx]
+        file_idx, jj = self._get_file_frame_index(idx)
         name = self._get_cropped_file_names()[file_idx]
         return f"{self.identifier}:{name}:{jj}:{idx}"
 
     def get_metadata(self, idx):
-        file_idx, jj = self._get_sub_image_mapping()[idx]
+        file_idx, jj = self._get_file_frame_index(idx)
         ds = self._get_series_from_file(file_idx)
         return ds.get_metadata(jj)
 
@@ -158,17 +422,22 @@ class SeriesFolder(SeriesData):
 
         .. versionadded:: 0.4.2
         """
-        file_idx, jj = self._get_sub_image_mapping()[idx]
+        file_idx, jj = self._get_file_frame_index(idx)
         return f"{self.path / self.files[file_idx]}:{jj}"
 
     def get_qpimage_raw(self, idx):
         """Return QPImage without background correction"""
-        file_idx, jj = self._get_sub_image_mapping()[idx]
+        file_idx, jj = self._get_file_frame_index(idx)
         ds = self._get_series_from_file(file_idx)
         qpi = ds.get_qpimage_raw(jj)
         qpi["identifier"] = self.get_identifier(idx)
         return qpi
 
+    def get_raw_data(self, idx):
+        """Return the raw image data (e.g. hologram) at index `idx`"""
+        file_idx, jj = self._get_file_frame_index(idx)
+        return self._get_series_from_file(file_idx).get_raw_data(jj)
+
     @staticmethod
     def verify(path):
         """Verify folder file format
@@ -176,6 +445,8 @@ class SeriesFolder(SeriesData):
         The folder file format is only valid when
         there is only one file format present.
         """
+        if not pathlib.Path(path).is_dir():
+            return False
         valid = True
         fifo = SeriesFolder._search_files(path)
         # dataset size
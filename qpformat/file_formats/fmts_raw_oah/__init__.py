@@ -1,6 +1,7 @@
 # flake8:  noqa: F401
 from . import series_raw_oah_hyperspy_hdf5
 from . import series_raw_oah_qpformat_hdf5
+from . import series_raw_oah_tif_stack
 from . import series_raw_oah_tif_zip
 
 from . import single_raw_oah_qpformat_hdf5
@@ -1,10 +1,10 @@
-import functools
 import warnings
 
 import h5py
-import qpimage
+import numpy as np
 
 from ..series_base import SeriesData
+from ..util import MAGIC_HDF5
 
 
 class HyperSpyNoDataFoundError(BaseException):
@@ -23,11 +23,17 @@ class SeriesRawOAHHyperSpyHDF5(SeriesData):
     """
     storage_type = "raw-oah"
     priority = -9  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
+
+    def __init__(self, *args, **kwargs):
+        super(SeriesRawOAHHyperSpyHDF5, self).__init__(*args, **kwargs)
+        # index of all experiments (see `_get_index`)
+        self._index = None
 
     def __len__(self):
         return len(self._get_experiments())
 
-    def _check_experiment(self, name):
+    def _check_signal_type(self, name, signal_type):
         """Check the signal type "hologram" of the experiment
 
         Returns
@@ -38,9 +44,6 @@ class SeriesRawOAHHyperSpyHDF5(SeriesData):
         ------
         Warning if the signal type is not supported
         """
-        with h5py.File(name=self.path, mode="r") as h5:
-            sigpath = "/Experiments/{}/metadata/Signal".format(name)
-            signal_type = h5[sigpath].attrs["signal_type"]
         if signal_type != "hologram":
             msg = "Signal type '{}' not supported: {}[{}]".format(signal_type,
                                                                   self.path,
@@ -48,41 +51,81 @@ class SeriesRawOAHHyperSpyHDF5(SeriesData):
             warnings.warn(msg, WrongSignalTypeWarnging)
         return signal_type == "hologram"
 
-    @functools.cache
     def _get_experiments(self):
         """Get all experiments from the hdf5 file"""
-        explist = []
+        return self._get_index()["name"]
+
+    def _get_raw_data_pooled(self, indices):
+        names = self._get_experiments()
+        out = None
+        with h5py.File(name=self.path, mode="r") as h5:
+            for ii, idx in enumerate(indices):
+                ds = h5["Experiments"][names[idx]]["data"]
+                if out is None:
+                    out = self._buffer_pool.get((len(indices),) + ds.shape,
+                                                ds.dtype)
+                ds.read_direct(out, dest_sel=np.s_[ii])
+        return out
+
+    def _get_index(self):
+        """Scan all experiments of the hdf5 file in a single pass
+
+        The index is cached.
+
+        Returns
+        -------
+        index: dict
+            The sorted names ("name") of the supported experiments
+            and for each experiment the scales of the two axes
+            ("scale", 2d ndarray), the unit of the first axis
+            ("units"), and the shape of the hologram ("shape",
+            2d ndarray)
+        """
+        if self._index is None:
+            self._index = self._scan_experiments()
+        return self._index
+
+    def _scan_experiments(self):
+        entries = []
         with h5py.File(name=self.path, mode="r") as h5:
             if "Experiments" not in h5:
                 msg = "Group 'Experiments' not found in {}.".format(self.path)
                 raise HyperSpyNoDataFoundError(msg)
-            for name in h5["Experiments"]:
+            for name, exp in h5["Experiments"].items():
                 # check experiment
-                if self._check_experiment(name):
-                    explist.append(name)
-        explist.sort()
-        if not explist:
+                signal_type = exp["metadata/Signal"].attrs["signal_type"]
+                if self._check_signal_type(name, signal_type):
+                    ax0 = exp["axis-0"].attrs
+                    ax1 = exp["axis-1"].attrs
+                    entries.append((name,
+                                    (ax0["scale"], ax1["scale"]),
+                                    ax0["units"],
+                                    exp["data"].shape[:2]))
+        if not entries:
             # if this error is raised, the signal_type is probably not
             # set to "hologram".
             msg = "No supported data found: {}".format(self.path)
             raise HyperSpyNoDataFoundError(msg)
-        return explist
+        entries.sort()
+        names, scales, units, shapes = zip(*entries)
+        return {"name": list(names),
+                "scale": np.array(scales, dtype=float),
+                "units": list(units),
+                "shape": np.array(shapes, dtype=int),
+                }
 
-    @functools.cache
     def get_metadata(self, idx=0):
-        name = self._get_experiments()[idx]
-        with h5py.File(name=self.path, mode="r") as h5:
-            exp = h5["Experiments"][name]
-            runit = exp["axis-0"].attrs["units"]
-            # resolution
-            rx = exp["axis-0"].attrs["scale"]
-            ry = exp["axis-1"].attrs["scale"]
-            if rx != ry:
-                raise NotImplementedError("Only square pixels supported!")
-            if runit == "nm":
-                pixel_size = rx * 1e-9
-            else:
-                raise NotImplementedError("Units '{}' not implemented!")
+        """Get metadata from the index of all experiments"""
+        index = self._get_index()
+        runit = index["units"][idx]
+        # resolution
+        rx, ry = index["scale"][idx]
+        if rx != ry:
+            raise NotImplementedError("Only square pixels supported!")
+        if runit == "nm":
+            pixel_size = rx * 1e-9
+        else:
+            raise NotImplementedError(f"Units '{runit}' not implemented!")
 
         meta_data = {"pixel size": pixel_size}
         smeta = super(SeriesRawOAHHyperSpyHDF5, self).get_metadata(idx)
@@ -91,21 +134,17 @@ class SeriesRawOAHHyperSpyHDF5(SeriesData):
 
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
-        name = self._get_experiments()[idx]
-        with h5py.File(name=self.path, mode="r") as h5:
-            exp = h5["Experiments"][name]
-            # hologram data
-            data = exp["data"][:]
-
-        qpi = qpimage.QPImage(data=data,
-                              which_data="raw-oah",
-                              meta_data=self.get_metadata(idx),
-                              qpretrieve_kw=self.qpretrieve_kw,
-                              h5dtype=self.as_type)
+        qpi = self._get_qpimage_raw_oah(idx)
         # set identifier
         qpi["identifier"] = self.get_identifier(idx)
         return qpi
 
+    def get_raw_data(self, idx):
+        """Return the hologram at index `idx`"""
+        name = self._get_experiments()[idx]
+        with h5py.File(name=self.path, mode="r") as h5:
+            return h5["Experiments"][name]["data"][:]
+
     @staticmethod
     def verify(path):
         """Verify that `path` has the HyperSpy file format"""
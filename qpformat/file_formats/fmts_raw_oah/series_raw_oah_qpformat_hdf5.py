@@ -1,35 +1,62 @@
-import functools
-
-import h5py
 import qpimage
 
+from .. import raw_hdf5_layout
 from ..series_base import SeriesData
+from ..util import MAGIC_HDF5
 
 
 class SeriesRawOAHQpformatHDF5(SeriesData):
-    """Raw off-axis holography series data (HDF5)"""
+    """Raw off-axis holography series data (HDF5)
+
+    Both the "groups" and the "contiguous" layout are supported
+    (see :mod:`qpformat.file_formats.raw_hdf5_layout`).
+    """
     storage_type = "raw-oah"
     priority = -10  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SeriesRawOAHQpformatHDF5, self).__init__(*args, **kwargs)
+        self._length = None
+        self._columns = None
 
-    @functools.cache
     def __len__(self):
-        with h5py.File(self.path) as h5:
-            has_ref = "reference" in h5
-            has_logs = "logs" in h5
-            return len(h5) - has_ref - has_logs
+        if self._length is None:
+            self._length = self._count_images()
+        return self._length
+
+    def _count_images(self):
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.count_images(h5)
+
+    def _get_attrs(self, idx, h5=None):
+        """Return all HDF5 attributes of the image at index `idx`
+
+        For the contiguous layout, the metadata of all images
+        are cached and the file is not opened again.
+        """
+        if self._columns is None or idx >= self._columns[0]:
+            if h5 is None:
+                with raw_hdf5_layout.open_file(self.path) as h5:
+                    return self._get_attrs(idx, h5)
+            elif raw_hdf5_layout.is_contiguous(h5):
+                self._columns = raw_hdf5_layout.read_columns(h5)
+            else:
+                return dict(h5[str(idx)].attrs)
+        return raw_hdf5_layout.attrs_from_columns(self._columns, idx)
+
+    def _get_raw_data_pooled(self, indices):
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.read_image_batch(h5, indices,
+                                                    pool=self._buffer_pool)
 
     def get_metadata(self, idx):
         """Get metadata directly from HDF5 attributes"""
         meta_data = {}
-        with h5py.File(self.path) as h5:
-            ds = h5[str(idx)]
-            attrs = dict(ds.attrs)
-            for key in qpimage.meta.META_KEYS:
-                if key in attrs:
-                    meta_data[key] = attrs[key]
+        attrs = self._get_attrs(idx)
+        for key in qpimage.meta.META_KEYS:
+            if key in attrs:
+                meta_data[key] = attrs[key]
 
         smeta = super(SeriesRawOAHQpformatHDF5, self).get_metadata(idx)
         meta_data.update(smeta)
@@ -37,29 +64,48 @@ class SeriesRawOAHQpformatHDF5(SeriesData):
 
     def get_qpimage_raw(self, idx):
         """Return QPImage without background correction"""
-        with h5py.File(self.path) as h5:
-            ds = h5[str(idx)]
-            data = ds[:]
-        qpi = qpimage.QPImage(data=data,
-                              which_data="raw-oah",
-                              meta_data=self.get_metadata(idx),
-                              qpretrieve_kw=self.qpretrieve_kw,
-                              h5dtype=self.as_type)
-        return qpi
+        return self._get_qpimage_raw_oah(idx)
+
+    def get_raw_data(self, idx):
+        """Return the hologram at index `idx`"""
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.read_image(h5, idx)
+
+    def get_raw_data_batch(self, indices, out=None):
+        """Return the holograms at `indices` as a 3D array
+
+        For the contiguous layout, this is a single read.
+        """
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.read_image_batch(h5, indices, out=out)
+
+    def refresh(self):
+        """Update the number of images (for files that are being written)
+
+        The file is opened in single-writer/multiple-reader (SWMR)
+        mode (if possible, see :func:`.raw_hdf5_layout.open_file`),
+        so the acquisition software may keep the file open
+        (in SWMR mode) while the data are being read. New images
+        are only visible after the writer has flushed the file.
+        If new images are found, the identifier of this dataset
+        (and thus of all of its images) changes.
+        """
+        old_size = len(self)
+        self._length = self._count_images()
+        if self._length != old_size:
+            # the data identifier depends on the file size
+            self._identifier_data_cache = None
+        return self._length - old_size
 
     @staticmethod
     def verify(path):
         """Verify that `path` is in the correct file format"""
         valid = False
         try:
-            h5 = h5py.File(path, mode="r")
+            h5 = raw_hdf5_layout.open_file(path)
         except (OSError,):
             pass
         else:
-            if (h5.attrs.get("file_format", "") == "qpformat"
-                and h5.attrs.get("imaging_modality", "") ==
-                    "off-axis holography"
-                    and "0" in h5 and "1" in h5):
-                valid = True
+            valid = raw_hdf5_layout.verify_series(h5, "off-axis holography")
             h5.close()
         return valid
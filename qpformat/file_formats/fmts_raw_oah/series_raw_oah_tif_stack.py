@@ -0,0 +1,175 @@
+import pathlib
+
+import numpy as np
+
+from ..series_base import SeriesData
+from ..tiff_signature import NotATiffFileError, read_ifd_tags
+from ..util import MAGIC_TIFF
+
+from .single_raw_oah_tif import SingleRawOAHTif
+
+
+class SeriesRawOAHTifStack(SeriesData):
+    """Off-axis hologram series (multi-page TIFF format)
+
+    Each page of the TIFF file is one hologram. The file is never
+    loaded into memory as a whole: Uncompressed pages are
+    memory-mapped (contiguously stored pages as one strided array)
+    and compressed pages are decoded one at a time.
+    """
+    storage_type = "raw-oah"
+    magic_bytes = MAGIC_TIFF
+
+    def __init__(self, *args, **kwargs):
+        super(SeriesRawOAHTifStack, self).__init__(*args, **kwargs)
+        self._tif = None
+        self._mmap = None
+        self._page_index = None
+
+    def __len__(self):
+        return len(self._get_page_index()[0])
+
+    def _get_mmap(self):
+        """Return a 3D memory-mapped view of all pages or False
+
+        This only works if all pages are memory-mappable and
+        stored with a constant stride in the file.
+        """
+        if self._mmap is None:
+            offsets, dtype, shape = self._get_page_index()
+            framebytes = dtype.itemsize * shape[0] * shape[1]
+            if (not isinstance(self.path, pathlib.Path)
+                    or np.any(offsets < 0)):
+                self._mmap = False
+            else:
+                strides = np.unique(np.diff(offsets))
+                if strides.size == 1 and strides[0] >= framebytes:
+                    stride = int(strides[0])
+                    size = stride * (len(offsets) - 1) + framebytes
+                    buf = np.memmap(self.path, dtype=np.uint8, mode="r",
+                                    offset=offsets[0], shape=(size,))
+                    self._mmap = np.ndarray(
+                        shape=(len(offsets),) + shape,
+                        dtype=dtype,
+                        buffer=buf,
+                        strides=(stride, shape[1] * dtype.itemsize,
+                                 dtype.itemsize))
+                else:
+                    self._mmap = False
+        return self._mmap
+
+    def _get_page_index(self):
+        """Index the pages of the TIFF file (IFDs only, no image data)
+
+        Returns
+        -------
+        offsets: 1d ndarray of int64
+            Data offsets of memory-mappable pages in the file; -1
+            for pages that cannot be memory-mapped (e.g. compressed)
+        dtype: np.dtype
+            Image data type (with byte order of the file)
+        shape: tuple of int
+            Image shape of each page
+        """
+        if self._page_index is None:
+            self._page_index = self._index_pages()
+        return self._page_index
+
+    def _index_pages(self):
+        """Read the page index from the TIFF file"""
+        tf = self._get_tif()
+        page0 = tf.pages[0]
+        shape = tuple(page0.shape)
+        dtype = np.dtype(tf.byteorder + page0.dtype.char)
+        tf.pages.useframes = True
+        offsets = []
+        for frame in tf.pages:
+            if (frame.is_memmappable
+                    and frame.dataoffsets[0] % dtype.itemsize == 0):
+                offsets.append(frame.dataoffsets[0])
+            else:
+                offsets.append(-1)
+        return np.array(offsets, dtype=np.int64), dtype, shape
+
+    def _get_tif(self):
+        """Return the (cached) open TiffFile instance"""
+        if self._tif is None:
+            self._tif = SingleRawOAHTif._get_tif(self.path)
+        return self._tif
+
+    @property
+    def shape(self):
+        """Dataset shape from the TIFF header (no image data are read)"""
+        _, _, shape = self._get_page_index()
+        return (len(self),) + shape
+
+    def close(self):
+        """Close the TIFF file and release the memory map"""
+        if self._tif is not None:
+            self._tif.close()
+            self._tif = None
+        self._mmap = None
+        self._page_index = None
+        super(SeriesRawOAHTifStack, self).close()
+
+    def get_raw_data(self, idx):
+        """Return the hologram at index `idx`
+
+        For memory-mappable files, this is a read-only view
+        into the file.
+        """
+        mmap = self._get_mmap()
+        if mmap is not False:
+            return mmap[idx]
+        else:
+            offsets, dtype, shape = self._get_page_index()
+            if offsets[idx] >= 0 and isinstance(self.path, pathlib.Path):
+                return np.memmap(self.path, dtype=dtype, mode="r",
+                                 offset=offsets[idx], shape=shape)
+            else:
+                return self._get_tif().pages[idx].asarray()
+
+    def get_raw_data_batch(self, indices, out=None):
+        """Return the holograms at `indices` as a 3D array
+
+        For memory-mappable files, all holograms are copied from
+        the memory map in a single indexing operation.
+        """
+        mmap = self._get_mmap()
+        if mmap is not False and out is None:
+            return mmap[np.asarray(indices, dtype=np.int64)]
+        else:
+            return super(SeriesRawOAHTifStack, self).get_raw_data_batch(
+                indices, out=out)
+
+    def get_qpimage_raw(self, idx):
+        """Return QPImage without background correction"""
+        return self._get_qpimage_raw_oah(idx)
+
+    @staticmethod
+    def verify(path):
+        """Verify that `path` is a multi-page TIFF file
+
+        All pages must be 2D grayscale images of the same shape.
+        Phasics TIFF files (which also consist of multiple pages)
+        are not supported. Only the TIFF header and the first two
+        IFDs are read.
+        """
+        valid = False
+        try:
+            ifds, _ = read_ifd_tags(path, max_pages=2,
+                                    decode_tags=[256, 257, 277])
+        except (NotATiffFileError, OSError):
+            pass
+        else:
+            if len(ifds) == 2:
+                ifd0, ifd1 = ifds
+                # ImageWidth, ImageLength, SamplesPerPixel
+                if (ifd0.get(256) is not None
+                        and ifd0.get(257) is not None
+                        and ifd0.get(256) == ifd1.get(256)
+                        and ifd0.get(257) == ifd1.get(257)
+                        and ifd0.get(277, 1) == 1
+                        and 61238 not in ifd0):
+                    valid = True
+        return valid
@@ -6,6 +6,7 @@ import zipfile
 import numpy as np
 
 from ..series_base import SeriesData
+from ..util import MAGIC_ZIP
 
 from .single_raw_oah_tif import SingleRawOAHTif
 
@@ -17,6 +18,7 @@ class SeriesRawOAHZipTif(SeriesData):
     (:class:`qpformat.file_formats.SingleTifHolo`) in a zip file.
     """
     storage_type = "raw-oah"
+    magic_bytes = MAGIC_ZIP
 
     def __init__(self, *args, **kwargs):
         super(SeriesRawOAHZipTif, self).__init__(*args, **kwargs)
@@ -31,14 +33,15 @@ class SeriesRawOAHZipTif(SeriesData):
             self._dataset = [None] * len(self)
         if self._dataset[idx] is None:
             # Use ``zipfile.ZipFile.open`` to return an open file
-            zf = zipfile.ZipFile(self.path)
-            pt = zf.open(self.files[idx])
-            fd = io.BytesIO(pt.read())
+            with zipfile.ZipFile(self.path) as zf, \
+                    zf.open(self.files[idx]) as pt:
+                fd = io.BytesIO(pt.read())
             self._dataset[idx] = SingleRawOAHTif(
                 path=fd,
                 meta_data=self.meta_data,
                 as_type=self.as_type,
-                qpretrieve_kw=self.qpretrieve_kw)
+                qpretrieve_kw=self.get_qpretrieve_kw(),
+                channels=self.channels)
         return self._dataset[idx]
 
     @staticmethod
@@ -56,6 +59,15 @@ class SeriesRawOAHZipTif(SeriesData):
                         phasefiles.append(name)
             return phasefiles
 
+    def close(self):
+        """Release the cached TIFF file data"""
+        if self._dataset is not None:
+            for ds in self._dataset:
+                if ds is not None:
+                    ds.close()
+            self._dataset = None
+        super(SeriesRawOAHZipTif, self).close()
+
     @property
     def files(self):
         """List of hologram data file names in the input zip file"""
@@ -97,6 +109,10 @@ class SeriesRawOAHZipTif(SeriesData):
             qpi[key] = meta_data[key]
         return qpi
 
+    def get_raw_data(self, idx):
+        """Return the hologram at index `idx`"""
+        return self._get_dataset(idx).get_raw_data()
+
     @staticmethod
     def verify(path):
         """Verify that `path` is a zip file containing TIFF files"""
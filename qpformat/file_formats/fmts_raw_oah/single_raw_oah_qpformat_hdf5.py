@@ -1,13 +1,16 @@
 import h5py
 import qpimage
 
+from .. import raw_hdf5_layout
 from ..single_base import SingleData
+from ..util import MAGIC_HDF5
 
 
 class SingleRawOAHQpformatHDF5(SingleData):
     """Raw off-axis holography data (HDF5)"""
     storage_type = "raw-oah"
     priority = -10  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SingleRawOAHQpformatHDF5, self).__init__(*args, **kwargs)
@@ -19,6 +22,11 @@ class SingleRawOAHQpformatHDF5(SingleData):
                     and key in attrs):
                 self.meta_data[key] = attrs[key]
 
+    def _get_raw_data_pooled(self, indices):
+        with h5py.File(self.path, mode="r") as h5:
+            return raw_hdf5_layout.read_image_batch(h5, indices,
+                                                    pool=self._buffer_pool)
+
     def get_metadata(self, idx=0):
         """Get metadata directly from HDF5 attributes"""
         meta_data = {}
@@ -35,15 +43,12 @@ class SingleRawOAHQpformatHDF5(SingleData):
 
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
-        # Load experimental data
-        with h5py.File(self.path) as h5:
-            holo = h5["0"][:]
-        qpi = qpimage.QPImage(data=holo,
-                              which_data="raw-oah",
-                              meta_data=self.get_metadata(idx),
-                              qpretrieve_kw=self.qpretrieve_kw,
-                              h5dtype=self.as_type)
-        return qpi
+        return self._get_qpimage_raw_oah(idx)
+
+    def get_raw_data(self, idx=0):
+        """Return the hologram"""
+        with h5py.File(self.path, mode="r") as h5:
+            return h5["0"][:]
 
     @staticmethod
     def verify(path):
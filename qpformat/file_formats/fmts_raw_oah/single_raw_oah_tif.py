@@ -1,15 +1,17 @@
 from os import fspath
 import pathlib
 
-import qpimage
 import tifffile
 
 from ..single_base import SingleData
+from ..tiff_signature import NotATiffFileError, read_ifd_tags
+from ..util import MAGIC_TIFF
 
 
 class SingleRawOAHTif(SingleData):
     """Off-axis hologram image (TIFF format)"""
     storage_type = "raw-oah"
+    magic_bytes = MAGIC_TIFF
 
     @staticmethod
     def _get_tif(path):
@@ -39,28 +41,25 @@ class SingleRawOAHTif(SingleData):
 
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
-        # Load experimental data
+        return self._get_qpimage_raw_oah(idx)
+
+    def get_raw_data(self, idx=0):
+        """Return the hologram"""
         with SingleRawOAHTif._get_tif(self.path) as tf:
-            holo = tf.pages[0].asarray()
-        qpi = qpimage.QPImage(data=holo,
-                              which_data="raw-oah",
-                              meta_data=self.get_metadata(idx),
-                              qpretrieve_kw=self.qpretrieve_kw,
-                              h5dtype=self.as_type)
-        return qpi
+            return tf.pages[0].asarray()
 
     @staticmethod
     def verify(path):
-        """Verify that `path` is a valid TIFF file"""
+        """Verify that `path` is a valid single-page TIFF file
+
+        Only the TIFF header and the first IFD are read.
+        """
         valid = False
         try:
-            tf = SingleRawOAHTif._get_tif(path)
-        except (ValueError, IsADirectoryError, KeyError,
-                tifffile.tifffile.TiffFileError):
+            _, more = read_ifd_tags(path, max_pages=1)
+        except (NotATiffFileError, OSError):
             pass
         else:
-            if len(tf.pages) == 1:
+            if not more:
                 valid = True
-            if not hasattr(path, "seek"):
-                tf.close()
         return valid
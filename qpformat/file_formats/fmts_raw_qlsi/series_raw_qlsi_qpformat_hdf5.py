@@ -1,11 +1,11 @@
 import copy
-import functools
 
-import h5py
 import numpy as np
 import qpimage
 
-from ..series_base import SeriesData
+from .. import raw_hdf5_layout, retrieve_oah, retrieve_qlsi
+from ..series_base import SeriesData, VALID_CHANNELS
+from ..util import MAGIC_HDF5
 
 
 class SeriesRawQLSIQpformatHDF5(SeriesData):
@@ -14,46 +14,110 @@ class SeriesRawQLSIQpformatHDF5(SeriesData):
     If you would like to have gradient-based background correction,
     you must store a reference image in the HDF5 dataset named
     "reference" (next to the "0", "1", etc. datasets with your
-    measurement data).
+    measurement data). The processed reference is cached and shared
+    with all other datasets that use the same reference data (see
+    :mod:`qpformat.file_formats.retrieve_qlsi`).
+
+    Both the "groups" and the "contiguous" layout are supported
+    (see :mod:`qpformat.file_formats.raw_hdf5_layout`).
     """
     storage_type = "raw-qlsi"
     priority = -10  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SeriesRawQLSIQpformatHDF5, self).__init__(*args, **kwargs)
-        # We keep a reference to the background data, because this way
-        # qpretrieve can keep a weak reference and remember the Fourier
-        # transform of the reference data.
+        # reference data and its hash (key for the processed reference)
         self._bg_data = None
+        self._bg_key = None
+        self._length = None
+        self._columns = None
 
-    @functools.cache
     def __len__(self):
-        with h5py.File(self.path) as h5:
-            has_ref = "reference" in h5
-            has_logs = "logs" in h5
-            return len(h5) - has_ref - has_logs
+        if self._length is None:
+            self._length = self._count_images()
+        return self._length
+
+    def _count_images(self):
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.count_images(h5)
+
+    def _get_attrs(self, idx, h5=None):
+        """Return all HDF5 attributes of the image at index `idx`
+
+        For the contiguous layout, the metadata of all images
+        are cached and the file is not opened again.
+        """
+        if self._columns is None or idx >= self._columns[0]:
+            if h5 is None:
+                with raw_hdf5_layout.open_file(self.path) as h5:
+                    return self._get_attrs(idx, h5)
+            elif raw_hdf5_layout.is_contiguous(h5):
+                self._columns = raw_hdf5_layout.read_columns(h5)
+            else:
+                return dict(h5[str(idx)].attrs)
+        return raw_hdf5_layout.attrs_from_columns(self._columns, idx)
 
     def get_time(self, idx):
         """Time for each dataset"""
-        with h5py.File(self.path) as h5:
-            ds = h5[str(idx)]
-            thetime = ds.attrs.get("time", np.nan)
-        return thetime
+        return self._get_attrs(idx).get("time", np.nan)
 
     def get_metadata(self, idx):
         """Get metadata directly from HDF5 attributes"""
         meta_data = {}
-        with h5py.File(self.path) as h5:
-            ds = h5[str(idx)]
-            attrs = dict(ds.attrs)
-            for key in qpimage.meta.META_KEYS:
-                if key in attrs:
-                    meta_data[key] = attrs[key]
+        attrs = self._get_attrs(idx)
+        for key in qpimage.meta.META_KEYS:
+            if key in attrs:
+                meta_data[key] = attrs[key]
 
         smeta = super(SeriesRawQLSIQpformatHDF5, self).get_metadata(idx)
         meta_data.update(smeta)
         return meta_data
 
+    def _get_image_arrays_raw(self, idx, channels=VALID_CHANNELS):
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            data = raw_hdf5_layout.read_image(h5, idx,
+                                              pool=self._buffer_pool)
+            qpretrieve_kw = self._get_frame_qpretrieve_kw(idx, h5)
+        pha, amp = retrieve_qlsi.retrieve_phase(data[np.newaxis],
+                                                qpretrieve_kw=qpretrieve_kw,
+                                                reference=self._bg_data,
+                                                reference_key=self._bg_key)
+        if "phase" in channels:
+            pha = retrieve_oah.process_phase(pha[0]).astype(self.as_type)
+        else:
+            pha = None
+        if "amplitude" in channels:
+            amp = amp[0].astype(self.as_type)
+        else:
+            amp = None
+        return pha, amp
+
+    def _get_frame_qpretrieve_kw(self, idx, h5, metadata=None):
+        """Return the qpretrieve keyword arguments for image `idx`
+
+        The wavelength and the QLSI pitch term are taken from the
+        metadata (unless they are set in `qpretrieve_kw`). This
+        also loads the optional reference data.
+        """
+        if metadata is None:
+            metadata = self.get_metadata(idx)
+        qpretrieve_kw = copy.deepcopy(self.qpretrieve_kw)
+        if "wavelength" in metadata:
+            qpretrieve_kw.setdefault("wavelength", metadata["wavelength"])
+        # try to get optional reference data
+        if self._bg_data is None:
+            if "reference" in h5:
+                self._bg_data = h5["reference"][:]
+                self._bg_key = retrieve_qlsi.get_reference_key(
+                    self._bg_data)
+        # get additional metadata required for data analysis
+        attrs = self._get_attrs(idx, h5)
+        if "qlsi_pitch_term" in attrs:
+            qpretrieve_kw.setdefault("qlsi_pitch_term",
+                                     attrs["qlsi_pitch_term"])
+        return qpretrieve_kw
+
     def get_qpimage_raw(self, idx):
         """Return raw QPImage (can already be background-corrected)
 
@@ -68,43 +132,65 @@ class SeriesRawQLSIQpformatHDF5(SeriesData):
         """
         # Get metadata
         metadata = self.get_metadata(idx)
-        qpretrieve_kw = copy.deepcopy(self.qpretrieve_kw)
-        if "wavelength" in metadata:
-            qpretrieve_kw.setdefault("wavelength", metadata["wavelength"])
         # Load experimental data
-        with h5py.File(self.path) as h5:
-            ds = h5[str(idx)]
-            data = ds[:]
-            # try to get optional reference data
-            if self._bg_data is None:
-                if "reference" in h5:
-                    self._bg_data = h5["reference"][:]
-            # get additional metadata required for data analysis
-            if "qlsi_pitch_term" in ds.attrs:
-                qpretrieve_kw.setdefault("qlsi_pitch_term",
-                                         ds.attrs["qlsi_pitch_term"])
-
-        qpi = qpimage.QPImage(data=data,
-                              bg_data=self._bg_data,
-                              which_data="raw-qlsi",
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            data = raw_hdf5_layout.read_image(h5, idx,
+                                              pool=self._buffer_pool)
+            qpretrieve_kw = self._get_frame_qpretrieve_kw(idx, h5, metadata)
+
+        pha, amp = retrieve_qlsi.retrieve_phase(data[np.newaxis],
+                                                qpretrieve_kw=qpretrieve_kw,
+                                                reference=self._bg_data,
+                                                reference_key=self._bg_key)
+        # The reference is already taken into account.
+        qpi = qpimage.QPImage(data=(pha[0], amp[0]),
+                              which_data=("phase", "amplitude"),
                               meta_data=metadata,
                               qpretrieve_kw=qpretrieve_kw,
                               h5dtype=self.as_type)
         return qpi
 
+    def get_raw_data(self, idx):
+        """Return the interferogram at index `idx`"""
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.read_image(h5, idx)
+
+    def get_raw_data_batch(self, indices, out=None):
+        """Return the interferograms at `indices` as a 3D array
+
+        For the contiguous layout, this is a single read.
+        """
+        with raw_hdf5_layout.open_file(self.path) as h5:
+            return raw_hdf5_layout.read_image_batch(h5, indices, out=out)
+
+    def refresh(self):
+        """Update the number of images (for files that are being written)
+
+        The file is opened in single-writer/multiple-reader (SWMR)
+        mode (if possible, see :func:`.raw_hdf5_layout.open_file`),
+        so the acquisition software may keep the file open
+        (in SWMR mode) while the data are being read. New images
+        are only visible after the writer has flushed the file.
+        If new images are found, the identifier of this dataset
+        (and thus of all of its images) changes.
+        """
+        old_size = len(self)
+        self._length = self._count_images()
+        if self._length != old_size:
+            # the data identifier depends on the file size
+            self._identifier_data_cache = None
+        return self._length - old_size
+
     @staticmethod
     def verify(path):
         """Verify that `path` is in the correct file format"""
         valid = False
         try:
-            h5 = h5py.File(path, mode="r")
+            h5 = raw_hdf5_layout.open_file(path)
         except (OSError,):
             pass
         else:
-            if (h5.attrs.get("file_format", "") == "qpformat"
-                and h5.attrs.get("imaging_modality", "") ==
-                    "quadriwave lateral shearing interferometry"
-                    and "0" in h5 and "1" in h5):
-                valid = True
+            valid = raw_hdf5_layout.verify_series(
+                h5, "quadriwave lateral shearing interferometry")
             h5.close()
         return valid
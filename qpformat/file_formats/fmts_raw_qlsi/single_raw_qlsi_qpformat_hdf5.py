@@ -1,9 +1,12 @@
 import copy
 
 import h5py
+import numpy as np
 import qpimage
 
+from .. import raw_hdf5_layout, retrieve_qlsi
 from ..single_base import SingleData
+from ..util import MAGIC_HDF5
 
 
 class SingleRawQLSIQpformatHDF5(SingleData):
@@ -12,12 +15,19 @@ class SingleRawQLSIQpformatHDF5(SingleData):
     If you would like to have gradient-based background correction,
     you must store a reference image in the HDF5 dataset named
     "reference" (next to the "0" dataset with your measurement data).
+    The processed reference is cached and shared with all other
+    datasets that use the same reference data (see
+    :mod:`qpformat.file_formats.retrieve_qlsi`).
     """
     storage_type = "raw-qlsi"
     priority = -10  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SingleRawQLSIQpformatHDF5, self).__init__(*args, **kwargs)
+        # reference data and its hash (key for the processed reference)
+        self._bg_data = None
+        self._bg_key = None
         # update meta data
         with h5py.File(self.path, mode="r") as h5:
             attrs = dict(h5["0"].attrs)
@@ -29,7 +39,7 @@ class SingleRawQLSIQpformatHDF5(SingleData):
     def get_metadata(self, idx=0):
         """Get metadata directly from HDF5 attributes"""
         meta_data = {}
-        with h5py.File(self.path) as h5:
+        with h5py.File(self.path, mode="r") as h5:
             ds = h5[str(idx)]
             attrs = dict(ds.attrs)
             for key in qpimage.meta.META_KEYS:
@@ -58,22 +68,27 @@ class SingleRawQLSIQpformatHDF5(SingleData):
         if "wavelength" in metadata:
             qpretrieve_kw.setdefault("wavelength", metadata["wavelength"])
         # Load experimental data
-        with h5py.File(self.path) as h5:
+        with h5py.File(self.path, mode="r") as h5:
             ds = h5["0"]
-            data = ds[:]
+            data = raw_hdf5_layout.read_image(h5, 0, pool=self._buffer_pool)
             # try to get optional reference data
-            if "reference" in h5:
-                bg_data = h5["reference"][:]
-            else:
-                bg_data = None
+            if self._bg_data is None:
+                if "reference" in h5:
+                    self._bg_data = h5["reference"][:]
+                    self._bg_key = retrieve_qlsi.get_reference_key(
+                        self._bg_data)
             # get additional metadata required for data analysis
             if "qlsi_pitch_term" in ds.attrs:
                 qpretrieve_kw.setdefault("qlsi_pitch_term",
                                          ds.attrs["qlsi_pitch_term"])
 
-        qpi = qpimage.QPImage(data=data,
-                              bg_data=bg_data,
-                              which_data="raw-qlsi",
+        pha, amp = retrieve_qlsi.retrieve_phase(data[np.newaxis],
+                                                qpretrieve_kw=qpretrieve_kw,
+                                                reference=self._bg_data,
+                                                reference_key=self._bg_key)
+        # The reference is already taken into account.
+        qpi = qpimage.QPImage(data=(pha[0], amp[0]),
+                              which_data=("phase", "amplitude"),
                               meta_data=self.get_metadata(idx),
                               qpretrieve_kw=qpretrieve_kw,
                               h5dtype=self.as_type)
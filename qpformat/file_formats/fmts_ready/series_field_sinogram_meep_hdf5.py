@@ -6,6 +6,7 @@ import numpy as np
 import qpimage
 
 from ..series_base import SeriesData
+from ..util import MAGIC_HDF5
 
 
 class NoSinogramDataFoundError(BaseException):
@@ -34,6 +35,7 @@ class SeriesFieldSinogramMeepHDF5(SeriesData):
     """
     priority = -9  # higher priority, because it's fast
     storage_type = "field"
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, path, meta_data=None, *args, **kwargs):
         """Initialize with default wavelength of 500nm"""
@@ -43,6 +45,8 @@ class SeriesFieldSinogramMeepHDF5(SeriesData):
             meta_data["wavelength"] = 500e-9
         super(SeriesFieldSinogramMeepHDF5, self).__init__(
             path=path, meta_data=meta_data, *args, **kwargs)
+        # sorted acquisition angles and their indices
+        self._angle_index = None
 
         # set background data
         with h5py.File(path, "r") as h5:
@@ -72,6 +76,39 @@ class SeriesFieldSinogramMeepHDF5(SeriesData):
                               SeriesHDF5GenericWarning)
                 return super(SeriesData, self).shape
 
+    def _get_angle_index(self):
+        """Return the sorted acquisition angles and their indices
+
+        The angles of all datasets are read in one pass and cached.
+        Datasets without an acquisition angle are not included.
+
+        Returns
+        -------
+        angles: 1d ndarray
+            Acquisition angles [rad] in ascending order (read-only)
+        indices: 1d ndarray
+            Dataset indices corresponding to `angles` (read-only)
+        """
+        if self._angle_index is None:
+            self._angle_index = self._read_angle_index()
+        return self._angle_index
+
+    def _read_angle_index(self):
+        """Read the acquisition angles (see `_get_angle_index`)"""
+        names = self._get_data_indices()
+        angles = np.full(len(names), np.nan)
+        with h5py.File(name=self.path, mode="r") as h5:
+            sino = h5["sinogram"]
+            for ii, name in enumerate(names):
+                attrs = sino[name]["field"].attrs
+                angles[ii] = attrs.get("ACQUISITION_PHI", np.nan)
+        indices = np.argsort(angles, kind="stable")
+        indices = indices[~np.isnan(angles[indices])]
+        angles = angles[indices]
+        angles.flags.writeable = False
+        indices.flags.writeable = False
+        return angles, indices
+
     @functools.lru_cache()
     def _get_data_indices(self):
         """Get all experiments from the hdf5 file"""
@@ -116,6 +153,87 @@ class SeriesFieldSinogramMeepHDF5(SeriesData):
         meta["sim model"] = "fdtd"
         return meta
 
+    def get_sorted_angles(self):
+        """Return the acquisition angles in ascending order
+
+        Returns
+        -------
+        angles: 1d ndarray
+            Acquisition angles [rad] in ascending order
+        indices: 1d ndarray
+            Dataset indices corresponding to `angles`
+
+        .. versionadded:: 0.15.0
+        """
+        angles, indices = self._get_angle_index()
+        return angles.copy(), indices.copy()
+
+    def indices_in_angle_range(self, angle_min, angle_max):
+        """Return the indices of all datasets within an angular range
+
+        Parameters
+        ----------
+        angle_min, angle_max: float
+            Angular range [rad] (inclusive); the range is not
+            wrapped around 2PI
+
+        Returns
+        -------
+        indices: 1d ndarray
+            Dataset indices sorted by angle
+
+        .. versionadded:: 0.15.0
+        """
+        angles, indices = self._get_angle_index()
+        start = np.searchsorted(angles, angle_min, side="left")
+        stop = np.searchsorted(angles, angle_max, side="right")
+        return indices[start:stop].copy()
+
+    def nearest_angle_index(self, angle):
+        """Return the index of the dataset closest to `angle`
+
+        The angular distance is computed modulo 2PI.
+
+        .. versionadded:: 0.15.0
+        """
+        angles, indices = self._get_angle_index()
+        dist = np.abs((angles - angle + np.pi) % (2 * np.pi) - np.pi)
+        return int(indices[np.argmin(dist)])
+
+    def subsample_angles(self, count):
+        """Return the indices of `count` evenly spaced angles
+
+        The target angles are evenly distributed over the angular
+        coverage of the series (assuming equidistant acquisition
+        angles, the last angle is one angular step away from the
+        end of the coverage) and the dataset with the nearest angle
+        is chosen for each target angle.
+
+        Parameters
+        ----------
+        count: int
+            Number of angles (at most the number of datasets)
+
+        Returns
+        -------
+        indices: 1d ndarray
+            Dataset indices sorted by angle
+
+        .. versionadded:: 0.15.0
+        """
+        angles, indices = self._get_angle_index()
+        if count < 1 or count > angles.size:
+            raise ValueError(f"`count` must be between 1 and {angles.size}, "
+                             + f"got '{count}'!")
+        elif angles.size == 1:
+            return indices.copy()
+        step = (angles[-1] - angles[0]) / (angles.size - 1)
+        targets = angles[0] + np.arange(count) * step * angles.size / count
+        # nearest sorted angle for every target angle
+        pos = np.clip(np.searchsorted(angles, targets), 1, angles.size - 1)
+        pos -= (targets - angles[pos - 1]) <= (angles[pos] - targets)
+        return indices[pos].copy()
+
     def get_metadata(self, idx):
         name = self._get_data_indices()[idx]
         with h5py.File(name=self.path, mode="r") as h5:
@@ -127,11 +245,75 @@ class SeriesFieldSinogramMeepHDF5(SeriesData):
         meta_data.update(smeta)
         return meta_data
 
+    def get_sinogram(self, out=None, dtype=np.complex64, bg_corrected=True):
+        """Return the complex fields of all angles as a 3D array
+
+        All fields are read in one file session directly into
+        `out`, which is much faster than assembling the sinogram
+        with `get_qpimage`.
+
+        Parameters
+        ----------
+        out: 3d complex ndarray or None
+            Array of shape (N_angles, Y, X) to write the sinogram to;
+            if None, a new array is allocated
+        dtype: dtype
+            Complex data type of the sinogram (ignored if `out`
+            is given)
+        bg_corrected: bool
+            Whether to divide the fields by the background field
+            (the "background" group of the file or the data set
+            with `set_bg`)
+
+        Returns
+        -------
+        sinogram: 3d complex ndarray
+            Complex fields of shape (N_angles, Y, X)
+        angles: 1d ndarray
+            Acquisition angles in radians (the "angle" metadata; NaN
+            if an angle is not defined)
+
+        .. versionadded:: 0.15.0
+        """
+        names = self._get_data_indices()
+        with h5py.File(name=self.path, mode="r") as h5:
+            sino = h5["sinogram"]
+            shape = (len(names),) + sino[names[0]]["field"].shape
+            if out is None:
+                out = np.empty(shape, dtype=dtype)
+            elif out.shape != shape:
+                raise ValueError(f"`out` must have the shape {shape}, "
+                                 + f"got {out.shape}!")
+            angles = np.full(len(names), np.nan)
+            for ii, name in enumerate(names):
+                dataset = sino[name]["field"]
+                dataset.read_direct(out, dest_sel=np.s_[ii])
+                angles[ii] = dataset.attrs.get("ACQUISITION_PHI", np.nan)
+
+        if bg_corrected and self._bgdata:
+            for ii in range(len(self._bgdata)):
+                if isinstance(self._bgdata, SeriesData):
+                    bg_pha, bg_amp = self._bgdata._get_image_arrays_raw(ii)
+                    bg_field = bg_amp * np.exp(1j * bg_pha)
+                else:
+                    # `self._bgdata` is a QPImage
+                    bg_field = self._bgdata[ii].field
+                if len(self._bgdata) == 1:
+                    # One background for all
+                    out /= bg_field
+                else:
+                    out[ii] /= bg_field
+        return out, angles
+
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
         name = self._get_data_indices()[idx]
         with h5py.File(name=self.path, mode="r") as h5:
-            data = h5["sinogram"][name]["field"][:]
+            dataset = h5["sinogram"][name]["field"]
+            # read the field with the precision of `as_type`
+            data = self._buffer_pool.get(
+                dataset.shape, np.result_type(self.as_type, np.complex64))
+            dataset.read_direct(data)
 
         qpi = qpimage.QPImage(data=data,
                               which_data="field",
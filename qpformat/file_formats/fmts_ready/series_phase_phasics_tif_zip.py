@@ -3,6 +3,7 @@ import functools
 import zipfile
 
 from ..series_base import SeriesData
+from ..util import MAGIC_ZIP
 from .single_phase_phasics_tif import SinglePhasePhasicsTif
 
 
@@ -14,6 +15,7 @@ class SeriesPhasePhasicsZipTif(SeriesData):
     """
     storage_type = "phase,intensity"
     priority = -1  # should get higher priority than SeriesZipTifHolo
+    magic_bytes = MAGIC_ZIP
 
     def __init__(self, *args, **kwargs):
         super(SeriesPhasePhasicsZipTif, self).__init__(*args, **kwargs)
@@ -28,13 +30,14 @@ class SeriesPhasePhasicsZipTif(SeriesData):
             self._dataset = [None] * len(self)
         if self._dataset[idx] is None:
             # Use ``zipfile.ZipFile.open`` to return an open file
-            zf = zipfile.ZipFile(self.path)
-            pt = zf.open(self.files[idx])
-            fd = io.BytesIO(pt.read())
+            with zipfile.ZipFile(self.path) as zf, \
+                    zf.open(self.files[idx]) as pt:
+                fd = io.BytesIO(pt.read())
             self._dataset[idx] = SinglePhasePhasicsTif(
                 path=fd,
                 meta_data=self.meta_data,
-                as_type=self.as_type)
+                as_type=self.as_type,
+                channels=self.channels)
         assert len(self._dataset[idx]) == 1, "unknown phasics tif file"
         return self._dataset[idx]
 
@@ -54,6 +57,15 @@ class SeriesPhasePhasicsZipTif(SeriesData):
                         phasefiles.append(name)
             return phasefiles
 
+    def close(self):
+        """Release the cached TIFF file data"""
+        if self._dataset is not None:
+            for ds in self._dataset:
+                if ds is not None:
+                    ds.close()
+            self._dataset = None
+        super(SeriesPhasePhasicsZipTif, self).close()
+
     @property
     def files(self):
         """List of Phasics tif file names in the input zip file"""
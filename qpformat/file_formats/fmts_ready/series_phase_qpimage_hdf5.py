@@ -1,41 +1,78 @@
 import h5py
 import qpimage
 
-from ..series_base import SeriesData
+from ..series_base import SeriesData, VALID_CHANNELS
+from ..util import MAGIC_HDF5
+from .single_phase_qpimage_hdf5 import (
+    copy_h5group, image_arrays_from_h5group, qpimage_from_h5group)
 
 
 class SeriesPhaseQpimageHDF5(SeriesData):
     """Qpimage series (HDF5 format)"""
     storage_type = "phase,amplitude"
     priority = -9  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SeriesPhaseQpimageHDF5, self).__init__(*args, **kwargs)
         self._dataset = None
+        #: HDF5 attributes of all QPImages (see `_get_attrs`)
+        self._attrs = None
         self._init_meta()
 
     def __len__(self):
-        with self._qpseries() as qps:
-            return len(qps)
+        self._get_attrs(0)
+        return len(self._attrs)
+
+    def _get_image_arrays(self, idx, channels=VALID_CHANNELS):
+        if self._bgdata:
+            # The user has explicitly chosen different background data
+            # using `get_qpimage_raw`.
+            return super(SeriesPhaseQpimageHDF5, self)._get_image_arrays(
+                idx, channels)
+        # Use the background data stored in the qpimage hdf5 file
+        with h5py.File(self.path, mode="r") as h5:
+            return image_arrays_from_h5group(
+                h5[self._h5_qpi_name(idx)],
+                channels=channels,
+                read_channels=self.channels or VALID_CHANNELS,
+                dtype=self.as_type)
+
+    def _get_attrs(self, idx):
+        """Return the HDF5 attributes of QPImage `idx`
+
+        The attributes of all QPImages are read in one pass (without
+        touching the image data) and cached.
+        """
+        if self._attrs is None:
+            attrs = []
+            with h5py.File(self.path, mode="r") as h5:
+                while self._h5_qpi_name(len(attrs)) in h5:
+                    group = h5[self._h5_qpi_name(len(attrs))]
+                    attrs.append(dict(group.attrs))
+            self._attrs = attrs
+        return self._attrs[idx]
 
     def _init_meta(self):
         # update meta data
-        with h5py.File(self.path, mode="r") as h5:
-            attrs = dict(h5["qpi_0"].attrs)
+        attrs = self._get_attrs(0)
         for key in qpimage.meta.META_KEYS:
             if (key not in self.meta_data
                     and key not in ["time"]  # do not override time
                     and key in attrs):
                 self.meta_data[key] = attrs[key]
 
-    def _qpseries(self):
-        return qpimage.QPSeries(h5file=self.path, h5mode="r")
+    def _h5_qpi_name(self, idx):
+        """Name of the HDF5 group that contains QPImage `idx`"""
+        return "qpi_{}".format(idx)
 
     def get_metadata(self, idx):
+        """Get metadata directly from HDF5 attributes"""
         meta_data = {}
-        with self._qpseries() as qps:
-            qpi = qps.get_qpimage(index=idx)
-            meta_data.update(qpi.meta)
+        attrs = self._get_attrs(idx)
+        for key in qpimage.meta.META_KEYS:
+            if key in attrs:
+                meta_data[key] = attrs[key]
 
         smeta = super(SeriesPhaseQpimageHDF5, self).get_metadata(idx)
         meta_data.update(smeta)
@@ -49,8 +86,16 @@ class SeriesPhaseQpimageHDF5(SeriesData):
             qpi = super(SeriesPhaseQpimageHDF5, self).get_qpimage(idx)
         else:
             # We can use the background data stored in the qpimage hdf5 file
-            with self._qpseries() as qps:
-                qpi = qps.get_qpimage(index=idx).copy()
+            with h5py.File(self.path, mode="r") as h5:
+                group = h5[self._h5_qpi_name(idx)]
+                if self.channels is not None:
+                    # Only read the requested channels
+                    qpi = qpimage_from_h5group(group,
+                                               channels=self.channels,
+                                               bg_corrected=True,
+                                               h5dtype=self.as_type)
+                else:
+                    qpi = copy_h5group(group, h5dtype=self.as_type)
             # Force meta data
             meta_data = self.get_metadata(idx)
             for key in meta_data:
@@ -59,10 +104,19 @@ class SeriesPhaseQpimageHDF5(SeriesData):
 
     def get_qpimage_raw(self, idx):
         """Return QPImage without background correction"""
-        with self._qpseries() as qps:
-            qpi = qps.get_qpimage(index=idx).copy()
-        # Remove previously performed background correction
-        qpi.set_bg_data(None)
+        with h5py.File(self.path, mode="r") as h5:
+            group = h5[self._h5_qpi_name(idx)]
+            if self.channels is not None:
+                # Only read the requested channels (without background data)
+                qpi = qpimage_from_h5group(group,
+                                           channels=self.channels,
+                                           bg_corrected=False,
+                                           h5dtype=self.as_type)
+            else:
+                # Do not copy the background data (previously performed
+                # background correction), but keep the background fit.
+                qpi = copy_h5group(group, bg_keys=["fit"],
+                                   h5dtype=self.as_type)
         # Force meta data
         meta_data = self.get_metadata(idx)
         for key in meta_data:
@@ -93,16 +147,15 @@ class SeriesPhaseQpimageSubjoinedHDF5(SeriesPhaseQpimageHDF5):
 
     def _init_meta(self):
         # update meta data
-        with h5py.File(self.path, mode="r") as h5:
-            attrs = dict(h5["qpseries/qpi_0"].attrs)
+        attrs = self._get_attrs(0)
         for key in qpimage.meta.META_KEYS:
             if (key not in self.meta_data
                     and key in attrs):
                 self.meta_data[key] = attrs[key]
 
-    def _qpseries(self):
-        h5 = h5py.File(self.path, mode="r")
-        return qpimage.QPSeries(h5file=h5["qpseries"])
+    def _h5_qpi_name(self, idx):
+        """Name of the HDF5 group that contains QPImage `idx`"""
+        return "qpseries/qpi_{}".format(idx)
 
     @staticmethod
     def verify(path):
@@ -5,6 +5,7 @@ import numpy as np
 import qpimage
 
 from ..single_base import SingleData
+from ..util import MAGIC_NPY
 
 
 class SingleFieldPhaseNumpyNpy(SingleData):
@@ -15,6 +16,8 @@ class SingleFieldPhaseNumpyNpy(SingleData):
     complex-valued (scattered field) or real-valued (phase).
     """
     # storage type is implemented as a property
+    magic_bytes = MAGIC_NPY
+    suffixes = (".npy",)
 
     @property
     @lru_cache(maxsize=32)
@@ -8,6 +8,8 @@ import qpimage
 import tifffile
 
 from ..single_base import SingleData
+from ..tiff_signature import NotATiffFileError, read_ifd_tags
+from ..util import MAGIC_TIFF
 
 
 # baseline clamp intensity normalization for phasics tif files
@@ -23,6 +25,24 @@ class LoadTifPhasicsError(BaseException):
     pass
 
 
+def decode_scaled_page(page, scale, offset, dtype="float32", clip_min=None,
+                       out=None):
+    """Decode a TIFF page and rescale it in the target dtype
+
+    Computes ``page.asarray() * scale + offset`` (optionally clipped
+    at `clip_min`) in-place in an array of type `dtype` (or in `out`),
+    i.e. no intermediate float64 arrays are created.
+    """
+    raw = page.asarray()
+    if out is None:
+        out = np.empty(raw.shape, dtype=dtype)
+    np.multiply(raw, scale, out=out, dtype=out.dtype)
+    out += offset
+    if clip_min is not None:
+        np.maximum(out, clip_min, out=out)
+    return out
+
+
 class SinglePhasePhasicsTif(SingleData):
     """Phasics image ("SID PHA*.tif")
 
@@ -37,13 +57,16 @@ class SinglePhasePhasicsTif(SingleData):
       tag "61238" of the tif file.
     """
     storage_type = "phase,intensity"
+    magic_bytes = MAGIC_TIFF
 
     def __init__(self, path, meta_data=None, *args, **kwargs):
         if meta_data is None:
             meta_data = {}
+        #: xml metadata from tag "61238" (section -> name -> value)
+        self._phasics_meta = SinglePhasePhasicsTif._parse_meta_data(path)
         if "wavelength" not in meta_data:
             # get wavelength if not given
-            wl = self._get_wavelength(path)
+            wl = self._get_wavelength()
             if not np.isnan(wl):
                 meta_data["wavelength"] = wl
             else:
@@ -55,26 +78,35 @@ class SinglePhasePhasicsTif(SingleData):
                                                     meta_data=meta_data,
                                                     *args, **kwargs)
 
+    def _get_meta_data(self, section, name):
+        """Return a value from the xml metadata (or None)"""
+        return self._phasics_meta.get(section, {}).get(name)
+
     @staticmethod
-    def _get_meta_data(path, section, name):
+    def _parse_meta_data(path):
+        """Parse the xml metadata stored in tag "61238"
+
+        Returns a dictionary of dictionaries that maps lower-case
+        section names to lower-case value names and their values.
+        If a section/name pair occurs more than once, the first
+        occurrence is kept.
+        """
         with SinglePhasePhasicsTif._get_tif(path) as tf:
             meta = tf.pages[0].tags[61238].value
         meta = meta.strip("'b")
         meta = meta.replace("\\n", "\n")
         meta = meta.replace("\\r", "")
         root = ET.fromstring("<root>\n" + meta + "</root>")
+        sections = {}
         for phadata in root:
             for cluster in phadata:
                 sec = cluster[0].text
                 for child in cluster:
                     if len(child) == 2:
                         nm, val = child
-                        # print(sec, nm.text, val.text)
-                        if (sec.lower() == section and
-                                nm.text.lower() == name):
-                            return val.text
-        else:
-            return None
+                        secdict = sections.setdefault(sec.lower(), {})
+                        secdict.setdefault(nm.text.lower(), val.text)
+        return sections
 
     @staticmethod
     def _get_tif(path):
@@ -86,11 +118,9 @@ class SinglePhasePhasicsTif(SingleData):
             path = fspath(path)
         return tifffile.TiffFile(path)
 
-    def _get_wavelength(self, path):
+    def _get_wavelength(self):
         for section in ["analyse data", "analyse data v1"]:
-            wl_str = SinglePhasePhasicsTif._get_meta_data(path=path,
-                                                          section=section,
-                                                          name="lambda(nm)")
+            wl_str = self._get_meta_data(section=section, name="lambda(nm)")
             if wl_str:
                 wavelength = float(wl_str) * 1e-9
                 break
@@ -105,10 +135,8 @@ class SinglePhasePhasicsTif(SingleData):
         """
         meta_data = {}
 
-        timestr = SinglePhasePhasicsTif._get_meta_data(
-            path=self.path,
-            section="acquisition info",
-            name="date & heure")
+        timestr = self._get_meta_data(section="acquisition info",
+                                      name="date & heure")
         if timestr is not None:
             timestr = timestr.replace(",", ".")
             timestrf, timeus = timestr.split(".")
@@ -126,19 +154,27 @@ class SinglePhasePhasicsTif(SingleData):
 
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
+        # All data are decoded directly in the target dtype
+        dtype = np.dtype(self.as_type)
         # Load experimental data
         with SinglePhasePhasicsTif._get_tif(self.path) as tf:
             # page 0 contains intensity
             # page 1 contains phase in nm
             # page 2 contains phase in wavelengths
             # Intensity:
-            inttags = tf.pages[0].tags
-            imin = inttags["61243"].value
-            imax = inttags["61242"].value
-            isamp = inttags[TIFF_TAGS["MaxSampleValue"]].value
-            blc = INTENSITY_BASELINE_CLAMP
-            inten = tf.pages[0].asarray() * (imax - imin) / isamp + imin - blc
-            inten[inten < 0] = 0
+            if self.has_channel("amplitude"):
+                inttags = tf.pages[0].tags
+                imin = inttags["61243"].value
+                imax = inttags["61242"].value
+                isamp = inttags[TIFF_TAGS["MaxSampleValue"]].value
+                blc = INTENSITY_BASELINE_CLAMP
+                inten = decode_scaled_page(page=tf.pages[0],
+                                           scale=(imax - imin) / isamp,
+                                           offset=imin - blc,
+                                           dtype=dtype,
+                                           clip_min=0)
+            else:
+                inten = None
             # Phase
             # The SID4Bio records two phase images, one in wavelengths and
             # one in nanometers. Surprisingly, these two phase images are
@@ -155,7 +191,7 @@ class SinglePhasePhasicsTif(SingleData):
             # the phase in nanometers from tf.pages[1] using the phasics
             # wavelength and then proceed as before, computing the phase
             # in radians using the correct, user-given wavelength.
-            wl_phasics = self._get_wavelength(self.path)
+            wl_phasics = self._get_wavelength()
             if not np.isnan(wl_phasics):
                 # proceed with phase in wavelengths
                 phaid = 1
@@ -166,43 +202,56 @@ class SinglePhasePhasicsTif(SingleData):
             pmin = phatags["61243"].value
             pmax = phatags["61242"].value
             psamp = phatags[TIFF_TAGS["MaxSampleValue"]].value
-            if psamp == 0 or pmin == pmax:
-                # no phase data
-                pha = np.zeros_like(inten)
+            if psamp == 0 or pmin == pmax or not self.has_channel("phase"):
+                # no phase data (or phase not requested)
+                pha = np.zeros(tf.pages[phaid].shape, dtype=dtype)
             else:
-                # optical path difference
-                opd = tf.pages[phaid].asarray() * (pmax - pmin) / psamp + pmin
+                # The optical path difference is
+                # ``asarray() * (pmax - pmin) / psamp + pmin``, which
+                # we convert to [rad] by fusing all factors.
+                # convert from [nm] to [rad]
+                factor = 2 * np.pi / (self.meta_data["wavelength"] * 1e9)
                 if phaid == 1:  # convert [wavelengths] to [nm]
                     assert not np.isnan(wl_phasics)
-                    opd *= wl_phasics * 1e9
-                # convert from [nm] to [rad]
-                pha = opd / (self.meta_data["wavelength"] * 1e9) * 2 * np.pi
+                    factor *= wl_phasics * 1e9
+                pha = decode_scaled_page(page=tf.pages[phaid],
+                                         scale=(pmax - pmin) / psamp * factor,
+                                         offset=pmin * factor,
+                                         dtype=dtype)
 
-        qpi = qpimage.QPImage(data=(pha, inten),
-                              which_data="phase,intensity",
+        if inten is None:
+            data = pha
+            which_data = "phase"
+        else:
+            data = (pha, inten)
+            which_data = "phase,intensity"
+
+        qpi = qpimage.QPImage(data=data,
+                              which_data=which_data,
                               meta_data=self.get_metadata(idx),
                               h5dtype=self.as_type)
         return qpi
 
     @staticmethod
     def verify(path):
-        """Verify that `path` is a phasics phase/intensity TIFF file"""
+        """Verify that `path` is a phasics phase/intensity TIFF file
+
+        Only the TIFF header and the IFDs are read.
+        """
         valid = False
         try:
-            tf = SinglePhasePhasicsTif._get_tif(path)
-        except (ValueError, IsADirectoryError, KeyError,
-                tifffile.tifffile.TiffFileError):
+            ifds, more = read_ifd_tags(path, max_pages=3,
+                                       decode_tags=[61242])
+        except (NotATiffFileError, OSError):
             pass
         else:
-            if (len(tf.pages) == 3 and
-                61243 in tf.pages[0].tags and
-                61242 in tf.pages[0].tags and
-                61238 in tf.pages[0].tags and
-                61243 in tf.pages[1].tags and
-                61242 in tf.pages[1].tags and
-                TIFF_TAGS["MaxSampleValue"] in tf.pages[0].tags and
-                (tf.pages[0].tags[61242].value !=
-                 tf.pages[1].tags[61242].value)):
+            if (len(ifds) == 3 and not more and
+                61243 in ifds[0] and
+                61242 in ifds[0] and
+                61238 in ifds[0] and
+                61243 in ifds[1] and
+                61242 in ifds[1] and
+                TIFF_TAGS["MaxSampleValue"] in ifds[0] and
+                    ifds[0][61242] != ifds[1][61242]):
                 valid = True
-            tf.close()
         return valid
@@ -1,7 +1,133 @@
 import h5py
+import numpy as np
 import qpimage
 
+from ..series_base import VALID_CHANNELS
 from ..single_base import SingleData
+from ..util import MAGIC_HDF5
+
+
+def copy_h5group(group, bg_keys=("data", "fit"), h5dtype="float32"):
+    """Copy a qpimage HDF5 group to a new in-memory QPImage
+
+    In contrast to :func:`qpimage.QPImage.copy`, the datasets are
+    copied by HDF5 (compressed data are not decompressed and
+    compressed again). Only the background data with the keys in
+    `bg_keys` are copied.
+    """
+    qpi = qpimage.QPImage(h5dtype=h5dtype)
+    qpi.h5.attrs.update(group.attrs)
+    for key in ["amplitude", "phase"]:
+        source = group[key]
+        target = qpi.h5[key]
+        target.attrs.update(source.attrs)
+        for name in source:
+            if name == "bg_data":
+                for bg_key in source[name]:
+                    if bg_key in bg_keys:
+                        source.copy(source[name][bg_key], target[name],
+                                    name=bg_key)
+            else:
+                source.copy(source[name], target, name=name)
+    return qpi
+
+
+def image_arrays_from_h5group(group, channels, read_channels=None,
+                              dtype="float32"):
+    """Return the background-corrected image data of a qpimage HDF5 group
+
+    Parameters
+    ----------
+    group: h5py.Group
+        HDF5 group of a QPImage
+    channels: list of str
+        Channels to return ("phase" and/or "amplitude"), the
+        other channel is None
+    read_channels: list of str
+        Channels to read from `group` (defaults to `channels`);
+        the phase of a channel that is not read is zero and its
+        amplitude one
+    dtype: str
+        Data type of the returned arrays
+
+    Notes
+    -----
+    No QPImage is created.
+    """
+    if read_channels is None:
+        read_channels = channels
+    data, bg_data = read_h5group(group,
+                                 channels=[ch for ch in channels
+                                           if ch in read_channels],
+                                 bg_corrected=True)
+    pha = amp = None
+    if "phase" in channels:
+        pha = np.asarray(data[0] - bg_data[0], dtype=dtype)
+    if "amplitude" in channels:
+        amp = np.asarray(data[1] / bg_data[1], dtype=dtype)
+    return pha, amp
+
+
+def qpimage_from_h5group(group, channels, bg_corrected=True,
+                         meta_data=None, h5dtype="float32"):
+    """Create an in-memory QPImage from a qpimage HDF5 group
+
+    Only the data of the given `channels` ("phase" and/or "amplitude")
+    are read from `group`. The phase of a channel that is not read is
+    set to zero and its amplitude to one. If `bg_corrected` is False,
+    the background data stored in `group` are not read.
+
+    The image data are read directly and written once to the new
+    QPImage. The background of each channel is stored as a single
+    background image (the background fit parameters are not copied).
+    """
+    data, bg_data = read_h5group(group, channels, bg_corrected)
+    qpi = qpimage.QPImage(data=data,
+                          which_data="phase,amplitude",
+                          meta_data=meta_data,
+                          proc_phase=False,
+                          h5dtype=h5dtype)
+    if bg_data is not None:
+        # The background phase must not be unwrapped again.
+        qpi.set_bg_data(bg_data,
+                        which_data="phase,amplitude",
+                        proc_phase=False)
+    return qpi
+
+
+def read_h5group(group, channels, bg_corrected=True):
+    """Read the image data of a qpimage HDF5 group
+
+    Parameters
+    ----------
+    group: h5py.Group
+        HDF5 group of a QPImage
+    channels: tuple of str
+        Channels to read ("phase" and/or "amplitude"); the phase of
+        a channel that is not read is zero and its amplitude one
+    bg_corrected: bool
+        Whether to read the (combined) background data
+
+    Returns
+    -------
+    data: list of 2d ndarrays
+        Raw phase and amplitude
+    bg_data: list of 2d ndarrays or None
+        Background phase and amplitude (None if `bg_corrected`
+        is False)
+    """
+    shape = group["phase"]["raw"].shape
+    data = [np.zeros(shape), np.ones(shape)]
+    bg_data = [np.zeros(shape), np.ones(shape)]
+    for ii, (key, imcls) in enumerate([("phase", qpimage.image_data.Phase),
+                                       ("amplitude",
+                                        qpimage.image_data.Amplitude)]):
+        if key in channels:
+            imdat = imcls(group[key])
+            data[ii] = imdat.raw
+            if bg_corrected:
+                bg_data[ii] = imdat.bg
+    return data, bg_data if bg_corrected else None
 
 
 class SinglePhaseQpimageHDF5(SingleData):
@@ -12,24 +138,39 @@ class SinglePhaseQpimageHDF5(SingleData):
     """
     storage_type = "phase,amplitude"
     priority = -9  # higher priority, because it's fast
+    magic_bytes = MAGIC_HDF5
 
     def __init__(self, *args, **kwargs):
         super(SinglePhaseQpimageHDF5, self).__init__(*args, **kwargs)
-        # update meta data
+        # HDF5 attributes (read once, without touching the image data)
         with h5py.File(self.path, mode="r") as h5:
-            attrs = dict(h5.attrs)
+            self._attrs = dict(h5.attrs)
+        # update meta data
         for key in qpimage.meta.META_KEYS:
             if (key not in self.meta_data
-                    and key in attrs):
-                self.meta_data[key] = attrs[key]
+                    and key in self._attrs):
+                self.meta_data[key] = self._attrs[key]
+
+    def _get_image_arrays(self, idx=0, channels=VALID_CHANNELS):
+        if self._bgdata:
+            # The user has explicitly chosen different background data
+            # using `get_qpimage_raw`.
+            return super(SinglePhaseQpimageHDF5, self)._get_image_arrays(
+                idx, channels)
+        # Use the background data stored in the qpimage hdf5 file
+        with h5py.File(self.path, mode="r") as h5:
+            return image_arrays_from_h5group(
+                h5,
+                channels=channels,
+                read_channels=self.channels or VALID_CHANNELS,
+                dtype=self.as_type)
 
     def get_metadata(self, idx=0):
+        """Get metadata directly from HDF5 attributes"""
         meta_data = {}
-        with qpimage.QPImage(h5file=self.path,
-                             h5mode="r",
-                             h5dtype=self.as_type,
-                             ) as qpi:
-            meta_data.update(qpi.meta)
+        for key in qpimage.meta.META_KEYS:
+            if key in self._attrs:
+                meta_data[key] = self._attrs[key]
 
         smeta = super(SinglePhaseQpimageHDF5, self).get_metadata()
         meta_data.update(smeta)
@@ -43,10 +184,15 @@ class SinglePhaseQpimageHDF5(SingleData):
             qpi = super(SinglePhaseQpimageHDF5, self).get_qpimage()
         else:
             # We can use the background data stored in the qpimage hdf5 file
-            qpi = qpimage.QPImage(h5file=self.path,
-                                  h5mode="r",
-                                  h5dtype=self.as_type,
-                                  ).copy()
+            with h5py.File(self.path, mode="r") as h5:
+                if self.channels is not None:
+                    # Only read the requested channels
+                    qpi = qpimage_from_h5group(h5,
+                                               channels=self.channels,
+                                               bg_corrected=True,
+                                               h5dtype=self.as_type)
+                else:
+                    qpi = copy_h5group(h5, h5dtype=self.as_type)
             # Force meta data
             meta_data = self.get_metadata()
             for key in meta_data:
@@ -55,12 +201,17 @@ class SinglePhaseQpimageHDF5(SingleData):
 
     def get_qpimage_raw(self, idx=0):
         """Return QPImage without background correction"""
-        qpi = qpimage.QPImage(h5file=self.path,
-                              h5mode="r",
-                              h5dtype=self.as_type,
-                              ).copy()
-        # Remove previously performed background correction
-        qpi.set_bg_data(None)
+        with h5py.File(self.path, mode="r") as h5:
+            if self.channels is not None:
+                # Only read the requested channels (without background data)
+                qpi = qpimage_from_h5group(h5,
+                                           channels=self.channels,
+                                           bg_corrected=False,
+                                           h5dtype=self.as_type)
+            else:
+                # Do not copy the background data (previously performed
+                # background correction), but keep the background fit.
+                qpi = copy_h5group(h5, bg_keys=["fit"], h5dtype=self.as_type)
         # Force meta data
         meta_data = self.get_metadata()
         for key in meta_data:
@@ -0,0 +1,201 @@
+"""Persistent sidecar index for folder-based datasets"""
+import json
+import os
+import pathlib
+import time
+
+
+#: name of the sidecar index file in a data folder
+INDEX_NAME = ".qpformat-index.json"
+#: version of the sidecar index file layout
+INDEX_VERSION = 1
+#: folder modification times younger than this are not trusted [ns]
+#: (file system timestamps are coarse, see "racy git")
+RACY_INTERVAL_NS = 2_000_000_000
+
+
+class FolderIndex(object):
+    """Sidecar index of the data files in a folder
+
+    For every file in the folder, the index stores the detected
+    file format (None for unsupported files), the file size and
+    modification time, and the number of images in the file
+    (if known). The index is only validated against the
+    modification time of the folder; if it changed (files were
+    added, removed, or renamed), the files are compared by size
+    and modification time and only new or changed files are
+    verified again.
+
+    Notes
+    -----
+    Files that are modified in-place without changing the
+    modification time of the folder are not detected. Use
+    `update(force=True)` to rescan all files.
+    """
+
+    def __init__(self, folder, persistent=True):
+        """
+        Parameters
+        ----------
+        folder: str or pathlib.Path
+            Path to the data folder
+        persistent: bool
+            Whether the index is stored in (and loaded from) the
+            index file in the folder; set this to False for an
+            in-memory index
+        """
+        #: data folder
+        self.folder = pathlib.Path(folder)
+        #: path to the index file
+        self.path = self.folder / INDEX_NAME
+        #: index entries (file name -> dictionary)
+        self.entries = {}
+        #: modification time of the folder when the index was updated
+        self.folder_mtime_ns = None
+        #: whether the index was changed since it was last saved
+        self.dirty = False
+        #: whether the index is stored in the index file
+        self.persistent = persistent
+        if self.exists:
+            self.load()
+
+    @property
+    def exists(self):
+        """Whether the index file exists in the folder"""
+        return self.persistent and self.path.exists()
+
+    def get_files(self):
+        """Sorted list of `(path, format)` of all supported files"""
+        return sorted((self.folder / name, entry["format"])
+                      for name, entry in self.entries.items()
+                      if entry["format"] is not None)
+
+    def get_length(self, name):
+        """Number of images in file `name` (None if unknown)"""
+        entry = self.entries.get(name)
+        return None if entry is None else entry["length"]
+
+    def load(self):
+        """Load the index from disk (invalid index files are ignored)"""
+        try:
+            with self.path.open("r") as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("qpformat index version") == INDEX_VERSION:
+            self.entries = data["files"]
+            self.folder_mtime_ns = data["folder mtime ns"]
+        else:
+            self.entries = {}
+            self.folder_mtime_ns = None
+        self.dirty = False
+
+    def save(self, ignore_errors=True):
+        """Write the index to disk
+
+        By default, errors (e.g. a read-only folder) are silently
+        ignored, because the index is only used for speeding
+        things up.
+
+        The index is written to a temporary file which then replaces
+        the index file. Note that this changes the modification time
+        of the folder, so the next `update` compares the files
+        again (without verifying unchanged files).
+        """
+        if not self.persistent:
+            self.dirty = False
+            return
+        # Write to a temporary file first, so that readers never see
+        # an incomplete index file.
+        tmp_path = self.path.with_name(f"{INDEX_NAME}.{os.getpid()}.tmp")
+        try:
+            with tmp_path.open("w") as fd:
+                json.dump({"qpformat index version": INDEX_VERSION,
+                           "folder mtime ns": self.folder_mtime_ns,
+                           "files": self.entries,
+                           },
+                          fd)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            if not ignore_errors:
+                raise
+        else:
+            self.dirty = False
+
+    def set_length(self, name, length):
+        """Set the number of images in file `name`"""
+        if self.entries[name]["length"] != length:
+            self.entries[name]["length"] = length
+            self.dirty = True
+
+    def update(self, verify_files, force=False, check_folder_mtime=True):
+        """Update the index incrementally and save it if necessary
+
+        Parameters
+        ----------
+        verify_files: callable
+            Function that returns the file format names (or None)
+            for a list of paths
+        force: bool
+            Verify all files, regardless of the state of the index
+        check_folder_mtime: bool
+            Skip comparing the files if the modification time of
+            the folder did not change; set this to False to detect
+            files that are modified in-place (e.g. during
+            acquisition)
+
+        Returns
+        -------
+        names: list of str
+            Names of the files that were added, modified, or removed
+        """
+        # Files that are added during the scan change the folder
+        # modification time after this point.
+        mtime = os.stat(self.folder).st_mtime_ns
+        if force:
+            self.entries = {}
+        elif (check_folder_mtime
+              and mtime == self.folder_mtime_ns
+              and time.time_ns() - mtime > RACY_INTERVAL_NS):
+            return []
+
+        current = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.startswith(INDEX_NAME) or entry.is_dir():
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # e.g. broken symlink
+                    continue
+                current[entry.name] = (st.st_size, st.st_mtime_ns)
+
+        changed = [name for name, (size, mtime_ns) in current.items()
+                   if (name not in self.entries
+                       or self.entries[name]["size"] != size
+                       or self.entries[name]["mtime ns"] != mtime_ns)]
+        removed = [name for name in self.entries if name not in current]
+        fmts = verify_files([self.folder / name for name in changed])
+        for name, fmt in zip(changed, fmts):
+            size, mtime_ns = current[name]
+            self.entries[name] = {"format": fmt,
+                                  "size": size,
+                                  "mtime ns": mtime_ns,
+                                  "length": None,
+                                  }
+        for name in removed:
+            self.entries.pop(name)
+
+        self.folder_mtime_ns = mtime
+        if changed or removed or force:
+            self.dirty = True
+            self.save()
+        # Otherwise, only the folder modification time changed (e.g.
+        # by saving the index). The index is not saved again, because
+        # that would change the folder modification time once more.
+        return changed + removed
@@ -0,0 +1,180 @@
+"""Access to the data layouts of the raw qpformat HDF5 file formats
+
+Two layouts are supported:
+
+- "groups": Every image is stored in a separate dataset ("0", "1",
+  ...) and its metadata are stored as attributes of that dataset.
+- "contiguous": All images are stored in a single chunked 3D
+  dataset "images" with the shape (N, Y, X). Metadata that are the
+  same for all images are stored as attributes of "images" and
+  image-specific metadata are stored as 1D datasets of length N
+  in the group "metadata" (e.g. "metadata/time", NaN-values denote
+  missing values). String metadata (e.g. "identifier") are stored
+  as variable-length string datasets (empty strings denote missing
+  values).
+
+In both layouts, the optional reference image is stored in the
+dataset "reference".
+"""
+import h5py
+import numpy as np
+
+
+#: name of the 3D image dataset in the "contiguous" layout
+IMAGES_KEY = "images"
+#: name of the group with the metadata columns in the "contiguous" layout
+METADATA_KEY = "metadata"
+
+
+def _empty(shape, dtype, pool=None):
+    """Return a new array or a buffer from `pool`"""
+    if pool is None:
+        return np.empty(shape, dtype=dtype)
+    else:
+        return pool.get(shape, dtype)
+
+
+def count_images(h5):
+    """Return the number of images in an open HDF5 file"""
+    if is_contiguous(h5):
+        return h5[IMAGES_KEY].shape[0]
+    else:
+        has_ref = "reference" in h5
+        has_logs = "logs" in h5
+        return len(h5) - has_ref - has_logs
+
+
+def is_contiguous(h5):
+    """Whether an open HDF5 file uses the "contiguous" layout"""
+    return IMAGES_KEY in h5
+
+
+def open_file(path):
+    """Open a raw qpformat HDF5 file for reading
+
+    The file is opened in single-writer/multiple-reader (SWMR) mode,
+    so that it can be opened while another process writes it in SWMR
+    mode. If that fails, the file is opened normally.
+    """
+    try:
+        return h5py.File(path, mode="r", swmr=True)
+    except OSError:
+        return h5py.File(path, mode="r")
+
+
+def read_attrs(h5, idx):
+    """Return all metadata of the image at index `idx` as a dictionary"""
+    if is_contiguous(h5):
+        return attrs_from_columns(read_columns(h5), idx)
+    else:
+        return dict(h5[str(idx)].attrs)
+
+
+def attrs_from_columns(columns, idx):
+    """Return all metadata of the image at index `idx` from `columns`
+
+    Parameters
+    ----------
+    columns: tuple
+        Metadata of the "contiguous" layout (see :func:`read_columns`)
+    idx: int
+        Image index
+    """
+    _, attrs, values = columns
+    attrs = dict(attrs)
+    for key in values:
+        value = values[key][idx]
+        # NaN or an empty string marks missing values
+        if isinstance(value, str):
+            if value:
+                attrs[key] = value
+        elif not (isinstance(value, np.floating) and np.isnan(value)):
+            attrs[key] = value
+    return attrs
+
+
+def read_columns(h5):
+    """Return all metadata of the "contiguous" layout
+
+    Every column is read with a single vector read.
+
+    Returns
+    -------
+    size: int
+        Number of images covered by the metadata
+    attrs: dict
+        Metadata that are the same for all images
+    values: dict of 1d ndarrays
+        Image-specific metadata
+    """
+    images = h5[IMAGES_KEY]
+    size = images.shape[0]
+    values = {}
+    meta = h5.get(METADATA_KEY, {})
+    for key in meta:
+        if h5py.check_string_dtype(meta[key].dtype):
+            values[key] = meta[key].asstr()[:size]
+        else:
+            values[key] = meta[key][:size]
+    return size, dict(images.attrs), values
+
+
+def read_image(h5, idx, out=None, pool=None):
+    """Return the image at index `idx`
+
+    The image is read into `out` or, if `out` is None, into a
+    buffer of the :class:`.buffer_pool.BufferPool` `pool` (if
+    given) or a new array.
+    """
+    if is_contiguous(h5):
+        ds = h5[IMAGES_KEY]
+        source_sel = np.s_[idx]
+    else:
+        ds = h5[str(idx)]
+        source_sel = None
+    if out is None:
+        out = _empty(ds.shape[-2:], ds.dtype, pool)
+    ds.read_direct(out, source_sel=source_sel)
+    return out
+
+
+def read_image_batch(h5, indices, out=None, pool=None):
+    """Return the images at `indices` as a 3D array
+
+    For the "contiguous" layout, consecutive indices are read
+    as a single hyperslab and otherwise with a single point
+    selection. See :func:`read_image` for `out` and `pool`.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if is_contiguous(h5):
+        ds = h5[IMAGES_KEY]
+        if out is None:
+            out = _empty((indices.size,) + ds.shape[1:], ds.dtype, pool)
+        if indices.size == 0:
+            pass
+        elif np.all(np.diff(indices) == 1):
+            ds.read_direct(out, source_sel=np.s_[indices[0]:indices[-1] + 1])
+        else:
+            # h5py requires increasing indices without duplicates
+            unique, inverse = np.unique(indices, return_inverse=True)
+            data = ds[unique]
+            out[:] = data[inverse]
+    else:
+        if out is None:
+            ds = h5[str(indices[0])]
+            out = _empty((indices.size,) + ds.shape, ds.dtype, pool)
+        for ii, idx in enumerate(indices):
+            read_image(h5, idx, out=out[ii])
+    return out
+
+
+def verify_series(h5, imaging_modality):
+    """Verify that an open HDF5 file is a raw qpformat series file"""
+    valid = False
+    if (h5.attrs.get("file_format", "") == "qpformat"
+            and h5.attrs.get("imaging_modality", "") == imaging_modality):
+        if is_contiguous(h5):
+            valid = len(h5[IMAGES_KEY].shape) == 3
+        else:
+            valid = "0" in h5 and "1" in h5
+    return valid
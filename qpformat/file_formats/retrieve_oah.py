@@ -0,0 +1,306 @@
+"""Batched phase retrieval from off-axis holograms
+
+The functions in this module reproduce the off-axis holography
+pipeline of :class:`qpretrieve.OffAxisHologram` for a stack of
+holograms: The forward Fourier transform, the sideband filtering,
+and the inverse Fourier transform are each computed for the
+entire stack with a single multi-threaded call to
+:func:`scipy.fft.fft2` or :func:`scipy.fft.ifft2`.
+
+All holograms of a stack are filtered with the same filter mask.
+If the sideband frequency is not given, it is determined from
+the first hologram (qpretrieve determines it for every hologram).
+
+In contrast to qpretrieve, the Fourier transforms are not
+frequency-shifted (the filter mask is shifted instead).
+
+Filter masks have the (zero-padded) shape of the Fourier transforms
+and can be large, so only the two most recently used masks are
+cached (two masks are used for QLSI data).
+"""
+import functools
+
+import numpy as np
+from qpretrieve import OffAxisHologram
+from qpretrieve.filter import get_filter_array
+from qpretrieve.interfere.if_oah import find_peak_cosine
+import scipy.fft
+from skimage.restoration import unwrap_phase
+
+
+#: default keyword arguments for the Fourier transform of holograms
+#: (see :class:`qpretrieve.interfere.BaseInterferogram`)
+DEFAULT_FFT_KWS = {
+    "subtract_mean": True,
+    "padding": 2,
+}
+
+
+def compute_filter_size(fft_shape, filter_size, filter_size_interpretation,
+                        sideband_freq):
+    """Compute the filter size in Fourier space (frequency coordinates)
+
+    See :func:`qpretrieve.interfere.BaseInterferogram.compute_filter_size`
+    """
+    if filter_size_interpretation == "frequency":
+        fsize = filter_size
+    elif filter_size_interpretation == "sideband distance":
+        if filter_size <= 0 or filter_size >= 1:
+            raise ValueError("For sideband distance interpretation, "
+                             "`filter_size` must be between 0 and 1; "
+                             f"got '{filter_size}'!")
+        fsize = np.sqrt(np.sum(np.array(sideband_freq)**2)) * filter_size
+    elif filter_size_interpretation == "frequency index":
+        if filter_size <= 0 or filter_size >= fft_shape[0] / 2:
+            raise ValueError("For frequency index interpretation, "
+                             + "`filter_size` must be between 0 and "
+                             + f"{fft_shape[0] / 2}, got '{filter_size}'!")
+        fsize = filter_size / fft_shape[0]
+    else:
+        raise ValueError("Invalid value for `filter_size_interpretation`: "
+                         + f"'{filter_size_interpretation}'")
+    return fsize
+
+
+def fft_holograms(data, subtract_mean=True, padding=2):
+    """Compute the Fourier transforms of a stack of holograms
+
+    Parameters
+    ----------
+    data: 3d ndarray
+        Holograms of shape (K, Y, X)
+    subtract_mean: bool
+        Subtract the mean of each hologram before the transform
+    padding: int
+        Zero-padding factor; the holograms are padded to a square
+        with the next power of two of ``padding * max(Y, X)``; set
+        to zero to disable padding
+
+    Returns
+    -------
+    fft: 3d complex ndarray
+        Fourier transforms (not frequency-shifted) of shape
+        (K, N, N), or (K, Y, X) without padding
+    """
+    data = np.asarray(data)
+    if data.ndim == 4:
+        # take the first slice (alpha or RGB information)
+        data = data[..., 0]
+    size, sx, sy = data.shape
+    if padding:
+        logfact = np.log(padding * max(sx, sy))
+        order = int(2 ** np.ceil(logfact / np.log(2)))
+        fft_shape = (order, order)
+    else:
+        fft_shape = (sx, sy)
+    dtype = complex if np.iscomplexobj(data) else float
+    padded = np.zeros((size,) + fft_shape, dtype=dtype)
+    padded[:, :sx, :sy] = data
+    if subtract_mean:
+        padded[:, :sx, :sy] -= padded[:, :sx, :sy].mean(
+            axis=(1, 2), keepdims=True)
+    return scipy.fft.fft2(padded, axes=(1, 2), overwrite_x=True, workers=-1)
+
+
+def filter_holograms(fft, image_shape, filter_name="disk",
+                     filter_size=1/3,
+                     filter_size_interpretation="sideband distance",
+                     scale_to_filter=False, sideband_freq=None,
+                     invert_phase=False, padding=2, cache_mask=True):
+    """Compute the complex fields from Fourier-transformed holograms
+
+    Parameters
+    ----------
+    fft: 3d complex ndarray
+        Fourier transforms from :func:`fft_holograms` (not modified,
+        so they can be filtered with different parameters)
+    image_shape: tuple of int
+        Shape of the holograms (before zero-padding)
+    filter_name, filter_size, filter_size_interpretation,
+    scale_to_filter, sideband_freq, invert_phase:
+        Pipeline keyword arguments (see
+        :func:`qpretrieve.OffAxisHologram.run_pipeline`); if
+        `sideband_freq` is None, it is determined from the
+        first hologram
+    padding: int
+        Zero-padding factor used in :func:`fft_holograms`
+    cache_mask: bool
+        Whether to cache the filter mask (see :func:`get_filter_mask`);
+        set this to False if the mask is used only once
+
+    Returns
+    -------
+    field: 3d complex ndarray
+        Complex fields of shape (K, Y, X) (smaller if
+        `scale_to_filter` is set)
+    """
+    osize = fft.shape[1]
+    if sideband_freq is None:
+        sideband_freq = find_sideband(fft[0])
+    sideband_freq = tuple(sideband_freq)
+    fsize = compute_filter_size(
+        fft_shape=fft.shape[1:],
+        filter_size=filter_size,
+        filter_size_interpretation=filter_size_interpretation,
+        sideband_freq=sideband_freq)
+    if cache_mask:
+        mask_func = get_filter_mask
+    else:
+        mask_func = get_filter_mask.__wrapped__
+    mask = mask_func(filter_name=filter_name,
+                     filter_size=fsize,
+                     sideband_freq=sideband_freq,
+                     fft_shape=fft.shape[1:])
+    # move the sideband to the origin
+    px = int(sideband_freq[0] * fft.shape[1])
+    py = int(sideband_freq[1] * fft.shape[2])
+    if scale_to_filter:
+        # only copy the central region (in frequency-shifted coordinates)
+        crad = int(np.ceil(fsize * osize * scale_to_filter))
+        csel = np.r_[0:crad, osize - crad:osize]
+        xsel = (csel + px) % fft.shape[1]
+        ysel = (csel + py) % fft.shape[2]
+        used = fft[:, xsel][:, :, ysel]
+        used *= mask[csel][:, csel]
+    else:
+        used = np.roll(fft, (-px, -py), axis=(1, 2))
+        used *= mask
+    field = scipy.fft.ifft2(used, axes=(1, 2), overwrite_x=True, workers=-1)
+    if padding:
+        # revert padding
+        sx, sy = image_shape
+        if scale_to_filter:
+            sx = int(np.ceil(sx * 2 * crad / osize))
+            sy = int(np.ceil(sy * 2 * crad / osize))
+        field = field[:, :sx, :sy]
+        if scale_to_filter:
+            field *= (2 * crad / osize)**2
+    if invert_phase:
+        field.imag *= -1
+    return field
+
+
+def find_sideband(fft):
+    """Find the sideband in the Fourier transform of a hologram
+
+    Parameters
+    ----------
+    fft: 2d complex ndarray
+        Fourier transform (not frequency-shifted) of a hologram
+
+    Returns
+    -------
+    fsx, fsy : tuple of floats
+        Coordinates of the sideband in Fourier space frequencies
+
+    See Also
+    --------
+    qpretrieve.interfere.if_oah.find_peak_cosine
+    """
+    return find_peak_cosine(np.fft.fftshift(fft), copy=False)
+
+
+@functools.lru_cache(maxsize=2)
+def get_filter_mask(filter_name, filter_size, sideband_freq, fft_shape):
+    """Return the (cached) filter mask for non-shifted Fourier transforms
+
+    The mask is shifted such that the sideband is at the origin
+    (apply it after moving the sideband to the origin).
+
+    Parameters
+    ----------
+    filter_name: str
+        Filter name (see :func:`qpretrieve.filter.get_filter_array`)
+    filter_size: float
+        Filter size in frequency coordinates
+    sideband_freq: tuple of floats
+        Sideband position in frequency coordinates
+    fft_shape: tuple of int
+        Shape of the Fourier transform
+
+    Returns
+    -------
+    mask: 2d ndarray
+        Read-only filter mask
+    """
+    filt = get_filter_array(filter_name=filter_name,
+                            filter_size=filter_size,
+                            freq_pos=tuple(sideband_freq),
+                            fft_shape=tuple(fft_shape))
+    px = int(sideband_freq[0] * fft_shape[0])
+    py = int(sideband_freq[1] * fft_shape[1])
+    mask = np.roll(np.fft.ifftshift(filt), (-px, -py), axis=(0, 1))
+    mask.flags.writeable = False
+    return mask
+
+
+def get_retrieval_kwargs(qpretrieve_kw):
+    """Split qpretrieve keyword arguments and fill in default values
+
+    Returns
+    -------
+    fft_kws: dict
+        Keyword arguments for :func:`fft_holograms`
+    pipeline_kws: dict
+        Keyword arguments for :func:`filter_holograms` (without
+        `padding`)
+    """
+    fft_kws = {}
+    for key in DEFAULT_FFT_KWS:
+        fft_kws[key] = qpretrieve_kw.get(key, DEFAULT_FFT_KWS[key])
+    pipeline_kws = {}
+    for key in OffAxisHologram.default_pipeline_kws:
+        pipeline_kws[key] = qpretrieve_kw.get(
+            key, OffAxisHologram.default_pipeline_kws[key])
+    return fft_kws, pipeline_kws
+
+
+def process_phase(pha):
+    """Unwrap the phase and remove 2PI offsets
+
+    This is the phase processing of :class:`qpimage.QPImage`
+    (the offset is estimated from a 1px-wide border around the
+    image).
+    """
+    nanmask = np.isnan(pha)
+    if np.sum(nanmask):
+        # skimage.restoration.unwrap_phase cannot handle nan data
+        pham = pha.copy()
+        pham[nanmask] = 0
+        pham = np.ma.masked_array(pham, mask=nanmask)
+        pha = unwrap_phase(pham, rng=47)
+        pha[nanmask] = np.nan
+    else:
+        pha = unwrap_phase(pha, rng=47)
+    border = np.concatenate((pha[0, :],
+                             pha[-1, :],
+                             pha[:, 0],
+                             pha[:, -1]))
+    twopi = 2 * np.pi
+    q, r = divmod(np.nanmin(border), twopi)
+    # closest result to zero
+    if np.abs(r) > twopi / 2:
+        q += np.sign(r)
+    pha -= q * twopi
+    return pha
+
+
+def retrieve_fields(data, qpretrieve_kw=None):
+    """Compute the complex fields from a stack of holograms
+
+    Parameters
+    ----------
+    data: 3d ndarray
+        Holograms of shape (K, Y, X)
+    qpretrieve_kw: dict
+        Keyword arguments for :class:`qpretrieve.OffAxisHologram`
+
+    Returns
+    -------
+    field: 3d complex ndarray
+        Complex fields (without phase unwrapping)
+    """
+    fft_kws, pipeline_kws = get_retrieval_kwargs(qpretrieve_kw or {})
+    fft = fft_holograms(data, **fft_kws)
+    return filter_holograms(fft, image_shape=np.shape(data)[1:3],
+                            padding=fft_kws["padding"], **pipeline_kws)
@@ -0,0 +1,303 @@
+"""Phase retrieval from quadriwave lateral shearing interferograms
+
+The functions in this module reproduce the QLSI pipeline of
+:class:`qpretrieve.QLSInterferogram` for a stack of interferograms.
+The Fourier transforms of the stack are computed with
+:mod:`qpformat.file_formats.retrieve_oah`.
+
+The reference data (for gradient-based background correction) are
+processed only once: The filtered gradient images of the reference
+are stored in a process-wide cache that is keyed by a hash of the
+reference data and the parameters that affect the reference
+processing (see :func:`get_reference_gradients`). Thus, datasets
+that share the same reference (e.g. many single-image files that
+contain a copy of the same reference) share the processed reference.
+"""
+import collections
+import hashlib
+import threading
+import warnings
+
+import numpy as np
+from qpretrieve import QLSInterferogram
+from qpretrieve.interfere.if_qlsi import find_peaks_qlsi, rotate_noreshape
+import scipy.fft
+from skimage.restoration import unwrap_phase
+
+from . import retrieve_oah
+
+
+#: maximum number of processed reference images kept in memory
+REFERENCE_CACHE_SIZE = 8
+
+_reference_cache = collections.OrderedDict()
+_reference_lock = threading.Lock()
+
+
+def clear_reference_cache():
+    """Remove all processed reference images from memory"""
+    with _reference_lock:
+        _reference_cache.clear()
+
+
+def compute_gradients(fft, image_shape, sideband_freq, filter_name="square",
+                      filter_size=0.5,
+                      filter_size_interpretation="sideband distance",
+                      scale_to_filter=False, padding=2):
+    """Filter the two gradient sidebands of Fourier-transformed data
+
+    Parameters
+    ----------
+    fft: 3d complex ndarray
+        Fourier transforms from
+        :func:`qpformat.file_formats.retrieve_oah.fft_holograms`
+    image_shape: tuple of int
+        Shape of the interferograms (before zero-padding)
+    sideband_freq: tuple of floats
+        Position of the x-gradient sideband (the y-gradient sideband
+        is rotated by 90°)
+    filter_name, filter_size, filter_size_interpretation,
+    scale_to_filter:
+        Pipeline keyword arguments (see
+        :func:`qpretrieve.QLSInterferogram.run_pipeline`)
+    padding: int
+        Zero-padding factor used for computing `fft`
+
+    Returns
+    -------
+    hx, hy: 3d complex ndarrays
+        Filtered x- and y-gradient images
+    """
+    fx, fy = sideband_freq
+    kw = dict(image_shape=image_shape,
+              filter_name=filter_name,
+              filter_size=filter_size,
+              filter_size_interpretation=filter_size_interpretation,
+              scale_to_filter=scale_to_filter,
+              padding=padding)
+    hx = retrieve_oah.filter_holograms(fft, sideband_freq=(fx, fy), **kw)
+    hy = retrieve_oah.filter_holograms(fft, sideband_freq=(-fy, fx), **kw)
+    return hx, hy
+
+
+def find_sideband(fft):
+    """Find the x-gradient sideband in the Fourier transform
+
+    Parameters
+    ----------
+    fft: 2d complex ndarray
+        Fourier transform (not frequency-shifted) of an interferogram
+
+    See Also
+    --------
+    qpretrieve.interfere.if_qlsi.find_peaks_qlsi
+    """
+    return find_peaks_qlsi(np.fft.fftshift(fft), copy=False)
+
+
+def get_reference_gradients(reference, sideband_freq, fft_kws,
+                            pipeline_kws, reference_key=None):
+    """Return the (cached) filtered gradient images of a reference
+
+    Parameters
+    ----------
+    reference: 2d ndarray
+        Reference interferogram
+    sideband_freq: tuple of floats
+        Position of the x-gradient sideband
+    fft_kws: dict
+        Keyword arguments for
+        :func:`qpformat.file_formats.retrieve_oah.fft_holograms`
+    pipeline_kws: dict
+        Pipeline keyword arguments (see :func:`get_retrieval_kwargs`)
+    reference_key: str or None
+        Hash of `reference` from :func:`get_reference_key`; pass
+        this to avoid hashing the reference data again
+
+    Returns
+    -------
+    hbx, hby: 2d complex ndarrays
+        Read-only filtered x- and y-gradient images of the reference
+    """
+    if reference_key is None:
+        reference_key = get_reference_key(reference)
+    key = (reference_key,
+           tuple(float(f) for f in sideband_freq),
+           tuple(sorted(fft_kws.items())),
+           pipeline_kws["filter_name"],
+           pipeline_kws["filter_size"],
+           pipeline_kws["filter_size_interpretation"],
+           pipeline_kws["scale_to_filter"],
+           )
+    with _reference_lock:
+        if key in _reference_cache:
+            _reference_cache.move_to_end(key)
+            return _reference_cache[key]
+    fft = retrieve_oah.fft_holograms(reference[np.newaxis], **fft_kws)
+    hbx, hby = compute_gradients(
+        fft,
+        image_shape=reference.shape[:2],
+        sideband_freq=sideband_freq,
+        filter_name=pipeline_kws["filter_name"],
+        filter_size=pipeline_kws["filter_size"],
+        filter_size_interpretation=pipeline_kws[
+            "filter_size_interpretation"],
+        scale_to_filter=pipeline_kws["scale_to_filter"],
+        padding=fft_kws["padding"])
+    hbx = hbx[0]
+    hby = hby[0]
+    hbx.flags.writeable = False
+    hby.flags.writeable = False
+    with _reference_lock:
+        _reference_cache[key] = hbx, hby
+        while len(_reference_cache) > REFERENCE_CACHE_SIZE:
+            _reference_cache.popitem(last=False)
+    return hbx, hby
+
+
+def get_reference_key(reference):
+    """Return a hash of the reference data for :func:`get_reference_gradients`
+    """
+    reference = np.ascontiguousarray(reference)
+    hasher = hashlib.sha256()
+    hasher.update(f"{reference.shape}{reference.dtype.str}".encode())
+    hasher.update(reference.data)
+    return hasher.hexdigest()
+
+
+def get_retrieval_kwargs(qpretrieve_kw):
+    """Split qpretrieve keyword arguments and fill in default values
+
+    Returns
+    -------
+    fft_kws: dict
+        Keyword arguments for
+        :func:`qpformat.file_formats.retrieve_oah.fft_holograms`
+    pipeline_kws: dict
+        QLSI pipeline keyword arguments (see
+        :func:`qpretrieve.QLSInterferogram.run_pipeline`)
+    """
+    fft_kws = {}
+    for key in retrieve_oah.DEFAULT_FFT_KWS:
+        fft_kws[key] = qpretrieve_kw.get(key,
+                                         retrieve_oah.DEFAULT_FFT_KWS[key])
+    pipeline_kws = {}
+    for key in QLSInterferogram.default_pipeline_kws:
+        pipeline_kws[key] = qpretrieve_kw.get(
+            key, QLSInterferogram.default_pipeline_kws[key])
+    return fft_kws, pipeline_kws
+
+
+def integrate_gradients(gx, gy, sideband_freq):
+    """Integrate the phase gradients to obtain the wavefront
+
+    Parameters
+    ----------
+    gx, gy: 2d ndarrays
+        Unwrapped phase gradients along the two grating axes
+    sideband_freq: tuple of floats
+        Position of the x-gradient sideband (defines the rotation
+        of the grating)
+
+    Returns
+    -------
+    wavefront: 2d ndarray
+        Integrated wavefront (not scaled)
+    size: int
+        Size of the (padded) integration domain along the first
+        axis (required for scaling the wavefront)
+    """
+    fx, fy = sideband_freq
+    angle = np.arctan2(fy, fx)
+    # Pad the gradients, so that we can rotate without cropping.
+    sx, sy = gx.shape
+    pad = ((sx // 2, sx // 2), (sy // 2, sy // 2))
+    rotated1 = rotate_noreshape(np.pad(gx, pad), -angle)
+    rotated2 = rotate_noreshape(np.pad(gy, pad), -angle)
+    # Integrate the total differential in Fourier space (x gradient
+    # in the real part and y gradient in the imaginary part).
+    fft = scipy.fft.fft2(rotated1 + 1j * rotated2, workers=-1)
+    kx = np.fft.fftfreq(fft.shape[0]).reshape(-1, 1)
+    ky = np.fft.fftfreq(fft.shape[1]).reshape(1, -1)
+    fxy = -2 * np.pi * 1j * (kx + 1j * ky)
+    fxy[0, 0] = 1
+    fft /= fxy
+    wfr = scipy.fft.ifft2(fft, overwrite_x=True, workers=-1).real
+    # Rotate back and crop to the original field of view.
+    wavefront = rotate_noreshape(wfr, angle)[sx//2:-sx//2, sy//2:-sy//2]
+    return wavefront, wfr.shape[0]
+
+
+def retrieve_phase(data, qpretrieve_kw=None, reference=None,
+                   reference_key=None):
+    """Compute phase and amplitude from a stack of QLSI interferograms
+
+    Parameters
+    ----------
+    data: 3d ndarray
+        Interferograms of shape (K, Y, X)
+    qpretrieve_kw: dict
+        Keyword arguments for :class:`qpretrieve.QLSInterferogram`;
+        if "sideband_freq" is not set, it is determined for every
+        interferogram
+    reference: 2d ndarray or None
+        Reference interferogram for background correction
+    reference_key: str or None
+        Hash of `reference` (see :func:`get_reference_key`)
+
+    Returns
+    -------
+    pha, amp: 3d ndarrays
+        Phase and amplitude images (the phase is not unwrapped
+        like in :class:`qpimage.QPImage`)
+    """
+    fft_kws, pipeline_kws = get_retrieval_kwargs(qpretrieve_kw or {})
+    pitch_term = pipeline_kws["qlsi_pitch_term"]
+    if pitch_term is None:
+        warnings.warn("No `qlsi_pitch_term` specified! Your phase data "
+                      "is only qualitative, not quantitatively correct!")
+        pitch_term = 1
+    wavelength = pipeline_kws["wavelength"]
+    if wavelength is None:
+        warnings.warn("No `wavelength` specified! Your phase data "
+                      "is only qualitative, not quantitatively correct!")
+        wavelength = 1
+
+    fft = retrieve_oah.fft_holograms(data, **fft_kws)
+    pha = None
+    for ii in range(fft.shape[0]):
+        sideband_freq = pipeline_kws["sideband_freq"]
+        if sideband_freq is None:
+            sideband_freq = find_sideband(fft[ii])
+        hx, hy = compute_gradients(
+            fft[ii:ii + 1],
+            image_shape=np.shape(data)[1:3],
+            sideband_freq=sideband_freq,
+            filter_name=pipeline_kws["filter_name"],
+            filter_size=pipeline_kws["filter_size"],
+            filter_size_interpretation=pipeline_kws[
+                "filter_size_interpretation"],
+            scale_to_filter=pipeline_kws["scale_to_filter"],
+            padding=fft_kws["padding"])
+        hx = hx[0]
+        hy = hy[0]
+        if reference is not None:
+            hbx, hby = get_reference_gradients(
+                reference,
+                sideband_freq=sideband_freq,
+                fft_kws=fft_kws,
+                pipeline_kws=pipeline_kws,
+                reference_key=reference_key)
+            hx /= hbx
+            hy /= hby
+        wavefront, size = integrate_gradients(
+            unwrap_phase(np.angle(hx)),
+            unwrap_phase(np.angle(hy)),
+            sideband_freq=sideband_freq)
+        wavefront *= pitch_term * fft.shape[1] / size
+        if pha is None:
+            pha = np.empty((fft.shape[0],) + wavefront.shape)
+            amp = np.empty((fft.shape[0],) + hx.shape)
+        pha[ii] = wavefront / wavelength * 2 * np.pi
+        amp[ii] = np.abs(hx) + np.abs(hy)
+    return pha, amp
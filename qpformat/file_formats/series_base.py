@@ -3,23 +3,38 @@ import copy
 import functools
 import io
 import pathlib
+import time
 import warnings
 
 import numpy as np
 import qpimage
 
+from . import retrieve_oah
+from .buffer_pool import BufferPool
 from .util import hash_obj
 
 
+#: image channels that can be selected via the `channels` keyword argument
+VALID_CHANNELS = ["phase", "amplitude"]
+
+
 class SeriesData(object):
     """Series data file format base class
     """
     __meta__ = abc.ABCMeta
     is_series = True
     priority = 0  # decrease to get higher priority
+    #: Magic bytes that files of this format start with (used for
+    #: quickly excluding file formats when scanning folders); an
+    #: empty tuple disables this check.
+    magic_bytes = ()
+    #: File name suffixes of this format (used for quickly excluding
+    #: file formats when scanning folders); an empty tuple disables
+    #: this check.
+    suffixes = ()
 
     def __init__(self, path, meta_data=None, holo_kw=None, qpretrieve_kw=None,
-                 as_type="float32"):
+                 as_type="float32", channels=None):
         """
         Parameters
         ----------
@@ -40,6 +55,14 @@ class SeriesData(object):
             numerical accuracy is required (does not apply for a
             simple 2D phase analysis), set this to double precision
             ("float64").
+        channels: tuple of str or None
+            Image channels to load (see :const:`VALID_CHANNELS`),
+            e.g. ``("phase",)`` if you are not interested in the
+            amplitude data. File formats that store the channels
+            separately do not read the other channels at all.
+            Channels that are not loaded are set to their neutral
+            value (zero phase or unit amplitude). The default (None)
+            loads all channels.
         """
         if qpretrieve_kw is None:
             qpretrieve_kw = {}
@@ -64,8 +87,20 @@ class SeriesData(object):
         if meta_data is None:
             meta_data = {}
 
+        if channels is not None:
+            channels = tuple(channels)
+            for ch in channels:
+                if ch not in VALID_CHANNELS:
+                    msg = f"Invalid channel `{ch}`! " \
+                          + f"Valid channels: {VALID_CHANNELS}"
+                    raise ValueError(msg)
+            if not channels:
+                raise ValueError("At least one channel must be selected!")
+
         #: Enforced dtype via keyword arguments
         self.as_type = as_type
+        #: Image channels to load (None means all channels)
+        self.channels = channels
         if isinstance(path, io.IOBase):
             # io.IOBase
             self.path = path
@@ -83,7 +118,12 @@ class SeriesData(object):
         self.meta_data = copy.copy(meta_data)
         #: Keyword arguments for interferometric phase retrieval
         self.qpretrieve_kw = qpretrieve_kw
+        self._qpretrieve_kw_effective = None
         self._bgdata = []
+        # reusable buffers for intermediate image data
+        self._buffer_pool = BufferPool()
+        # cached identifier of the data (see `_identifier_data`)
+        self._identifier_data_cache = None
         #: Unique string that identifies the background data that
         #: was set using `set_bg`.
         self.background_identifier = None
@@ -114,6 +154,12 @@ class SeriesData(object):
         rep = ", ".join([rep] + meta)
         return rep
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @abc.abstractmethod
     def __len__(self):
         """Return number of samples of a data set"""
@@ -147,8 +193,103 @@ class SeriesData(object):
         else:
             raise ValueError("Unknown background data type: {}".format(bg))
 
-    @functools.lru_cache(maxsize=32)
-    def _identifier_data(self):
+    def _get_image_arrays(self, idx, channels=VALID_CHANNELS):
+        """Return background-corrected phase and amplitude arrays
+
+        This is the array equivalent of `get_qpimage` (with the
+        dtype `as_type`). Only the channels in `channels` are
+        computed, the other channels are None.
+        """
+        pha, amp = self._get_image_arrays_raw(idx, channels)
+        if self._bgdata:
+            if len(self._bgdata) == 1:
+                # One background for all
+                bgidx = 0
+            else:
+                bgidx = idx
+
+            if isinstance(self._bgdata, SeriesData):
+                bg_pha, bg_amp = self._bgdata._get_image_arrays_raw(
+                    bgidx, channels)
+            else:
+                # `self._bgdata` is a QPImage
+                bg = self._bgdata[bgidx]
+                bg_pha = bg.pha if "phase" in channels else None
+                bg_amp = bg.amp if "amplitude" in channels else None
+            if pha is not None:
+                pha -= bg_pha
+            if amp is not None:
+                amp /= bg_amp
+        return pha, amp
+
+    def _get_image_arrays_raw(self, idx, channels=VALID_CHANNELS):
+        """Return phase and amplitude arrays without background correction
+
+        This is the array equivalent of `get_qpimage_raw`. File
+        formats should override this method if they can compute
+        the arrays faster than via `get_qpimage_raw`.
+        """
+        if self.storage_type == "raw-oah":
+            # (determine the sideband before reading into the buffer)
+            qpretrieve_kw = self.get_qpretrieve_kw()
+            field = retrieve_oah.retrieve_fields(
+                self._get_raw_data_pooled([idx]), qpretrieve_kw)[0]
+            pha = amp = None
+            if "phase" in channels:
+                pha = retrieve_oah.process_phase(np.angle(field))
+            if "amplitude" in channels:
+                amp = np.abs(field)
+        else:
+            qpi = self.get_qpimage_raw(idx)
+            pha = qpi.pha if "phase" in channels else None
+            amp = qpi.amp if "amplitude" in channels else None
+        return (None if pha is None else pha.astype(self.as_type, copy=False),
+                None if amp is None else amp.astype(self.as_type, copy=False))
+
+    @functools.lru_cache()
+    def _get_image_shape(self):
+        qpi0 = self.get_qpimage_raw(0)
+        return qpi0.shape[0], qpi0.shape[1]
+
+    def _pins_sideband(self):
+        """Whether the sideband is determined once for all images"""
+        return (self.storage_type == "raw-oah"
+                and self.qpretrieve_kw.get("sideband_freq") is None)
+
+    def _get_raw_data_pooled(self, indices):
+        """Return the raw image data at `indices` as a 3D array
+
+        In contrast to `get_raw_data_batch`, the returned array may
+        be a buffer of the dataset's buffer pool that is overwritten
+        by subsequent reads in the same thread. File formats that
+        can read their data into an existing array should override
+        this method and read into a buffer from `self._buffer_pool`
+        (in the dtype of the file, see :mod:`.buffer_pool`).
+        Callers must not read other images before they are done
+        with the data.
+        """
+        return self.get_raw_data_batch(indices)
+
+    def _get_qpimage_raw_oah(self, idx):
+        """Return the QPImage of the off-axis hologram at index `idx`
+
+        The field is computed with :mod:`.retrieve_oah` using the
+        keyword arguments from `get_qpretrieve_kw`. This yields the
+        same result as ``QPImage(which_data="raw-oah")``, but the
+        phase is only unwrapped once.
+        """
+        # (determine the sideband before reading into the buffer)
+        qpretrieve_kw = self.get_qpretrieve_kw()
+        field = retrieve_oah.retrieve_fields(
+            self._get_raw_data_pooled([idx]), qpretrieve_kw)
+        return qpimage.QPImage(data=field[0],
+                               which_data="field",
+                               meta_data=self.get_metadata(idx),
+                               qpretrieve_kw=qpretrieve_kw,
+                               h5dtype=self.as_type)
+
+    def _compute_identifier_data(self):
+        """Compute the identifier of the data (see `_identifier_data`)"""
         data = []
         # data
         if isinstance(self.path, io.IOBase):
@@ -161,6 +302,18 @@ class SeriesData(object):
         data += self._identifier_meta()
         return hash_obj(data)
 
+    def _identifier_data(self):
+        """Return the identifier of the data
+
+        The identifier is computed once and cached for this instance.
+        File formats that support `refresh` reset the cache (by
+        setting `_identifier_data_cache` to None) when new data
+        are found.
+        """
+        if self._identifier_data_cache is None:
+            self._identifier_data_cache = self._compute_identifier_data()
+        return self._identifier_data_cache
+
     @functools.lru_cache(maxsize=32)
     def _identifier_meta(self):
         data = []
@@ -171,6 +324,13 @@ class SeriesData(object):
         # qpretrieve keywords
         for key in sorted(list(self.qpretrieve_kw.keys())):
             data.append(f"{key}={self.qpretrieve_kw[key]}")
+        if self.is_series and self._pins_sideband():
+            # The sideband is determined once for the entire series
+            # (see `get_qpretrieve_kw`).
+            data.append("sideband_freq=series")
+        # channel selection
+        if self.channels is not None:
+            data.append("channels={}".format(",".join(self.channels)))
         return hash_obj(data)
 
     @property
@@ -184,15 +344,90 @@ class SeriesData(object):
         return idsum
 
     @property
-    @functools.lru_cache()
     def shape(self):
         """Return dataset shape (lenght, image0, image1).
 
         This should be overridden by the subclass, because by default
         the first qpimage is used for that.
+
+        .. versionchanged:: 0.15.0
+            only the image shape is cached (the length may change
+            for growing datasets, see `refresh`)
         """
-        qpi0 = self.get_qpimage_raw(0)
-        return len(self), qpi0.shape[0], qpi0.shape[1]
+        return (len(self),) + self._get_image_shape()
+
+    def close(self):
+        """Release open file handles and cached sub-datasets
+
+        The dataset can still be used afterwards (files are opened
+        again on demand). Subclasses that keep files open or cache
+        data must override this method (and call it). Datasets that
+        were set via `set_bg` are not closed.
+
+        .. versionadded:: 0.15.0
+        """
+        self._buffer_pool.clear()
+
+    def follow(self, poll_interval=1.0, timeout=None, start=0):
+        """Yield the indices of images as they become available
+
+        This is a generator for processing data during acquisition.
+        It yields the indices of all images from `start` on and then
+        calls `refresh` every `poll_interval` seconds to look for
+        new images.
+
+        Parameters
+        ----------
+        poll_interval: float
+            Time between two calls to `refresh` [s]
+        timeout: float or None
+            Stop if no new images were found for this duration [s];
+            if None, follow the dataset indefinitely
+        start: int
+            Index of the first image to yield
+
+        Examples
+        --------
+        >>> for idx in ds.follow(poll_interval=0.5, timeout=60):
+        ...     qpi = ds.get_qpimage(idx)
+
+        .. versionadded:: 0.15.0
+        """
+        idx = start
+        t_last = time.monotonic()
+        while True:
+            size = len(self)
+            if idx < size:
+                yield from range(idx, size)
+                idx = size
+                t_last = time.monotonic()
+            elif timeout is not None and time.monotonic() - t_last > timeout:
+                break
+            else:
+                time.sleep(poll_interval)
+            self.refresh()
+
+    def get_amplitude(self, idx):
+        """Return the background-corrected amplitude at index `idx`
+
+        This is equivalent to ``get_qpimage(idx).amp``, but file
+        formats that support it compute the amplitude without
+        creating a :class:`qpimage.QPImage` (and for raw off-axis
+        holography data, without unwrapping the phase).
+
+        .. versionadded:: 0.15.0
+        """
+        return self._get_image_arrays(idx, channels=["amplitude"])[1]
+
+    def get_field(self, idx):
+        """Return the background-corrected complex field at index `idx`
+
+        The field is computed from `get_amplitude` and `get_phase`.
+
+        .. versionadded:: 0.15.0
+        """
+        pha, amp = self._get_image_arrays(idx)
+        return amp * np.exp(1j * pha)
 
     def get_identifier(self, idx):
         """Return an identifier for the data at index `idx`
@@ -219,6 +454,21 @@ class SeriesData(object):
         """
         return "{}:{}".format(self.path, idx + 1)
 
+    def get_phase(self, idx):
+        """Return the background-corrected phase at index `idx`
+
+        This is equivalent to ``get_qpimage(idx).pha``, but file
+        formats that support it compute the phase without creating
+        a :class:`qpimage.QPImage`.
+
+        .. versionadded:: 0.15.0
+        """
+        return self._get_image_arrays(idx, channels=["phase"])[0]
+
+    def has_channel(self, channel):
+        """Return True if `channel` is loaded (see `channels`)"""
+        return self.channels is None or channel in self.channels
+
     def get_qpimage(self, idx):
         """Return background-corrected QPImage of data at index `idx`"""
         # raw data
@@ -252,12 +502,149 @@ class SeriesData(object):
         the "identifier" metadata key set!
         """
 
+    def get_raw_data(self, idx):
+        """Return the raw image data (e.g. hologram) at index `idx`
+
+        This is only supported by file formats that store raw
+        interferometric data and must be implemented by the subclass.
+        """
+        raise NotImplementedError(
+            f"`get_raw_data` not implemented for '{self.format}'!")
+
+    def get_raw_data_batch(self, indices, out=None):
+        """Return the raw image data at `indices` as a 3D array
+
+        Parameters
+        ----------
+        indices: list of int
+            Indices of the images to read
+        out: np.ndarray or None
+            Optional preallocated output array of shape
+            ``(len(indices), image0, image1)``
+
+        Subclasses may override this with a faster implementation.
+        """
+        for ii, idx in enumerate(indices):
+            data = self.get_raw_data(idx)
+            if out is None:
+                out = np.empty((len(indices),) + data.shape, dtype=data.dtype)
+            out[ii] = data
+        return out
+
+    def get_qpretrieve_kw(self):
+        """Return the keyword arguments used for phase retrieval
+
+        For raw off-axis holography data, the sideband is determined
+        only once from the first hologram of the dataset (unless
+        "sideband_freq" is set in `qpretrieve_kw`) and then used
+        for all holograms. This saves the sideband search for each
+        hologram and allows reusing the Fourier filter mask.
+
+        .. versionadded:: 0.15.0
+        """
+        if self._qpretrieve_kw_effective is None:
+            kw = copy.deepcopy(self.qpretrieve_kw)
+            # Set this first; datasets that read the first hologram
+            # from sub-datasets (e.g. SeriesFolder) create them with
+            # the original keyword arguments.
+            self._qpretrieve_kw_effective = kw
+            try:
+                if self._pins_sideband() and len(self):
+                    fft_kws, _ = retrieve_oah.get_retrieval_kwargs(kw)
+                    fft = retrieve_oah.fft_holograms(
+                        self._get_raw_data_pooled([0]), **fft_kws)
+                    kw["sideband_freq"] = tuple(
+                        float(ff) for ff in retrieve_oah.find_sideband(fft[0]))
+                else:
+                    # nothing to determine (yet)
+                    self._qpretrieve_kw_effective = None
+                    return kw
+            except BaseException:
+                self._qpretrieve_kw_effective = None
+                raise
+        return self._qpretrieve_kw_effective
+
+    def get_retrieved_batch(self, indices, batch_size=8):
+        """Return phase and amplitude of the data at `indices`
+
+        The phase and amplitude are the same as those of
+        ``get_qpimage_raw(idx)`` (no background correction). For
+        raw off-axis holography data, the holograms are processed
+        in batches of `batch_size` and the Fourier transforms of
+        each batch are computed with a single multi-threaded call
+        (see :mod:`qpformat.file_formats.retrieve_oah`), which is
+        much faster than retrieving the phase image by image. In
+        this case, the sideband is determined from the first
+        hologram of the dataset (index 0, unless it is set in
+        `qpretrieve_kw`) and used for all holograms (see
+        `get_qpretrieve_kw`).
+
+        Parameters
+        ----------
+        indices: list of int
+            Indices of the images
+        batch_size: int
+            Number of holograms that are processed at once; the
+            memory usage is about ``batch_size * 32 * N**2`` bytes
+            with the padded hologram size N (see the `padding`
+            keyword argument of qpretrieve)
+
+        Returns
+        -------
+        pha, amp: 3d ndarrays
+            Phase and amplitude images (with the dtype `as_type`)
+
+        .. versionadded:: 0.15.0
+        """
+        pha = amp = None
+        if self.storage_type == "raw-oah":
+            fft_kws, pipeline_kws = retrieve_oah.get_retrieval_kwargs(
+                self.get_qpretrieve_kw())
+            for start in range(0, len(indices), batch_size):
+                data = self._get_raw_data_pooled(
+                    indices[start:start + batch_size])
+                fft = retrieve_oah.fft_holograms(data, **fft_kws)
+                if pipeline_kws["sideband_freq"] is None:
+                    pipeline_kws["sideband_freq"] = \
+                        retrieve_oah.find_sideband(fft[0])
+                field = retrieve_oah.filter_holograms(
+                    fft, image_shape=data.shape[1:3],
+                    padding=fft_kws["padding"], **pipeline_kws)
+                if pha is None:
+                    shape = (len(indices),) + field.shape[1:]
+                    pha = np.empty(shape, dtype=self.as_type)
+                    amp = np.empty(shape, dtype=self.as_type)
+                for ii in range(field.shape[0]):
+                    pha[start + ii] = retrieve_oah.process_phase(
+                        np.angle(field[ii]))
+                    amp[start + ii] = np.abs(field[ii])
+        else:
+            for ii, idx in enumerate(indices):
+                qpi = self.get_qpimage_raw(idx)
+                if pha is None:
+                    shape = (len(indices),) + qpi.shape
+                    pha = np.empty(shape, dtype=self.as_type)
+                    amp = np.empty(shape, dtype=self.as_type)
+                pha[ii] = qpi.pha
+                amp[ii] = qpi.amp
+        return pha, amp
+
     def get_time(self, idx):
         warnings.warn("`get_time` is deprecated, use "
                       "`get_metadata().get('time', np.nan)` instead!",
                       DeprecationWarning)
         return self.get_metadata(idx).get('time', np.nan)
 
+    def refresh(self):
+        """Look for images that were added since the data were opened
+
+        Returns the number of new images. File formats that do not
+        support growing datasets always return 0.
+
+        .. versionadded:: 0.15.0
+        """
+        return 0
+
     def saveh5(self, h5file, qpi_slice=None, series_slice=None,
                time_interval=None, count=None, max_count=None):
         """Save the data set as an HDF5 file (qpimage.QPSeries format)
@@ -373,6 +760,77 @@ class SeriesData(object):
 
         self.background_identifier = self._compute_bgid()
 
+    def sweep_retrieval(self, idx, qpretrieve_kws, proc_phase=True):
+        """Retrieve the phase of one hologram with many parameter sets
+
+        The hologram at index `idx` is read only once and its Fourier
+        transform is computed only once for every distinct set of
+        Fourier transform parameters ("padding" and "subtract_mean").
+        All other parameters (e.g. "filter_name" or "filter_size")
+        are evaluated against the cached Fourier transform. If a
+        parameter set does not define "sideband_freq", the sideband
+        is determined from the hologram at `idx`.
+
+        Parameters
+        ----------
+        idx: int
+            Index of the hologram
+        qpretrieve_kws: list of dict
+            Keyword arguments for phase retrieval (each replaces
+            `qpretrieve_kw`)
+        proc_phase: bool
+            Unwrap the phase and remove 2PI offsets as done by
+            :class:`qpimage.QPImage`; set this to False to get the
+            wrapped phase (much faster)
+
+        Returns
+        -------
+        pha: 3d ndarray
+            Phase images (with the dtype `as_type`), one for each
+            item in `qpretrieve_kws`
+
+        Notes
+        -----
+        This is only implemented for raw off-axis holography data.
+        All parameter sets must yield images of the same shape
+        (which might not be the case for "scale_to_filter").
+
+        .. versionadded:: 0.15.0
+        """
+        if self.storage_type != "raw-oah":
+            raise NotImplementedError(
+                f"`sweep_retrieval` not implemented for '{self.format}'!")
+        data = self._get_raw_data_pooled([idx])
+        ffts = {}
+        sidebands = {}
+        pha = None
+        for ii, kw in enumerate(qpretrieve_kws):
+            fft_kws, pipeline_kws = retrieve_oah.get_retrieval_kwargs(kw)
+            key = tuple(sorted(fft_kws.items()))
+            if key not in ffts:
+                ffts[key] = retrieve_oah.fft_holograms(data, **fft_kws)
+            if pipeline_kws["sideband_freq"] is None:
+                if key not in sidebands:
+                    sidebands[key] = retrieve_oah.find_sideband(ffts[key][0])
+                pipeline_kws["sideband_freq"] = sidebands[key]
+            # Every parameter set might use a different filter mask.
+            field = retrieve_oah.filter_holograms(
+                ffts[key], image_shape=data.shape[1:3],
+                padding=fft_kws["padding"], cache_mask=False,
+                **pipeline_kws)[0]
+            if pha is None:
+                pha = np.empty((len(qpretrieve_kws),) + field.shape,
+                               dtype=self.as_type)
+            elif field.shape != pha.shape[1:]:
+                raise ValueError(f"Parameter set {ii} yields a phase image "
+                                 + f"of shape {field.shape}, expected "
+                                 + f"{pha.shape[1:]}: {kw}")
+            if proc_phase:
+                pha[ii] = retrieve_oah.process_phase(np.angle(field))
+            else:
+                pha[ii] = np.angle(field)
+        return pha
+
     @staticmethod
     @abc.abstractmethod
     def verify(path):
@@ -11,6 +11,12 @@ class SingleData(SeriesData, abc.ABC):
     def __len__(self):
         return 1
 
+    def get_amplitude(self, idx=0):
+        return super(SingleData, self).get_amplitude(idx=0)
+
+    def get_field(self, idx=0):
+        return super(SingleData, self).get_field(idx=0)
+
     def get_identifier(self, idx=0):
         return self.identifier
 
@@ -20,6 +26,9 @@ class SingleData(SeriesData, abc.ABC):
     def get_name(self, idx=0):
         return super(SingleData, self).get_name(idx=0)
 
+    def get_phase(self, idx=0):
+        return super(SingleData, self).get_phase(idx=0)
+
     def get_qpimage(self, idx=0):
         return super(SingleData, self).get_qpimage(idx=0)
 
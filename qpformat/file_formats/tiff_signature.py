@@ -0,0 +1,124 @@
+"""Lightweight TIFF header parsing for fast file format verification"""
+from os import fspath
+import struct
+
+
+#: struct format characters of single-valued TIFF tag data types
+TIFF_DTYPES = {
+    1: "B",  # BYTE
+    3: "H",  # SHORT
+    4: "I",  # LONG
+    6: "b",  # SBYTE
+    8: "h",  # SSHORT
+    9: "i",  # SLONG
+    11: "f",  # FLOAT
+    12: "d",  # DOUBLE
+    13: "I",  # IFD
+    16: "Q",  # LONG8
+    17: "q",  # SLONG8
+    18: "Q",  # IFD8
+}
+
+
+class NotATiffFileError(ValueError):
+    """Used when a file does not have a valid TIFF header"""
+    pass
+
+
+def read_ifd_tags(path, max_pages=1, decode_tags=()):
+    """Walk the IFD chain of a TIFF file with minimal reads
+
+    Only the IFD entries are read, no image data.
+
+    Parameters
+    ----------
+    path: str, pathlib.Path, or file object
+        The TIFF file
+    max_pages: int
+        Maximum number of IFDs to read
+    decode_tags: collection of int
+        Codes of single-valued numerical tags whose values should
+        be decoded (this requires an additional read if the value
+        is not stored in the IFD entry itself). The values of all
+        other tags are set to None.
+
+    Returns
+    -------
+    ifds: list of dict
+        For each IFD, a dictionary that maps tag codes to
+        their (decoded) values
+    more: bool
+        Whether the file contains more than `max_pages` IFDs
+
+    Raises
+    ------
+    NotATiffFileError
+        If the file does not have a valid TIFF header or if
+        the IFD chain is broken
+    """
+    if hasattr(path, "seek"):  # opened file
+        path.seek(0)
+        return _read_ifd_tags(path, max_pages, decode_tags)
+    else:
+        with open(fspath(path), "rb") as fd:
+            return _read_ifd_tags(fd, max_pages, decode_tags)
+
+
+def _read_ifd_tags(fd, max_pages, decode_tags):
+    header = fd.read(16)
+    if header[:2] == b"II":
+        bo = "<"
+    elif header[:2] == b"MM":
+        bo = ">"
+    else:
+        raise NotATiffFileError("Invalid TIFF byte order mark!")
+    if len(header) < 8:
+        raise NotATiffFileError("Truncated TIFF header!")
+    magic = struct.unpack(bo + "H", header[2:4])[0]
+    if magic == 42:
+        # classic TIFF
+        offset = struct.unpack(bo + "I", header[4:8])[0]
+        cnt_fmt, off_fmt, entry_fmt = "H", "I", "HHI4s"
+    elif magic == 43 and len(header) == 16:
+        # BigTIFF
+        offset = struct.unpack(bo + "Q", header[8:16])[0]
+        cnt_fmt, off_fmt, entry_fmt = "Q", "Q", "HHQ8s"
+    else:
+        raise NotATiffFileError("Invalid TIFF magic number!")
+    cnt_size = struct.calcsize(cnt_fmt)
+    off_size = struct.calcsize(off_fmt)
+    entry_size = struct.calcsize(bo + entry_fmt)
+
+    ifds = []
+    visited = set()
+    while offset and len(ifds) < max_pages:
+        if offset in visited:
+            raise NotATiffFileError("Circular IFD chain!")
+        visited.add(offset)
+        fd.seek(offset)
+        cnt_data = fd.read(cnt_size)
+        if len(cnt_data) != cnt_size:
+            raise NotATiffFileError("Truncated IFD!")
+        num = struct.unpack(bo + cnt_fmt, cnt_data)[0]
+        size = num * entry_size
+        data = fd.read(size + off_size)
+        if len(data) != size + off_size:
+            raise NotATiffFileError("Truncated IFD!")
+        tags = {}
+        for code, dtype, count, raw in struct.iter_unpack(bo + entry_fmt,
+                                                          data[:size]):
+            value = None
+            if code in decode_tags and count == 1 and dtype in TIFF_DTYPES:
+                fmt = bo + TIFF_DTYPES[dtype]
+                vsize = struct.calcsize(fmt)
+                if vsize > len(raw):
+                    # value is stored elsewhere in the file
+                    fd.seek(struct.unpack(bo + off_fmt, raw)[0])
+                    raw = fd.read(vsize)
+                    if len(raw) != vsize:
+                        raise NotATiffFileError("Truncated tag value!")
+                value = struct.unpack(fmt, raw[:vsize])[0]
+            tags[code] = value
+        ifds.append(tags)
+        offset = struct.unpack(bo + off_fmt, data[size:])[0]
+    return ifds, bool(offset)
@@ -1,8 +1,41 @@
 import hashlib
+import os
 
 import numpy as np
 
 
+#: magic bytes at the beginning of HDF5 files (without user block,
+#: see :func:`has_hdf5_user_block`)
+MAGIC_HDF5 = (b"\x89HDF\r\n\x1a\n",)
+#: magic bytes at the beginning of numpy binary files
+MAGIC_NPY = (b"\x93NUMPY",)
+#: magic bytes at the beginning of (Big)TIFF files
+MAGIC_TIFF = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+#: magic bytes at the beginning of zip files
+MAGIC_ZIP = (b"PK\x03\x04",)
+
+
+def has_hdf5_user_block(path):
+    """Whether `path` is an HDF5 file with a user block
+
+    In HDF5 files with a user block, the HDF5 signature is not at
+    the beginning of the file, but at offset 512, 1024, 2048, etc.
+    """
+    magic = MAGIC_HDF5[0]
+    try:
+        with open(path, "rb") as fd:
+            size = os.fstat(fd.fileno()).st_size
+            offset = 512
+            while offset + len(magic) <= size:
+                fd.seek(offset)
+                if fd.read(len(magic)) == magic:
+                    return True
+                offset *= 2
+    except OSError:
+        pass
+    return False
+
+
 def hash_obj(data, maxlen=5):
     hasher = hashlib.md5()
     tohash = obj2bytes(data)
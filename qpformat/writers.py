@@ -0,0 +1,360 @@
+"""Writers for the raw qpformat HDF5 file formats"""
+import numbers
+import pathlib
+import queue
+import threading
+
+import h5py
+import numpy as np
+
+from .file_formats.raw_hdf5_layout import IMAGES_KEY, METADATA_KEY
+
+
+#: imaging modality attribute for each raw storage type
+IMAGING_MODALITIES = {
+    "raw-oah": "off-axis holography",
+    "raw-qlsi": "quadriwave lateral shearing interferometry",
+}
+
+
+class RawHDF5SeriesWriter(object):
+    """Streaming writer for raw interferometric series data (HDF5)
+
+    The output files can be opened with the raw qpformat HDF5 file
+    formats (e.g. :class:`SeriesRawOAHQpformatHDF5`). With the
+    "groups" layout, each image is stored in its own dataset
+    ("0", "1", ...) together with its metadata as attributes. With
+    the "contiguous" layout, all images are stored in one 3D
+    dataset and the image-specific metadata as columns (see
+    :mod:`qpformat.file_formats.raw_hdf5_layout`). An optional
+    reference image is stored in the dataset "reference".
+
+    Images are written in batches of `batch_size`: the datasets
+    and attributes of a batch are written together and the file
+    is flushed once per batch.
+
+    The file is kept open for writing until :func:`close` is
+    called. In general, HDF5 file locking prevents other processes
+    from opening the file before that. Only the "contiguous"
+    layout with `swmr=True` allows reading the file while it is
+    being written: After the first batch has been written, readers
+    can open the file and see all complete images written so far
+    (see :func:`SeriesData.refresh`). If
+    `queue_size` is larger than zero, writing is done in a
+    background thread and :func:`append` only blocks when the
+    queue is full. Note that h5py does not release the GIL, so the
+    queue mainly smooths out latency spikes (e.g. when the file is
+    flushed) rather than increasing the throughput.
+
+    Examples
+    --------
+    >>> with RawHDF5SeriesWriter("data.h5", storage_type="raw-oah",
+    ...                          meta_data={"wavelength": 532e-9}) as w:
+    ...     for frame, time in camera_frames():
+    ...         w.append(frame, meta_data={"time": time})
+    """
+
+    def __init__(self, path, storage_type="raw-oah", meta_data=None,
+                 chunks=None, compression=None, compression_opts=None,
+                 batch_size=16, queue_size=64, layout="groups",
+                 swmr=False):
+        """
+        Parameters
+        ----------
+        path: str or pathlib.Path
+            Output file (will be overridden)
+        storage_type: str
+            Raw storage type (see :const:`IMAGING_MODALITIES`)
+        meta_data: dict
+            Metadata stored with every image (e.g. "wavelength"
+            or "pixel size", see :const:`qpimage.meta.META_KEYS`)
+        chunks: tuple or None
+            HDF5 chunk shape of each image dataset ("groups" layout)
+            or of the 3D image dataset ("contiguous" layout); by
+            default, every image is stored as a single chunk
+            (uncompressed images of the "groups" layout are not
+            chunked)
+        compression: str or None
+            HDF5 compression filter (e.g. "gzip" or "lzf")
+        compression_opts: int or None
+            Options for the compression filter (e.g. the gzip level)
+        batch_size: int
+            Number of images written before the file is flushed
+            (the flushed images are only visible to other processes
+            in SWMR mode)
+        queue_size: int
+            Maximum number of images waiting to be written; set
+            this to 0 to write in the calling thread
+        layout: str
+            Data layout ("groups" or "contiguous")
+        swmr: bool
+            Write the file in single-writer/multiple-reader mode
+            (requires the "contiguous" layout); SWMR mode is
+            enabled when the first batch is written, so the
+            reference image must be set before that and all
+            image-specific metadata keys must be present in the
+            first image
+        """
+        if storage_type not in IMAGING_MODALITIES:
+            raise ValueError(f"Invalid storage type `{storage_type}`! "
+                             + f"Valid types: {sorted(IMAGING_MODALITIES)}")
+        if batch_size < 1:
+            raise ValueError("`batch_size` must be at least 1!")
+        if layout not in ["groups", "contiguous"]:
+            raise ValueError(f"Invalid layout `{layout}`!")
+        if swmr and layout != "contiguous":
+            raise ValueError("SWMR requires the 'contiguous' layout!")
+
+        #: path to the output file
+        self.path = pathlib.Path(path)
+        #: raw storage type
+        self.storage_type = storage_type
+        #: metadata stored with every image
+        self.meta_data = dict(meta_data) if meta_data else {}
+        #: number of images written to the file so far
+        self.num_written = 0
+        #: number of images written before the file is flushed
+        self.batch_size = batch_size
+        #: data layout
+        self.layout = layout
+        #: whether SWMR mode is used
+        self.swmr = swmr
+        self._ds_kw = {"chunks": chunks,
+                       "compression": compression,
+                       "compression_opts": compression_opts,
+                       }
+        self._batch = []
+        # metadata column type ("number" or "string") for each key
+        self._column_kinds = {}
+        self._num_appended = 0
+        self._error = None
+        # libver="latest" allows readers to open the file in SWMR mode
+        self._h5 = h5py.File(self.path, mode="w", libver="latest")
+        self._h5.attrs["file_format"] = "qpformat"
+        self._h5.attrs["imaging_modality"] = IMAGING_MODALITIES[storage_type]
+        if queue_size > 0:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name="RawHDF5SeriesWriter")
+            self._thread.start()
+        else:
+            self._queue = None
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """Number of images appended (including queued images)"""
+        return self._num_appended
+
+    def _check_column_kinds(self, meta_data):
+        """Check the image-specific metadata for the "contiguous" layout
+
+        The metadata are stored in numeric or string columns, so
+        the type of the values of a key must not change.
+        """
+        for key, value in meta_data.items():
+            if isinstance(value, str):
+                kind = "string"
+            elif isinstance(value, numbers.Real):
+                kind = "number"
+            else:
+                raise ValueError(f"Invalid value for metadata key '{key}' "
+                                 + f"(expected number or string): {value!r}")
+            expected = self._column_kinds.setdefault(key, kind)
+            if kind != expected:
+                raise ValueError(f"Expected a {expected} for metadata key "
+                                 + f"'{key}', got {value!r}!")
+
+    def _check_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _process(self, item):
+        """Process one queue item (in the writer thread)"""
+        kind, data, meta_data = item
+        if kind == "image":
+            self._batch.append((data, meta_data))
+            if len(self._batch) >= self.batch_size:
+                self._write_batch()
+        elif kind == "reference":
+            self._write_dataset("reference", data, meta_data)
+            self._h5.flush()
+        elif kind == "flush":
+            self._write_batch()
+            data.set()  # threading.Event
+
+    def _run(self):
+        """Writer thread main loop"""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                elif self._error is None:
+                    self._process(item)
+                elif item[0] == "flush":
+                    # do not block `flush` after an error
+                    item[1].set()
+            except BaseException as e:
+                self._error = e
+                if item[0] == "flush":
+                    item[1].set()
+            finally:
+                self._queue.task_done()
+
+    def _submit(self, item):
+        self._check_error()
+        if self._queue is None:
+            self._process(item)
+        else:
+            self._queue.put(item)
+
+    def _write_batch(self):
+        """Write all images in the current batch and flush the file"""
+        if self._batch:
+            batch = self._batch
+            self._batch = []
+            if self.layout == "contiguous":
+                self._write_batch_contiguous(batch)
+            else:
+                for data, meta_data in batch:
+                    # Increment first, an image is never written twice.
+                    self.num_written += 1
+                    self._write_dataset(str(self.num_written - 1), data,
+                                        meta_data)
+            if self.swmr and not self._h5.swmr_mode:
+                self._h5.swmr_mode = True
+            self._h5.flush()
+
+    def _write_batch_contiguous(self, batch):
+        """Write a batch of images with one write per dataset"""
+        size = self.num_written
+        self.num_written += len(batch)
+        data = np.stack([item[0] for item in batch])
+        if IMAGES_KEY not in self._h5:
+            kw = dict(self._ds_kw)
+            if kw["chunks"] is None:
+                kw["chunks"] = (1,) + data.shape[1:]
+            images = self._h5.create_dataset(
+                IMAGES_KEY,
+                shape=(0,) + data.shape[1:],
+                maxshape=(None,) + data.shape[1:],
+                dtype=data.dtype,
+                **kw)
+            for key in self.meta_data:
+                images.attrs[key] = self.meta_data[key]
+            self._h5.create_group(METADATA_KEY)
+        images = self._h5[IMAGES_KEY]
+        columns = self._h5[METADATA_KEY]
+        # Write the metadata first; readers count the images.
+        keys = set(columns.keys())
+        for _, meta_data in batch:
+            keys.update(meta_data.keys())
+        for key in sorted(keys):
+            if key not in columns:
+                if self._h5.swmr_mode:
+                    raise ValueError(f"Cannot add metadata key '{key}' "
+                                     + "in SWMR mode!")
+                if self._column_kinds[key] == "string":
+                    # empty strings mark missing values
+                    col_kw = {"dtype": h5py.string_dtype()}
+                else:
+                    col_kw = {"dtype": float, "fillvalue": np.nan}
+                columns.create_dataset(key,
+                                       shape=(size,),
+                                       maxshape=(None,),
+                                       chunks=(max(self.batch_size, 256),),
+                                       **col_kw)
+            if self._column_kinds[key] == "string":
+                values = np.array([meta_data.get(key, "")
+                                   for _, meta_data in batch], dtype=object)
+            else:
+                values = np.array([meta_data.get(key, np.nan)
+                                   for _, meta_data in batch], dtype=float)
+            columns[key].resize((self.num_written,))
+            columns[key][size:] = values
+        images.resize(self.num_written, axis=0)
+        images[size:] = data
+
+    def _write_dataset(self, name, data, meta_data):
+        kw = dict(self._ds_kw)
+        if kw["chunks"] is None or len(kw["chunks"]) != data.ndim:
+            # one chunk per image (only required for compression)
+            kw["chunks"] = data.shape if kw["compression"] else None
+        ds = self._h5.create_dataset(name, data=data, **kw)
+        attrs = dict(self.meta_data)
+        attrs.update(meta_data)
+        for key in attrs:
+            ds.attrs[key] = attrs[key]
+
+    def append(self, data, meta_data=None):
+        """Append an image
+
+        Parameters
+        ----------
+        data: 2d ndarray
+            Raw image data (e.g. a hologram); the data are copied
+            if they are written in the background
+        meta_data: dict
+            Image-specific metadata (e.g. "time"); for the
+            "contiguous" layout, the values must be numbers or
+            strings and the type of a key must not change
+        """
+        data = np.asarray(data)
+        if data.ndim != 2:
+            raise ValueError(f"Expected 2D image data, got {data.shape}!")
+        if meta_data and self.layout == "contiguous":
+            self._check_column_kinds(meta_data)
+        if self._queue is not None:
+            # The caller might reuse the buffer (e.g. camera frames).
+            data = data.copy()
+        self._submit(("image", data, dict(meta_data) if meta_data else {}))
+        self._num_appended += 1
+
+    def close(self):
+        """Write all pending images and close the file"""
+        if self._h5 is None:
+            return
+        try:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+            if self._error is None:
+                self._write_batch()
+        finally:
+            self._h5.close()
+            self._h5 = None
+        self._check_error()
+
+    def flush(self):
+        """Write all pending images to the file and flush it
+
+        Unless the file is written in SWMR mode, other processes
+        can only read the file after it has been closed.
+        """
+        if self._queue is None:
+            self._check_error()
+            self._write_batch()
+        else:
+            done = threading.Event()
+            self._submit(("flush", done, None))
+            done.wait()
+            self._check_error()
+
+    def set_reference(self, data, meta_data=None):
+        """Store a reference image (e.g. for QLSI background correction)
+        """
+        if self.swmr and self.num_written:
+            raise ValueError("The reference image must be set before "
+                             + "images are written in SWMR mode!")
+        data = np.array(data, copy=True)
+        self._submit(("reference", data,
+                      dict(meta_data) if meta_data else {}))
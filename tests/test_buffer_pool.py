@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+import pathlib
+import threading
+import tracemalloc
+
+import h5py
+import numpy as np
+import pytest
+
+import qpformat
+from qpformat.file_formats.buffer_pool import BufferPool
+from qpformat.writers import RawHDF5SeriesWriter
+
+
+datapath = pathlib.Path(__file__).parent / "data"
+
+
+def make_series(path, layout):
+    """Write a raw OAH series with different holograms"""
+    with h5py.File(datapath / "series_hdf5_raw-oah.h5", "r") as h5:
+        holo = h5["0"][:]
+    with RawHDF5SeriesWriter(path, meta_data={"wavelength": 532e-9},
+                             layout=layout, queue_size=0) as w:
+        for ii in range(4):
+            w.append(np.roll(holo, 5 * ii, axis=1),
+                     meta_data={"time": float(ii)})
+    return path
+
+
+def test_buffer_pool():
+    pool = BufferPool(maxsize=2)
+    buf = pool.get((3, 4), "float32")
+    assert buf.shape == (3, 4)
+    assert buf.dtype == np.float32
+    assert pool.get([3, 4], np.float32) is buf
+    buf64 = pool.get((3, 4), "float64")
+    assert buf64 is not buf
+    assert len(pool) == 2
+    # the least recently used buffer is released
+    pool.get((4, 3), "float64")
+    assert len(pool) == 2
+    assert pool.get((3, 4), "float64") is buf64
+    assert pool.get((3, 4), "float32") is not buf
+    pool.clear()
+    assert len(pool) == 0
+
+
+@pytest.mark.parametrize("layout", ["groups", "contiguous"])
+def test_pooled_reads_bounded_allocations(tmp_path, layout):
+    ds = qpformat.load_data(make_series(tmp_path / "data.h5", layout))
+    nbytes = ds.get_raw_data(0).nbytes
+    # allocate the pooled buffer
+    data = ds._get_raw_data_pooled([0])
+    assert np.all(data[0] == ds.get_raw_data(0))
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for ii in range(20):
+            ds._get_raw_data_pooled([ii % len(ds)])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # no new image buffers were allocated
+    assert peak - base < nbytes / 2
+    assert ds._get_raw_data_pooled([1]) is data
+    assert np.all(data[0] == ds.get_raw_data(1))
+
+    # unpooled reads allocate a buffer for every image
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for ii in range(20):
+            ds.get_raw_data_batch([ii % len(ds)])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak - base > nbytes
+
+
+def test_pooled_reads_close(tmp_path):
+    ds = qpformat.load_data(make_series(tmp_path / "data.h5", "groups"))
+    pha0 = ds.get_phase(0)
+    assert len(ds._buffer_pool)
+    # the pooled buffer is not shared with returned data
+    assert not np.all(ds.get_phase(1) == pha0)
+    assert np.all(ds.get_phase(0) == pha0)
+    ds.close()
+    assert len(ds._buffer_pool) == 0
+
+
+def test_buffer_pool_threads():
+    pool = BufferPool()
+    buf = pool.get((3, 4), "float32")
+    other = []
+    thread = threading.Thread(
+        target=lambda: other.append(pool.get((3, 4), "float32")))
+    thread.start()
+    thread.join()
+    # threads do not share buffers
+    assert other[0] is not buf
+    assert pool.get((3, 4), "float32") is buf
+    pool.clear()
+    assert len(pool) == 0
+
+
+def test_pooled_reads_threads(tmp_path):
+    ds = qpformat.load_data(make_series(tmp_path / "data.h5", "contiguous"))
+    indices = list(range(len(ds))) * 4
+    ref = [ds.get_raw_data(idx) for idx in indices]
+
+    def read(idx):
+        # copy, because the pooled buffer is reused by the next read
+        return ds._get_raw_data_pooled([idx])[0].copy()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        data = list(pool.map(read, indices))
+    for ii in range(len(indices)):
+        assert np.all(data[ii] == ref[ii])
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        phases = list(pool.map(ds.get_phase, range(len(ds))))
+    for idx in range(len(ds)):
+        assert np.allclose(phases[idx], ds.get_phase(idx))
+
+
+@pytest.mark.parametrize("name", ["single_hdf5_raw-oah.h5",
+                                  "single_hdf5_raw-qlsi.h5"])
+def test_pooled_reads_single(name):
+    with h5py.File(datapath / name, "r") as h5:
+        raw = h5["0"][:]
+    ds = qpformat.load_data(datapath / name)
+    pha = ds.get_qpimage_raw().pha
+    # the raw data were read into a pooled buffer
+    buffers = list(ds._buffer_pool._get_buffers().values())
+    assert len(buffers) == 1
+    assert np.all(buffers[0].reshape(raw.shape) == raw)
+    assert np.all(ds.get_qpimage_raw().pha == pha)
+    # which is reused
+    assert list(ds._buffer_pool._get_buffers().values())[0] is buffers[0]
@@ -2,6 +2,7 @@ import pathlib
 import tempfile
 
 import numpy as np
+import pytest
 import qpimage
 
 import qpformat.core
@@ -53,6 +54,17 @@ def test_identifier():
     assert ds2.identifier == "b6d1c"
 
 
+def test_invalid_channels():
+    path = datapath / "series_phasics.zip"
+    for channels in [("intensity",), ()]:
+        try:
+            qpformat.load_data(path=path, channels=channels)
+        except ValueError:
+            pass
+        else:
+            assert False, "invalid channels should raise ValueError"
+
+
 def test_meta():
     data = np.ones((20, 20), dtype=float)
     tf = tempfile.mktemp(prefix="qpformat_test_", suffix=".npy")
@@ -190,12 +202,14 @@ def test_set_bg():
     bg1 = qpformat.core.load_data(path=f_bg_data)
     ds1.set_bg(bg1)
     assert np.allclose(ds1.get_qpimage().pha, data - bg_data)
+    assert np.allclose(ds1.get_phase(), data - bg_data)
 
     # set with QPImage
     ds2 = qpformat.core.load_data(path=f_data)
     bg2 = qpformat.core.load_data(path=f_bg_data)
     ds2.set_bg(bg2.get_qpimage())
     assert np.allclose(ds2.get_qpimage().pha, data - bg_data)
+    assert np.allclose(ds2.get_phase(), data - bg_data)
 
     # set with list
     ds3 = qpformat.core.load_data(path=f_data)
@@ -243,6 +257,7 @@ def test_set_bg_series():
     assert np.allclose(ds1.get_qpimage(0).pha, data1 - bg_data1)
     assert np.allclose(ds1.get_qpimage(1).pha, data2 - bg_data2)
     assert not np.allclose(ds1.get_qpimage(0).pha, data2 - bg_data2)
+    assert np.allclose(ds1.get_phase(1), data2 - bg_data2)
 
 
 def test_set_bg_qpimage():
@@ -260,6 +275,35 @@ def test_set_bg_qpimage():
     assert np.allclose(ds1.get_qpimage().pha, data - bg_data)
 
 
+@pytest.mark.parametrize("name,kwargs", [
+    ("single_qpimage.h5", {}),
+    ("single_qpimage.h5", {"channels": ["phase"]}),
+    ("series_hdf5_raw-oah.h5", {}),
+    ("single_hdf5_raw-qlsi.h5", {}),
+    ("single_holo.tif", {}),
+    ("single_phasics.tif", {}),
+])
+def test_image_arrays(name, kwargs):
+    ds = qpformat.core.load_data(datapath / name, **kwargs)
+    qpi = ds.get_qpimage(0)
+    pha = ds.get_phase(0)
+    amp = ds.get_amplitude(0)
+    assert pha.dtype == amp.dtype == np.float32
+    assert np.allclose(pha, qpi.pha, atol=1e-5, rtol=0)
+    assert np.allclose(amp, qpi.amp, atol=1e-5, rtol=0)
+    assert np.allclose(ds.get_field(0), qpi.field, atol=1e-5, rtol=1e-5)
+
+
+def test_image_arrays_bg():
+    path = datapath / "series_hdf5_raw-oah.h5"
+    ds = qpformat.core.load_data(path)
+    ds.set_bg(qpformat.core.load_data(path))
+    qpi = ds.get_qpimage(1)
+    assert np.allclose(ds.get_phase(1), qpi.pha, atol=1e-5, rtol=0)
+    assert np.allclose(ds.get_amplitude(1), qpi.amp, atol=1e-5, rtol=0)
+    assert np.allclose(ds.get_phase(1), 0, atol=1e-5, rtol=0)
+
+
 if __name__ == "__main__":
     # Run all tests
     loc = locals()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import qpretrieve
+
+from qpformat.file_formats import retrieve_oah
+
+
+def make_holograms(size=4, shape=(64, 60)):
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    holos = []
+    for ii in range(size):
+        pha = np.exp(-((x - 30)**2 + (y - 32)**2) / (100 + 10 * ii))
+        holos.append(128 + 100 * np.cos(2 * np.pi * (0.12 * x + 0.2 * y)
+                                        + pha))
+    return np.array(holos).astype(np.uint16)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"filter_name": "gauss", "filter_size": 0.4},
+    {"scale_to_filter": True},
+    {"scale_to_filter": 1.5, "filter_name": "smooth disk"},
+    {"filter_size": 10,
+     "filter_size_interpretation": "frequency index",
+     "invert_phase": True},
+    {"subtract_mean": False, "padding": 1},
+    {"sideband_freq": (-0.2, -0.12)},
+])
+def test_retrieve_fields_same_as_qpretrieve(kwargs):
+    holos = make_holograms()
+    field = retrieve_oah.retrieve_fields(holos, kwargs)
+    for ii, holo in enumerate(holos):
+        ref = qpretrieve.OffAxisHologram(holo, **kwargs).run_pipeline()
+        assert field[ii].shape == ref.shape
+        assert np.allclose(field[ii], ref, rtol=0, atol=1e-10)
+
+
+def test_retrieve_fields_shared_sideband():
+    holos = make_holograms()
+    fft = retrieve_oah.fft_holograms(holos)
+    sideband = retrieve_oah.find_sideband(fft[0])
+    oah = qpretrieve.OffAxisHologram(holos[0])
+    oah.run_pipeline()
+    assert np.allclose(sideband, oah.pipeline_kws["sideband_freq"])
+
+
+def test_filter_mask_cache():
+    holos = make_holograms(size=1)
+    fft = retrieve_oah.fft_holograms(holos)
+    retrieve_oah.get_filter_mask.cache_clear()
+    for filter_size in [0.2, 0.3, 0.4]:
+        field = retrieve_oah.filter_holograms(
+            fft, image_shape=holos.shape[1:], filter_size=filter_size)
+    # only the most recently used masks are kept
+    assert retrieve_oah.get_filter_mask.cache_info().currsize == 2
+    retrieve_oah.get_filter_mask.cache_clear()
+    field2 = retrieve_oah.filter_holograms(
+        fft, image_shape=holos.shape[1:], filter_size=0.4, cache_mask=False)
+    assert retrieve_oah.get_filter_mask.cache_info().currsize == 0
+    assert np.all(field == field2)
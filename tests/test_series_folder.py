@@ -3,6 +3,7 @@ import shutil
 import tempfile
 import zipfile
 
+import h5py
 import numpy as np
 import qpformat
 
@@ -81,6 +82,73 @@ def test_load_data():
     assert ds.__class__.__name__ == "SeriesFolder"
 
 
+def test_lazy_frame_offsets():
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="qpformat_"))
+    path = data_path / "series_phasics.zip"
+    shutil.copy2(path, tmp / "1.zip")
+    shutil.copy2(path, tmp / "2.zip")
+    ds_ref = qpformat.load_data(path)
+    size = len(ds_ref)
+    ds = qpformat.load_data(tmp)
+    assert len(ds) == 2 * size
+    assert ds._get_file_frame_index(size - 1) == (0, size - 1)
+    assert ds._get_file_frame_index(size) == (1, 0)
+    assert ds._get_file_frame_index(-1) == (1, size - 1)
+    assert np.all(ds.get_qpimage(-1).pha
+                  == ds_ref.get_qpimage(size - 1).pha)
+    try:
+        ds._get_file_frame_index(2 * size)
+    except IndexError:
+        pass
+    else:
+        assert False, "index out of range"
+
+
+def test_lazy_frame_offsets_single():
+    path, _ = setup_folder_single_h5(size=3)
+    ds = qpformat.load_data(path)
+    assert len(ds) == 3
+    # single-image files are not opened
+    assert not ds._series
+    assert ds._get_file_frame_index(2) == (2, 0)
+
+
+def test_max_open_files(monkeypatch):
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="qpformat_"))
+    path = data_path / "series_phasics.zip"
+    for ii in range(4):
+        shutil.copy2(path, tmp / "{}.zip".format(ii))
+    closed = []
+    zipcls = qpformat.file_formats.get_format_dict()[
+        "SeriesPhasePhasicsZipTif"]
+    close = zipcls.close
+
+    def close_counted(self):
+        closed.append(self.path.name)
+        close(self)
+
+    monkeypatch.setattr(zipcls, "close", close_counted)
+    with qpformat.load_data(tmp) as ds:
+        ds.max_open_files = 2
+        # all series files are opened to determine the length
+        size = len(ds) // 4
+        assert list(ds._series.keys()) == [2, 3]
+        assert closed == ["0.zip", "1.zip"]
+        closed.clear()
+        for ii in range(len(ds)):
+            ds.get_qpimage(ii)
+        assert list(ds._series.keys()) == [2, 3]
+        assert closed == ["2.zip", "3.zip", "0.zip", "1.zip"]
+        closed.clear()
+        # reopen a closed file
+        ds.get_qpimage(0)
+        assert list(ds._series.keys()) == [3, 0]
+    assert closed == ["2.zip", "0.zip", "3.zip"]
+    assert not ds._series
+    # the dataset can still be used
+    assert ds.get_qpimage(size).shape
+
+
 def test_multiple_formats_phasics_tif():
     """
     Folders with phasics tif files sometimes contain raw tif files.
@@ -125,6 +193,204 @@ def test_multiple_formats_error():
         assert False, "multiple formats should not be supported"
 
 
+def test_search_files_ignore_other_files():
+    path, files = setup_folder_single_holo(size=3)
+    (path / "notes.txt").write_text("not a data file")
+    (path / "empty.npy").write_bytes(b"")
+    (path / "subfolder").mkdir()
+    shutil.copy(files[0], path / "subfolder" / "data.tif")
+    fifo = qpformat.file_formats.fmt_series_folder.SeriesFolder._search_files(
+        path)
+    assert [ff[0] for ff in fifo] == sorted(files)
+    assert [ff[1] for ff in fifo] == ["SingleRawOAHTif"] * 3
+    # a file is not a folder
+    assert not qpformat.file_formats.fmt_series_folder.SeriesFolder.verify(
+        files[0])
+
+
+def test_search_files_hdf5_user_block():
+    path, files = setup_folder_single_h5(size=2)
+    # rewrite the second file with a user block
+    with h5py.File(data_path / "single_qpimage.h5", "r") as h5src, \
+            h5py.File(files[1], "w", userblock_size=1024) as h5:
+        for key in h5src.attrs:
+            h5.attrs[key] = h5src.attrs[key]
+        for key in h5src:
+            h5src.copy(key, h5)
+    with files[1].open("rb") as fd:
+        assert fd.read(8) != qpformat.file_formats.util.MAGIC_HDF5[0]
+    fifo = qpformat.file_formats.fmt_series_folder.SeriesFolder._search_files(
+        path)
+    assert [ff[0] for ff in fifo] == files
+    assert [ff[1] for ff in fifo] == ["SinglePhaseQpimageHDF5"] * 2
+
+
+def test_index_incremental_update(monkeypatch):
+    path, files = setup_folder_single_holo(size=2)
+    sf = qpformat.file_formats.fmt_series_folder
+    ds = qpformat.load_data(path)
+    ds.write_index()
+    assert (path / sf.INDEX_NAME).exists()
+
+    shutil.copy(files[0], path / "data0002.h5")
+    verified = []
+    verify_files = sf.verify_files
+
+    def verify_files_counted(paths):
+        verified.extend(paths)
+        return verify_files(paths)
+
+    monkeypatch.setattr(sf, "verify_files", verify_files_counted)
+    sf.SeriesFolder._search_files.cache_clear()
+    sf.SeriesFolder._get_index.cache_clear()
+    ds2 = qpformat.load_data(path)
+    assert len(ds2) == 3
+    # only the new file has been verified
+    assert verified == [path / "data0002.h5"]
+
+
+def test_index_file_added_during_scan(monkeypatch):
+    path, files = setup_folder_single_holo(size=2)
+    sf = qpformat.file_formats.fmt_series_folder
+    # trust the folder modification time immediately
+    monkeypatch.setattr(qpformat.file_formats.folder_index,
+                        "RACY_INTERVAL_NS", 0)
+
+    def verify_files_add(paths):
+        if not (path / "data0002.h5").exists():
+            # a file is added after the folder was scanned
+            shutil.copy(files[0], path / "data0002.h5")
+        return sf.verify_files(paths)
+
+    index = sf.FolderIndex(path)
+    index.update(verify_files_add)
+    assert len(index.get_files()) == 2
+    # no temporary files are left behind
+    assert sorted(pp.name for pp in path.glob(sf.INDEX_NAME + "*")) \
+        == [sf.INDEX_NAME]
+
+    index2 = sf.FolderIndex(path)
+    assert index2.update(sf.verify_files) == ["data0002.h5"]
+    assert len(index2.get_files()) == 3
+    # nothing changed since the index was saved
+    assert index2.update(sf.verify_files) == []
+
+
+def test_index_lengths_stored():
+    path, _ = setup_folder_single_h5(size=3)
+    sf = qpformat.file_formats.fmt_series_folder
+    qpformat.load_data(path).write_index()
+
+    sf.SeriesFolder._search_files.cache_clear()
+    sf.SeriesFolder._get_index.cache_clear()
+    ds = qpformat.load_data(path)
+    assert len(ds) == 3
+    # the data files do not have to be opened to get the length
+    assert not ds._series
+    ds_ref = qpformat.load_data(data_path / "single_qpimage.h5")
+    assert np.all(ds.get_qpimage(2).pha == ds_ref.get_qpimage().pha)
+
+
+def test_refresh():
+    path, files = setup_folder_single_holo(size=2)
+    (path / "notes.txt").write_text("not a data file")
+    ds = qpformat.load_data(path)
+    assert len(ds) == 2
+    ident = ds.identifier
+    assert ds.refresh() == 0
+    # new files are appended
+    shutil.copy(files[0], path / "data0003.h5")
+    shutil.copy(files[0], path / "data0000a.h5")
+    (path / "notes2.txt").write_text("not a data file")
+    assert ds.refresh() == 2
+    assert len(ds) == 4
+    assert ds.shape[0] == 4
+    assert ds.files == files + [path / "data0000a.h5", path / "data0003.h5"]
+    assert ds.identifier != ident
+    assert ds.get_qpimage(3).shape == ds.get_qpimage(0).shape
+    assert ds.refresh() == 0
+
+
+def test_refresh_identifiers(monkeypatch):
+    path, files = setup_folder_single_holo(size=2)
+    ds = qpformat.load_data(path)
+    other = qpformat.load_data(path)
+    assert len(ds) == 2
+    ident = ds.identifier
+    ident_other = other.identifier
+    assert ds.get_identifier(1) == f"{ident}:1:0:1"
+    # refreshing does not reset the identifier of other instances
+    monkeypatch.setattr(other, "_compute_identifier_data",
+                        lambda: 1 / 0)
+    shutil.copy(files[0], path / "data0010.h5")
+    assert ds.refresh() == 1
+    assert other.identifier == ident_other
+    # the common prefix of the file names changed
+    assert ds.identifier != ident
+    assert ds.get_identifier(1) == f"{ds.identifier}:01:0:1"
+    assert ds.get_identifier(2) == f"{ds.identifier}:10:0:2"
+
+
+def test_refresh_other_format(monkeypatch):
+    path, files = setup_folder_single_holo(size=2)
+    ds = qpformat.load_data(path)
+    assert len(ds) == 2
+    shutil.copy(data_path / "single_qpimage.h5", path / "data0002.h5")
+    assert ds.refresh() == 0
+    assert ds.files == files
+    # the file is not considered again
+    sf = qpformat.file_formats.fmt_series_folder
+    monkeypatch.setattr(sf, "verify_file_format", lambda *args, **kw: 1 / 0)
+    monkeypatch.setattr(ds, "_set_frame_offsets", lambda *args: 1 / 0)
+    assert ds.refresh() == 0
+    assert ds.files == files
+
+
+def test_refresh_with_index():
+    path, files = setup_folder_single_holo(size=2)
+    ds = qpformat.load_data(path)
+    ds.write_index()
+    shutil.copy(files[0], path / "data0002.h5")
+    assert ds.refresh() == 1
+    index = qpformat.file_formats.fmt_series_folder.FolderIndex(path)
+    assert index.get_files()[-1] == (path / "data0002.h5",
+                                     "SingleRawOAHTif")
+
+
+def test_refresh_shared_index(tmp_path):
+    for name in ["data0.h5", "data1.h5"]:
+        shutil.copy2(data_path / "series_hdf5_raw-oah.h5", tmp_path / name)
+    qpformat.load_data(tmp_path).write_index()
+    a = qpformat.load_data(tmp_path)
+    b = qpformat.load_data(tmp_path)
+    assert len(a) == 4
+    assert len(b) == 4
+    # acquisition software adds an image
+    with h5py.File(tmp_path / "data1.h5", "a") as h5:
+        h5["2"] = h5["0"][:]
+        for key in h5["0"].attrs:
+            h5["2"].attrs[key] = h5["0"].attrs[key]
+    # both instances share the sidecar index
+    assert a.refresh() == 1
+    assert len(a) == 5
+    assert b.refresh() == 1
+    assert len(b) == 5
+    assert np.all(b.get_qpimage(4).pha == b.get_qpimage(2).pha)
+    assert a.refresh() == 0
+    assert b.refresh() == 0
+
+
+def test_follow():
+    path, files = setup_folder_single_holo(size=2)
+    ds = qpformat.load_data(path)
+    indices = []
+    for idx in ds.follow(poll_interval=0.01, timeout=0.1):
+        indices.append(idx)
+        if idx == 1:
+            shutil.copy(files[0], path / "data0002.h5")
+    assert indices == [0, 1, 2]
+
+
 def test_series_format_qpretrieve_kw():
     """Siedband kwarg should be passed to subformats"""
     path, _files2 = setup_folder_single_holo()
@@ -87,6 +87,41 @@ def test_wrong_signal_type():
         assert "unknown" in str(w[-1].message)
 
 
+def test_single_pass_index(monkeypatch):
+    tdir, hspyf = make_hyperspy()
+    with h5py.File(hspyf, mode="a") as h5:
+        exps = h5["Experiments"]
+        for ii in range(20):
+            exps.copy(exps["Hologram of an HL60 cell"], f"Hologram {ii:02d}")
+            exps[f"Hologram {ii:02d}/axis-0"].attrs["scale"] = ii + 1
+            exps[f"Hologram {ii:02d}/axis-1"].attrs["scale"] = ii + 1
+        exps.copy(exps["Hologram 00"], "Other")
+        exps["Other/metadata/Signal"].attrs["signal_type"] = "unknown"
+
+    ds = qpformat.load_data(hspyf)
+
+    opened = []
+
+    class CountingFile(h5py.File):
+        def __init__(self, *args, **kwargs):
+            opened.append(kwargs.get("name", args[0] if args else None))
+            super(CountingFile, self).__init__(*args, **kwargs)
+
+    monkeypatch.setattr(h5py, "File", CountingFile)
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter("always")
+        assert len(ds) == 21
+        pxsizes = [ds.get_metadata(ii)["pixel size"] for ii in range(21)]
+        assert len(w) == 1
+        assert issubclass(w[-1].category, WrongSignalTypeWarnging)
+    # all experiments are scanned with a single file access
+    assert len(opened) == 1
+    # experiments are sorted by name
+    assert pxsizes[0] == 1e-9
+    assert pxsizes[19] == 20e-9
+    assert pxsizes[20] == 107e-9
+
+
 if __name__ == "__main__":
     # Run all tests
     loc = locals()
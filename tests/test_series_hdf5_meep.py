@@ -1,8 +1,14 @@
+import gc
 import pathlib
+import weakref
 
+import h5py
 import numpy as np
+import pytest
 import qpformat
 from qpformat.file_formats import WrongFileFormatError
+from qpformat.file_formats.fmts_ready.series_field_sinogram_meep_hdf5 import (
+    SeriesFieldSinogramMeepHDF5)
 
 
 data_dir = pathlib.Path(__file__).parent / "data"
@@ -42,6 +48,65 @@ def test_returned_identifier():
     assert "identifier" in qpiraw
 
 
+def test_angle_index(monkeypatch):
+    ds = qpformat.load_data(data_dir / "series_hdf5_meep.h5")
+    step = 2 * np.pi / 18
+    angles, indices = ds.get_sorted_angles()
+    assert np.all(np.diff(angles) > 0)
+    for ii in [0, 4, 17]:
+        assert np.allclose(angles[indices == ii],
+                           ds.get_metadata(ii)["angle"], atol=1e-7, rtol=0)
+
+    # the index is built once
+    monkeypatch.setattr(h5py, "File", None)
+    assert np.all(ds.indices_in_angle_range(2.5 * step, 5 * step + 1e-6)
+                  == [3, 4, 5])
+    assert ds.indices_in_angle_range(0.2 * step, 0.8 * step).size == 0
+    assert ds.nearest_angle_index(6.4 * step) == 6
+    assert ds.nearest_angle_index(6.6 * step) == 7
+    assert ds.nearest_angle_index(-0.2 * step) == 0
+    assert ds.nearest_angle_index(2 * np.pi - 0.4 * step) == 0
+    assert np.all(ds.subsample_angles(6) == [0, 3, 6, 9, 12, 15])
+    assert np.all(ds.subsample_angles(18) == np.arange(18))
+    assert ds.subsample_angles(4).size == 4
+    with pytest.raises(ValueError, match="between 1 and 18"):
+        ds.subsample_angles(19)
+
+
+def test_angle_index_not_kept_alive():
+    ds = qpformat.load_data(data_dir / "series_hdf5_meep.h5")
+    ds.get_sorted_angles()
+    ref = weakref.ref(ds)
+    del ds
+    SeriesFieldSinogramMeepHDF5._get_data_indices.cache_clear()
+    gc.collect()
+    # the angle index is not cached beyond the lifetime of the dataset
+    assert ref() is None
+
+
+def test_sinogram():
+    ds = qpformat.load_data(data_dir / "series_hdf5_meep.h5")
+    sino, angles = ds.get_sinogram()
+    assert sino.shape == (18, 47, 47)
+    assert sino.dtype == np.complex64
+    for ii in [0, 5, 17]:
+        qpi = ds.get_qpimage(ii)
+        assert np.allclose(sino[ii], qpi.field, rtol=1e-5, atol=1e-6)
+        assert np.allclose(angles[ii], qpi.meta["angle"], rtol=0, atol=1e-7)
+
+
+def test_sinogram_out():
+    ds = qpformat.load_data(data_dir / "series_hdf5_meep.h5")
+    out = np.zeros((18, 47, 47), dtype=np.complex128)
+    sino, _ = ds.get_sinogram(out=out, bg_corrected=False)
+    assert sino is out
+    qpi = ds.get_qpimage_raw(3)
+    assert np.allclose(sino[3], qpi.field, rtol=1e-5, atol=1e-6)
+
+    with pytest.raises(ValueError, match="shape"):
+        ds.get_sinogram(out=np.zeros((17, 47, 47), dtype=np.complex64))
+
+
 def test_user_defined_wavelength():
     """Special for FDTD data, because it is actually unit-less"""
     ds = qpformat.load_data(data_dir / "series_hdf5_meep.h5",
@@ -57,6 +57,25 @@ def test_load_data():
     assert np.allclose(qpd.pha, qpi1.pha)
 
 
+def test_load_data_channels():
+    path = datapath / "single_qpimage.h5"
+    tf = tempfile.mktemp(suffix=".h5", prefix="qpformat_test_")
+    qpi = qpimage.QPImage(h5file=path, h5mode="r")
+    with qpimage.QPSeries(qpimage_list=[qpi, qpi],
+                          h5file=tf,
+                          h5mode="a"):
+        pass
+
+    ds = qpformat.load_data(tf, channels=("phase",))
+    qpd = ds.get_qpimage(1)
+    # background data are stored in float32
+    assert np.allclose(qpd.pha, qpi.pha, atol=1e-6)
+    assert np.all(qpd.amp == 1)
+    qpdraw = ds.get_qpimage_raw(1)
+    assert np.allclose(qpdraw.pha, qpi.raw_pha)
+    assert "identifier" in qpdraw
+
+
 def test_meta_extraction():
     path = datapath / "single_qpimage.h5"
     tf = tempfile.mktemp(suffix=".h5", prefix="qpformat_test_")
@@ -167,6 +186,58 @@ def test_subjoined_meta_extraction():
     assert ds.meta_data["pixel size"] == .12
 
 
+def test_background_copy():
+    path = datapath / "single_qpimage.h5"
+    tf = tempfile.mktemp(suffix=".h5", prefix="qpformat_test_")
+    qpi = qpimage.QPImage(h5file=path, h5mode="r").copy()
+    bg = np.linspace(0, .1, qpi.shape[0]).reshape(-1, 1) * np.ones(qpi.shape)
+    qpi.set_bg_data(bg_data=(bg, np.ones(qpi.shape)),
+                    which_data="phase,amplitude")
+    with qpimage.QPSeries(qpimage_list=[qpi, qpi],
+                          h5file=tf,
+                          h5mode="a"):
+        pass
+
+    ds = qpformat.load_data(tf)
+    qpd = ds.get_qpimage(1)
+    assert np.allclose(qpd.pha, qpi.pha)
+    # background fit parameters are preserved
+    assert dict(qpd.info)["phase background fit_profile"] == "ramp"
+    # the "data" background is removed, the "fit" background is kept
+    qpr = ds.get_qpimage_raw(1)
+    assert "data" not in qpr._pha.h5["bg_data"]
+    assert np.allclose(qpr.pha, qpi.pha + bg)
+
+
+def test_meta_without_image_data(monkeypatch):
+    path = datapath / "single_qpimage.h5"
+    tf = tempfile.mktemp(suffix=".h5", prefix="qpformat_test_")
+    qpi1 = qpimage.QPImage(h5file=path, h5mode="r").copy()
+    qpi1["wavelength"] = 550e-9
+    qpi2 = qpi1.copy()
+    qpi2["time"] = 12.5
+    with qpimage.QPSeries(qpimage_list=[qpi1, qpi2],
+                          h5file=tf,
+                          h5mode="a"):
+        pass
+
+    ds = qpformat.load_data(tf)
+
+    def no_qpimage(*args, **kwargs):
+        raise AssertionError("Image data must not be loaded!")
+
+    # metadata are read from the HDF5 attributes only
+    monkeypatch.setattr(qpimage, "QPImage", no_qpimage)
+    monkeypatch.setattr(qpimage, "QPSeries", no_qpimage)
+    assert len(ds) == 2
+    assert np.isnan(ds.get_metadata(0).get("time", np.nan))
+    assert ds.get_metadata(1)["time"] == 12.5
+    assert ds.get_metadata(1)["wavelength"] == 550e-9
+    # the file is not opened again
+    ds.path = pathlib.Path(tf + "_does_not_exist")
+    assert ds.get_metadata(1)["time"] == 12.5
+
+
 if __name__ == "__main__":
     # Run all tests
     loc = locals()
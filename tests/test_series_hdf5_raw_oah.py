@@ -1,8 +1,15 @@
 import pathlib
+import shutil
+import subprocess
+import sys
 
+import h5py
 import numpy as np
+import pytest
+import qpimage
 
 import qpformat
+from qpformat.file_formats import retrieve_oah
 
 
 datapath = pathlib.Path(__file__).parent / "data"
@@ -17,6 +24,215 @@ def test_series_raw_oah():
     assert qpi1.meta["wavelength"] == 532e-9
     assert qpi1.meta["numerical aperture"] == 1.0
     assert np.allclose(qpi1.meta["pos x"], -0.0002045580000000009)
-    assert qpi1.meta["identifier"] == "a66ad:1"
+    assert qpi1.meta["identifier"] == "56376:1"
     assert qpi1.meta["time"] == 2.5
     assert qpi2.meta["time"] == 2.8
+
+
+def test_series_raw_oah_refresh(tmp_path):
+    path = tmp_path / "growing.h5"
+    shutil.copy2(datapath / "series_hdf5_raw-oah.h5", path)
+    ds = qpformat.load_data(path)
+    assert len(ds) == 2
+    assert ds.refresh() == 0
+    indices = []
+    for idx in ds.follow(poll_interval=0.01, timeout=0.1):
+        indices.append(idx)
+        if idx == 1:
+            # acquisition software adds an image
+            with h5py.File(path, "a") as h5:
+                h5["2"] = h5["0"][:]
+                for key in h5["0"].attrs:
+                    h5["2"].attrs[key] = h5["0"].attrs[key]
+    assert indices == [0, 1, 2]
+    assert len(ds) == 3
+    assert ds.shape[0] == 3
+    assert np.all(ds.get_qpimage(2).pha == ds.get_qpimage(0).pha)
+
+
+def test_series_raw_oah_refresh_identifier(tmp_path, monkeypatch):
+    path = tmp_path / "growing.h5"
+    shutil.copy2(datapath / "series_hdf5_raw-oah.h5", path)
+    ds = qpformat.load_data(path)
+    other = qpformat.load_data(datapath / "series_hdf5_raw-oah.h5")
+    assert len(ds) == 2
+    ident = ds.identifier
+    ident_other = other.identifier
+    with h5py.File(path, "a") as h5:
+        h5["2"] = h5["0"][:]
+    # the identifier is cached
+    assert ds.identifier == ident
+
+    def compute_identifier_data():
+        raise AssertionError("identifier of other dataset recomputed")
+
+    monkeypatch.setattr(other, "_compute_identifier_data",
+                        compute_identifier_data)
+    assert ds.refresh() == 1
+    # only the identifier of the refreshed dataset changes
+    assert ds.identifier != ident
+    assert other.identifier == ident_other
+
+
+def test_series_raw_oah_swmr_unavailable(monkeypatch):
+    h5py_file = h5py.File
+
+    def h5py_file_no_swmr(*args, swmr=False, **kwargs):
+        if swmr:
+            raise OSError("SWMR not supported")
+        return h5py_file(*args, **kwargs)
+
+    monkeypatch.setattr(h5py, "File", h5py_file_no_swmr)
+    # files that cannot be opened in SWMR mode are opened normally
+    ds = qpformat.load_data(datapath / "series_hdf5_raw-oah.h5")
+    assert ds.format == "SeriesRawOAHQpformatHDF5"
+    assert len(ds) == 2
+    assert ds.get_metadata(1)["time"] == 2.8
+    assert ds.get_qpimage(1).shape == (294, 280)
+
+
+def test_series_raw_oah_swmr_reader(tmp_path):
+    path = tmp_path / "swmr.h5"
+    with h5py.File(datapath / "series_hdf5_raw-oah.h5") as h5src, \
+            h5py.File(path, "w", libver="latest") as h5:
+        for key in h5src.attrs:
+            h5.attrs[key] = h5src.attrs[key]
+        for name in ["0", "1"]:
+            h5src.copy(name, h5)
+        h5.swmr_mode = True
+        # read the data while the file is open in SWMR mode
+        ds = qpformat.load_data(path)
+        assert len(ds) == 2
+        assert ds.get_qpimage(1).meta["time"] == 2.8
+
+
+SWMR_WRITER_SCRIPT = """
+import sys
+import h5py
+from qpformat.writers import RawHDF5SeriesWriter
+with h5py.File(sys.argv[2], "r") as h5:
+    holo = h5["0"][:]
+with RawHDF5SeriesWriter(sys.argv[1], layout="contiguous", swmr=True,
+                         meta_data={"wavelength": 532e-9},
+                         batch_size=2, queue_size=0) as w:
+    for ii in range(5):
+        w.append(holo, meta_data={"time": float(ii)})
+        if ii in [1, 4]:
+            w.flush()
+            print("flushed", flush=True)
+            sys.stdin.readline()
+"""
+
+
+def test_series_raw_oah_swmr_reader_other_process(tmp_path):
+    path = tmp_path / "swmr.h5"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", SWMR_WRITER_SCRIPT, str(path),
+         str(datapath / "series_hdf5_raw-oah.h5")],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert proc.stdout.readline().strip() == "flushed"
+        # the file is still open for writing in the other process
+        ds = qpformat.load_data(path)
+        assert ds.format == "SeriesRawOAHQpformatHDF5"
+        assert len(ds) == 2
+        ds2 = qpformat.load_data(path, fmt="SeriesRawOAHQpformatHDF5")
+        assert len(ds2) == 2
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+        assert proc.stdout.readline().strip() == "flushed"
+        assert ds.refresh() == 3
+        assert ds.get_metadata(4)["time"] == 4.0
+        assert np.all(ds.get_raw_data(4) == ds.get_raw_data(0))
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+    finally:
+        proc.stdin.close()
+        assert proc.wait(timeout=60) == 0
+
+
+def test_series_raw_oah_retrieved_batch():
+    ds = qpformat.load_data(datapath / "series_hdf5_raw-oah.h5")
+    pha, amp = ds.get_retrieved_batch([1, 0], batch_size=1)
+    assert pha.shape == (2, 294, 280)
+    assert pha.dtype == np.float32
+    for ii, idx in enumerate([1, 0]):
+        qpi = ds.get_qpimage_raw(idx)
+        assert np.allclose(pha[ii], qpi.pha, atol=1e-6)
+        assert np.allclose(amp[ii], qpi.amp, rtol=1e-6)
+
+
+@pytest.mark.parametrize("padding", [2, 0])
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"filter_name": "gauss", "filter_size": 0.4},
+    {"sideband_freq": (-0.25, 0.25)},
+    {"filter_name": "gauss", "sideband_freq": (-0.25, 0.25)},
+])
+def test_series_raw_oah_retrieved_batch_same_as_qpimage(
+        tmp_path, kwargs, padding):
+    """Batched retrieval must match qpretrieve and qpimage"""
+    # qpretrieve requires square holograms without padding
+    path = tmp_path / "square.h5"
+    shutil.copy2(datapath / "series_hdf5_raw-oah.h5", path)
+    with h5py.File(path, "a") as h5:
+        for name in ["0", "1"]:
+            data = h5[name][:280, :280]
+            attrs = dict(h5[name].attrs)
+            del h5[name]
+            h5[name] = data
+            h5[name].attrs.update(attrs)
+    kw = dict(kwargs, padding=padding)
+    ds = qpformat.load_data(path, qpretrieve_kw=kw)
+    pha, amp = ds.get_retrieved_batch([0, 1], batch_size=2)
+    for idx in range(2):
+        # (both holograms have the same sideband)
+        qpi = qpimage.QPImage(data=ds.get_raw_data(idx),
+                              which_data="raw-oah",
+                              qpretrieve_kw=kw)
+        assert pha[idx].shape == qpi.shape
+        assert np.allclose(pha[idx], qpi.pha, atol=1e-5, rtol=0)
+        assert np.allclose(amp[idx], qpi.amp, atol=0, rtol=1e-5)
+
+
+def test_series_raw_oah_sideband_pinned():
+    path = datapath / "series_hdf5_raw-oah.h5"
+    ds = qpformat.load_data(path)
+    kw = ds.get_qpretrieve_kw()
+    assert np.allclose(kw["sideband_freq"], (-0.2509765625, 0.25))
+    assert "sideband_freq" not in ds.qpretrieve_kw
+    qpi = qpimage.QPImage(data=ds.get_raw_data(1), which_data="raw-oah")
+    assert np.allclose(ds.get_qpimage_raw(1).pha, qpi.pha)
+    # a user-defined sideband is used as-is
+    ds2 = qpformat.load_data(path, qpretrieve_kw=kw)
+    assert ds2.get_qpretrieve_kw() == kw
+    assert ds2.identifier != ds.identifier
+    assert np.all(ds2.get_qpimage_raw(1).pha == ds.get_qpimage_raw(1).pha)
+
+
+def test_series_raw_oah_sweep_retrieval():
+    path = datapath / "series_hdf5_raw-oah.h5"
+    ds = qpformat.load_data(path)
+    kws = [{},
+           {"filter_name": "gauss", "filter_size": 0.4},
+           {"filter_size": 0.2, "padding": 1},
+           {"invert_phase": True},
+           ]
+    retrieve_oah.get_filter_mask.cache_clear()
+    pha = ds.sweep_retrieval(0, kws)
+    assert pha.shape == (4, 294, 280)
+    # the filter masks of a sweep are not cached
+    assert retrieve_oah.get_filter_mask.cache_info().currsize == 0
+    for ii, kw in enumerate(kws):
+        dsi = qpformat.load_data(path, qpretrieve_kw=kw)
+        assert np.allclose(pha[ii], dsi.get_qpimage_raw(0).pha, atol=1e-6)
+    # wrapped phase
+    pha_wrapped = ds.sweep_retrieval(0, kws, proc_phase=False)
+    assert np.all(np.abs(pha_wrapped) <= np.pi + 1e-6)
+    # different image shapes
+    try:
+        ds.sweep_retrieval(0, [{}, {"scale_to_filter": True}])
+    except ValueError:
+        pass
+    else:
+        assert False, "different shapes must raise ValueError"
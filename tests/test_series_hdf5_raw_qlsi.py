@@ -2,6 +2,7 @@ import pathlib
 import shutil
 
 import h5py
+import numpy as np
 
 import qpformat
 
@@ -31,3 +32,67 @@ def test_series_raw_qlsi(tmp_path):
     assert qpi1.meta["identifier"] == "f846b:1"
     assert qpi1.meta["time"] == 948.64
     assert qpi2.meta["time"] == 958.64
+
+
+def test_series_raw_qlsi_swmr_unavailable(tmp_path, monkeypatch):
+    dest = tmp_path / "series_hdf5_raw-qlsi.h5"
+    shutil.copy2(datapath / "single_hdf5_raw-qlsi.h5", dest)
+    with h5py.File(dest, "a") as h5:
+        h5["1"] = h5["0"][:]
+        for key in h5["0"].attrs:
+            h5["1"].attrs[key] = h5["0"].attrs[key]
+    h5py_file = h5py.File
+
+    def h5py_file_no_swmr(*args, swmr=False, **kwargs):
+        if swmr:
+            raise OSError("SWMR not supported")
+        return h5py_file(*args, **kwargs)
+
+    monkeypatch.setattr(h5py, "File", h5py_file_no_swmr)
+    # files that cannot be opened in SWMR mode are opened normally
+    ds = qpformat.load_data(dest)
+    assert ds.format == "SeriesRawQLSIQpformatHDF5"
+    assert len(ds) == 2
+    assert ds.get_qpimage(1).meta["wavelength"] == 550e-9
+
+
+def test_series_raw_qlsi_refresh(tmp_path):
+    source = datapath / "single_hdf5_raw-qlsi.h5"
+    dest = tmp_path / "series_hdf5_raw-qlsi.h5"
+    shutil.copy2(source, dest)
+
+    def add_image(name):
+        with h5py.File(dest, "a") as h5:
+            h5[name] = h5["0"][:]
+            for key in h5["0"].attrs:
+                h5[name].attrs[key] = h5["0"].attrs[key]
+
+    add_image("1")
+    ds = qpformat.load_data(dest)
+    assert len(ds) == 2
+    add_image("2")
+    add_image("3")
+    assert len(ds) == 2
+    assert ds.refresh() == 2
+    assert len(ds) == 4
+    assert ds.get_qpimage(3).meta["wavelength"] == 550e-9
+
+
+def test_series_raw_qlsi_retrieved_batch(tmp_path):
+    source = datapath / "single_hdf5_raw-qlsi.h5"
+    dest = tmp_path / "series_hdf5_raw-qlsi.h5"
+    shutil.copy2(source, dest)
+    with h5py.File(dest, "a") as h5:
+        for ii in range(1, 3):
+            h5[str(ii)] = np.roll(h5["0"][:], 2 * ii, axis=1)
+            for key in h5["0"].attrs:
+                h5[str(ii)].attrs[key] = h5["0"].attrs[key]
+
+    ds = qpformat.load_data(dest)
+    indices = [2, 0, 1]
+    pha, amp = ds.get_retrieved_batch(indices)
+    assert pha.shape == (3,) + ds.get_qpimage_raw(0).shape
+    for ii, idx in enumerate(indices):
+        qpi = ds.get_qpimage_raw(idx)
+        assert np.allclose(pha[ii], qpi.pha, atol=1e-5, rtol=0)
+        assert np.allclose(amp[ii], qpi.amp, atol=1e-5, rtol=0)
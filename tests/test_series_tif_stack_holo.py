@@ -0,0 +1,110 @@
+import gc
+import pathlib
+import tempfile
+import weakref
+
+import numpy as np
+import qpformat
+import tifffile
+
+
+datapath = pathlib.Path(__file__).parent / "data"
+
+
+def setup_test_stack(num=4, compression=None):
+    _fd, name = tempfile.mkstemp(suffix=".tif",
+                                 prefix="qpformat_test_holo_stack_")
+    holo = tifffile.imread(datapath / "single_holo.tif")
+    with tifffile.TiffWriter(name) as tw:
+        for ii in range(num):
+            # make the frames distinguishable
+            tw.write(np.roll(holo, ii, axis=1),
+                     contiguous=compression is None,
+                     compression=compression)
+    return pathlib.Path(name), holo
+
+
+def test_basic():
+    path, holo = setup_test_stack(num=4)
+    ds = qpformat.load_data(path)
+    assert ds.storage_type == "raw-oah"
+    assert ds.is_series
+    assert len(ds) == 4
+    assert "SeriesRawOAHTifStack" in ds.__repr__()
+    assert ds.shape == (4,) + holo.shape
+
+
+def test_close():
+    path, holo = setup_test_stack(num=2, compression="zlib")
+    with qpformat.load_data(path) as ds:
+        assert np.all(ds.get_raw_data(1) == np.roll(holo, 1, axis=1))
+        tif = ds._tif
+        assert not tif.filehandle.closed
+    assert tif.filehandle.closed
+    assert ds._tif is None
+    # data are still accessible
+    assert np.all(ds.get_raw_data(0) == holo)
+    ds.close()
+
+
+def test_not_kept_alive():
+    path, _ = setup_test_stack(num=3)
+    ds = qpformat.load_data(path)
+    assert len(ds) == 3
+    ref = weakref.ref(ds)
+    tif = ds._tif
+    del ds
+    gc.collect()
+    # the page index is not cached beyond the lifetime of the dataset
+    assert ref() is None
+    tif.close()
+
+
+def test_data_compressed():
+    path, holo = setup_test_stack(num=3, compression="zlib")
+    ds = qpformat.load_data(path)
+    assert ds.format == "SeriesRawOAHTifStack"
+    assert ds._get_mmap() is False
+    for ii in range(3):
+        assert np.all(ds.get_raw_data(ii) == np.roll(holo, ii, axis=1))
+    batch = ds.get_raw_data_batch([2, 0])
+    assert batch.shape == (2,) + holo.shape
+    assert np.all(batch[0] == np.roll(holo, 2, axis=1))
+    assert np.all(batch[1] == holo)
+
+
+def test_data_memmap():
+    path, holo = setup_test_stack(num=3)
+    ds = qpformat.load_data(path)
+    assert ds._get_mmap() is not False
+    for ii in range(3):
+        assert np.all(ds.get_raw_data(ii) == np.roll(holo, ii, axis=1))
+    batch = ds.get_raw_data_batch([1, 2])
+    assert np.all(batch[0] == np.roll(holo, 1, axis=1))
+    assert np.all(batch[1] == np.roll(holo, 2, axis=1))
+    out = np.zeros((2,) + holo.shape, dtype=float)
+    ds.get_raw_data_batch([1, 2], out=out)
+    assert np.all(out == batch)
+
+
+def test_qpimage():
+    path, holo = setup_test_stack(num=2)
+    ds = qpformat.load_data(path)
+    ds_single = qpformat.load_data(datapath / "single_holo.tif")
+    qpi = ds.get_qpimage(0)
+    assert "identifier" in qpi
+    assert np.allclose(qpi.pha, ds_single.get_qpimage().pha)
+
+
+def test_single_page_not_supported():
+    path, _ = setup_test_stack(num=1)
+    ds = qpformat.load_data(path)
+    assert ds.format == "SingleRawOAHTif"
+
+
+if __name__ == "__main__":
+    # Run all tests
+    loc = locals()
+    for key in list(loc.keys()):
+        if key.startswith("test_") and hasattr(loc[key], "__call__"):
+            loc[key]()
@@ -45,6 +45,24 @@ def test_load_data():
     assert np.allclose(qpd.pha, qpi.pha)
 
 
+def test_load_data_channels():
+    path = datapath / "single_qpimage.h5"
+    ds = qpformat.load_data(path, channels=["phase"])
+    qpi = qpimage.QPImage(h5file=path, h5mode="r")
+    qpd = ds.get_qpimage()
+    # background data are stored in float32
+    assert np.allclose(qpd.pha, qpi.pha, atol=1e-6)
+    assert np.all(qpd.amp == 1)
+    qpdraw = ds.get_qpimage_raw()
+    assert np.allclose(qpdraw.pha, qpi.raw_pha)
+    assert np.all(qpdraw.amp == 1)
+    # amplitude only
+    ds2 = qpformat.load_data(path, channels=["amplitude"])
+    qpd2 = ds2.get_qpimage()
+    assert np.allclose(qpd2.amp, qpi.amp, atol=1e-6)
+    assert np.all(qpd2.pha == 0)
+
+
 def test_meta_extraction():
     path = datapath / "single_qpimage.h5"
     tf = tempfile.mktemp(suffix=".h5", prefix="qpformat_test_")
@@ -1,7 +1,13 @@
 import pathlib
+import shutil
+
+import h5py
 import numpy as np
+import pytest
+import qpimage
 
 import qpformat
+from qpformat.file_formats import retrieve_oah, retrieve_qlsi
 
 
 data_path = pathlib.Path(__file__).parent / "data"
@@ -21,3 +27,57 @@ def test_series_raw_oah():
         rtol=0,
         atol=1e-7
     )
+
+
+def test_reference_cache_shared(tmp_path):
+    retrieve_qlsi.clear_reference_cache()
+    paths = []
+    for ii in range(3):
+        path = tmp_path / f"qlsi_{ii}.h5"
+        shutil.copy2(data_path / "single_hdf5_raw-qlsi.h5", path)
+        paths.append(path)
+    calls = []
+    fft_holograms = retrieve_oah.fft_holograms
+
+    def fft_holograms_counted(data, **kwargs):
+        calls.append(data.shape)
+        return fft_holograms(data, **kwargs)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(retrieve_oah, "fft_holograms", fft_holograms_counted)
+        phas = [qpformat.load_data(pp).get_qpimage().pha for pp in paths]
+    # reference processed once, interferograms three times
+    assert len(calls) == 4
+    assert np.all(phas[0] == phas[2])
+
+
+def test_reference_read_once():
+    ds = qpformat.load_data(data_path / "single_hdf5_raw-qlsi.h5")
+    pha = ds.get_qpimage_raw().pha
+    calls = []
+    get_reference_key = retrieve_qlsi.get_reference_key
+
+    def get_reference_key_counted(reference):
+        calls.append(reference.shape)
+        return get_reference_key(reference)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(retrieve_qlsi, "get_reference_key",
+                   get_reference_key_counted)
+        assert np.all(ds.get_qpimage_raw().pha == pha)
+    # the reference is neither read nor hashed again
+    assert not calls
+
+
+def test_same_as_qpimage():
+    ds = qpformat.load_data(data_path / "single_hdf5_raw-qlsi.h5")
+    with h5py.File(data_path / "single_hdf5_raw-qlsi.h5") as h5:
+        qpi = qpimage.QPImage(
+            data=h5["0"][:],
+            bg_data=h5["reference"][:],
+            which_data="raw-qlsi",
+            qpretrieve_kw={"wavelength": h5["0"].attrs["wavelength"],
+                           "qlsi_pitch_term":
+                               h5["0"].attrs["qlsi_pitch_term"]})
+    assert np.allclose(ds.get_qpimage_raw().pha, qpi.pha, atol=1e-6)
+    assert np.allclose(ds.get_qpimage_raw().amp, qpi.amp, rtol=1e-6)
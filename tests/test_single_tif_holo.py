@@ -1,6 +1,10 @@
 import pathlib
+import tempfile
 
+import numpy as np
+import pytest
 import qpformat
+import tifffile
 
 
 datapath = pathlib.Path(__file__).parent / "data"
@@ -30,6 +34,41 @@ def test_load_data():
     assert qpi.shape == (238, 267)
 
 
+def test_verify():
+    path = datapath / "single_holo.tif"
+    fmt = qpformat.file_formats.formats_dict["SingleRawOAHTif"]
+    assert fmt.verify(path)
+    assert not fmt.verify(datapath / "single_phasics.tif")
+    assert not fmt.verify(datapath / "single_qpimage.h5")
+    assert not fmt.verify(datapath)
+    # big-endian BigTIFF
+    holo = tifffile.imread(path)
+    tf = tempfile.mktemp(suffix=".tif", prefix="qpformat_test_")
+    tifffile.imwrite(tf, holo, bigtiff=True, byteorder=">")
+    assert fmt.verify(tf)
+    ds = qpformat.load_data(tf)
+    assert ds.format == "SingleRawOAHTif"
+    assert np.all(ds.get_qpimage_raw().pha
+                  == qpformat.load_data(path).get_qpimage_raw().pha)
+
+
+@pytest.mark.parametrize("content", [b"II", b"II*\x00\x08", b"MM\x00*\x00",
+                                     b"II+\x00\x08\x00\x00\x00"])
+def test_verify_truncated(tmp_path, content):
+    path = tmp_path / "truncated.tif"
+    path.write_bytes(content)
+    for name in ["SingleRawOAHTif", "SinglePhasePhasicsTif",
+                 "SeriesRawOAHTifStack"]:
+        fmt = qpformat.file_formats.formats_dict[name]
+        assert not fmt.verify(path)
+    # a truncated file does not break loading a folder
+    holo = datapath / "single_holo.tif"
+    (tmp_path / "holo1.tif").write_bytes(holo.read_bytes())
+    (tmp_path / "holo2.tif").write_bytes(holo.read_bytes())
+    ds = qpformat.load_data(tmp_path)
+    assert len(ds) == 2
+
+
 def test_returned_identifier():
     path = datapath / "single_holo.tif"
     ds = qpformat.load_data(path)
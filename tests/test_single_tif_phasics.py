@@ -65,6 +65,62 @@ def test_data_content():
     assert np.allclose(qpi.pha.max() - qpi.pha.min(), 4.168394088745117)
 
 
+def test_channels_phase_only():
+    path = datapath / "single_phasics.tif"
+    ds1 = qpformat.load_data(path)
+    ds2 = qpformat.load_data(path, channels=("phase",))
+    assert ds1.identifier != ds2.identifier
+    qpi1 = ds1.get_qpimage()
+    qpi2 = ds2.get_qpimage()
+    assert np.allclose(qpi1.pha, qpi2.pha)
+    assert np.all(qpi2.amp == 1)
+
+
+def test_decode_as_type():
+    path = datapath / "single_phasics.tif"
+    ds32 = qpformat.load_data(path)
+    ds64 = qpformat.load_data(path, as_type="float64")
+    qpi32 = ds32.get_qpimage()
+    qpi64 = ds64.get_qpimage()
+    assert qpi32.raw_pha.dtype == np.float32
+    assert qpi64.raw_pha.dtype == np.float64
+    assert np.allclose(qpi32.pha, qpi64.pha, atol=1e-5, rtol=0)
+    assert np.allclose(qpi32.amp, qpi64.amp, atol=0, rtol=1e-5)
+
+
+def test_meta_data_parsed_once(monkeypatch):
+    path = datapath / "single_phasics.tif"
+    fmt = qpformat.file_formats.fmts_ready.single_phase_phasics_tif
+    calls = []
+    orig_get_tif = fmt.SinglePhasePhasicsTif._get_tif
+
+    def get_tif_counter(path):
+        calls.append(path)
+        return orig_get_tif(path)
+
+    monkeypatch.setattr(fmt.SinglePhasePhasicsTif, "_get_tif",
+                        staticmethod(get_tif_counter))
+    ds = fmt.SinglePhasePhasicsTif(path)
+    # xml metadata are parsed during initialization
+    assert len(calls) == 1
+    ds.get_metadata()
+    ds.get_qpimage_raw()
+    # only the image data are read
+    assert len(calls) == 2
+
+
+def test_verify_file_object():
+    path = datapath / "single_phasics.tif"
+    fmt = qpformat.file_formats.formats_dict["SinglePhasePhasicsTif"]
+    with path.open("rb") as fd:
+        assert fmt.verify(fd)
+        # file object must not be closed
+        assert not fd.closed
+    # the other TIFF formats do not match
+    for name in ["SingleRawOAHTif", "SeriesRawOAHTifStack"]:
+        assert not qpformat.file_formats.formats_dict[name].verify(path)
+
+
 def test_returned_identifier():
     path = datapath / "single_phasics.tif"
     ds = qpformat.load_data(path)
@@ -0,0 +1,203 @@
+import pathlib
+
+import h5py
+import numpy as np
+import pytest
+
+import qpformat
+from qpformat.writers import RawHDF5SeriesWriter
+
+
+datapath = pathlib.Path(__file__).parent / "data"
+
+
+def get_holograms():
+    with h5py.File(datapath / "series_hdf5_raw-oah.h5", "r") as h5:
+        holos = [h5["0"][:], h5["1"][:]]
+        meta = dict(h5["0"].attrs)
+    return holos, meta
+
+
+@pytest.mark.parametrize("queue_size", [0, 4])
+def test_write_raw_oah(tmp_path, queue_size):
+    holos, meta = get_holograms()
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, meta_data={"wavelength": 532e-9},
+                             batch_size=2, queue_size=queue_size) as w:
+        for ii in range(5):
+            w.append(holos[ii % 2], meta_data={"time": 0.5 * ii})
+        assert len(w) == 5
+    assert w.num_written == 5
+
+    ds = qpformat.load_data(path)
+    assert ds.format == "SeriesRawOAHQpformatHDF5"
+    assert len(ds) == 5
+    assert ds.get_metadata(3)["time"] == 1.5
+    assert ds.get_metadata(3)["wavelength"] == 532e-9
+    ref = qpformat.load_data(datapath / "series_hdf5_raw-oah.h5")
+    assert np.allclose(ds.get_qpimage(3).pha, ref.get_qpimage(1).pha)
+
+
+def test_write_raw_oah_single(tmp_path):
+    holos, _ = get_holograms()
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path) as w:
+        w.append(holos[0])
+    assert qpformat.load_data(path).format == "SingleRawOAHQpformatHDF5"
+
+
+def test_write_raw_qlsi_reference(tmp_path):
+    with h5py.File(datapath / "single_hdf5_raw-qlsi.h5", "r") as h5:
+        data = h5["0"][:]
+        meta = {key: h5["0"].attrs[key] for key in
+                ["wavelength", "pixel size", "medium index",
+                 "qlsi_pitch_term"]}
+        reference = h5["reference"][:]
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, storage_type="raw-qlsi",
+                             meta_data=meta, compression="gzip") as w:
+        w.set_reference(reference)
+        w.append(data)
+        w.append(data)
+    with h5py.File(path, "r") as h5:
+        assert h5["0"].compression == "gzip"
+        assert h5["0"].chunks == data.shape
+        assert np.all(h5["reference"][:] == reference)
+    ds = qpformat.load_data(path)
+    assert ds.format == "SeriesRawQLSIQpformatHDF5"
+    assert len(ds) == 2
+    ds_ref = qpformat.load_data(datapath / "single_hdf5_raw-qlsi.h5")
+    assert np.allclose(ds.get_qpimage(1).pha, ds_ref.get_qpimage(0).pha)
+
+
+def test_write_buffer_reuse(tmp_path):
+    holos, _ = get_holograms()
+    path = tmp_path / "out.h5"
+    buffer = holos[0].copy()
+    with RawHDF5SeriesWriter(path, queue_size=8) as w:
+        w.append(buffer)
+        buffer[:] = 0
+        w.append(buffer)
+    with h5py.File(path, "r") as h5:
+        assert np.all(h5["0"][:] == holos[0])
+        assert np.all(h5["1"][:] == 0)
+
+
+def test_write_errors(tmp_path):
+    with pytest.raises(ValueError, match="Invalid storage type"):
+        RawHDF5SeriesWriter(tmp_path / "a.h5", storage_type="phase")
+    with RawHDF5SeriesWriter(tmp_path / "b.h5") as w:
+        with pytest.raises(ValueError, match="2D"):
+            w.append(np.zeros(10))
+    # errors in the writer thread are raised in the calling thread
+    w = RawHDF5SeriesWriter(tmp_path / "c.h5", queue_size=2, batch_size=1)
+    w.append(np.zeros((10, 10)), meta_data={"time": object()})
+    with pytest.raises(TypeError):
+        w.flush()
+    w.close()
+
+
+@pytest.mark.parametrize("swmr", [False, True])
+def test_write_contiguous(tmp_path, swmr):
+    holos, _ = get_holograms()
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, meta_data={"wavelength": 532e-9},
+                             layout="contiguous", swmr=swmr,
+                             batch_size=2, queue_size=0) as w:
+        for ii in range(5):
+            w.append(holos[ii % 2], meta_data={"time": 0.5 * ii})
+        if swmr:
+            # the data are readable during writing
+            w.flush()
+            ds = qpformat.load_data(path)
+            assert ds.format == "SeriesRawOAHQpformatHDF5"
+            assert len(ds) == 5
+            w.append(holos[1], meta_data={"time": 3.0})
+            w.flush()
+            assert ds.refresh() == 1
+            assert ds.get_metadata(5)["time"] == 3.0
+        else:
+            w.append(holos[1], meta_data={"time": 3.0})
+    with h5py.File(path, "r") as h5:
+        assert h5["images"].shape == (6,) + holos[0].shape
+        assert h5["images"].chunks == (1,) + holos[0].shape
+        assert np.all(h5["metadata/time"][:] == [0, .5, 1, 1.5, 2, 3])
+        assert h5["images"].attrs["wavelength"] == 532e-9
+    ds = qpformat.load_data(path)
+    assert ds.get_metadata(3)["wavelength"] == 532e-9
+    assert ds.get_metadata(3)["time"] == 1.5
+    assert np.all(ds.get_raw_data(2) == holos[0])
+    batch = ds.get_raw_data_batch([1, 2, 3])
+    assert np.all(batch[0] == holos[1])
+    assert np.all(batch[1] == holos[0])
+    batch = ds.get_raw_data_batch([3, 0, 3])
+    assert np.all(batch[0] == holos[1])
+    assert np.all(batch[1] == holos[0])
+    assert np.all(batch[2] == holos[1])
+    ref = qpformat.load_data(datapath / "series_hdf5_raw-oah.h5")
+    assert np.allclose(ds.get_qpimage(3).pha, ref.get_qpimage(1).pha)
+
+
+def test_write_contiguous_missing_metadata(tmp_path):
+    holos, _ = get_holograms()
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, layout="contiguous", batch_size=1) as w:
+        w.append(holos[0], meta_data={"time": 1.0})
+        w.append(holos[0], meta_data={"pos x": 1e-3})
+    ds = qpformat.load_data(path)
+    assert "pos x" not in ds.get_metadata(0)
+    assert ds.get_metadata(0)["time"] == 1.0
+    assert "time" not in ds.get_metadata(1)
+    assert ds.get_metadata(1)["pos x"] == 1e-3
+
+
+@pytest.mark.parametrize("queue_size", [0, 4])
+def test_write_contiguous_string_metadata(tmp_path, queue_size):
+    holos, _ = get_holograms()
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, layout="contiguous", batch_size=2,
+                             queue_size=queue_size) as w:
+        w.append(holos[0], meta_data={"time": 1.0, "device": "a"})
+        w.append(holos[0], meta_data={"time": 2.0})
+        w.append(holos[0], meta_data={"date": "2026-10-19"})
+        with pytest.raises(ValueError, match="device"):
+            w.append(holos[0], meta_data={"device": 5})
+        with pytest.raises(ValueError, match="time"):
+            w.append(holos[0], meta_data={"time": "late"})
+        with pytest.raises(ValueError, match="time"):
+            w.append(holos[0], meta_data={"time": [1, 2]})
+    assert w.num_written == 3
+    with h5py.File(path, "r") as h5:
+        assert list(h5["metadata/device"].asstr()[:]) == ["a", "", ""]
+    ds = qpformat.load_data(path)
+    assert ds.get_metadata(0)["device"] == "a"
+    assert ds.get_metadata(0)["time"] == 1.0
+    assert "device" not in ds.get_metadata(1)
+    assert "date" not in ds.get_metadata(1)
+    assert ds.get_metadata(2)["date"] == "2026-10-19"
+    assert "time" not in ds.get_metadata(2)
+
+
+def test_write_contiguous_qlsi(tmp_path):
+    with h5py.File(datapath / "single_hdf5_raw-qlsi.h5", "r") as h5:
+        data = h5["0"][:]
+        meta = {key: h5["0"].attrs[key] for key in
+                ["wavelength", "pixel size", "medium index",
+                 "qlsi_pitch_term"]}
+        reference = h5["reference"][:]
+    path = tmp_path / "out.h5"
+    with RawHDF5SeriesWriter(path, storage_type="raw-qlsi",
+                             meta_data=meta, layout="contiguous",
+                             compression="gzip", swmr=True) as w:
+        w.set_reference(reference)
+        w.append(data)
+    ds = qpformat.load_data(path)
+    assert ds.format == "SeriesRawQLSIQpformatHDF5"
+    assert len(ds) == 1
+    ds_ref = qpformat.load_data(datapath / "single_hdf5_raw-qlsi.h5")
+    assert np.allclose(ds.get_qpimage(0).pha, ds_ref.get_qpimage(0).pha)
+
+
+def test_write_swmr_requires_contiguous(tmp_path):
+    with pytest.raises(ValueError, match="contiguous"):
+        RawHDF5SeriesWriter(tmp_path / "a.h5", swmr=True)